@@ -23,6 +23,11 @@ class Config(ConfigBase):
         stalker_dummy_user_pass='anima',
         local_cache_folder='~/.cache/anima/',
         recent_file_name='recent_files',
+        media_info_cache_file_name='media_info_cache',
+        max_media_info_cache_size=1000,
+        max_media_job_worker_count=4,
+        repository_index_ttl=60,
+        version_query_chunk_size=500,
         avid_media_file_path_storage='avid_media_file_path',
 
         normal_users_group_names=['Normal Users'],
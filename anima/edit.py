@@ -4,7 +4,41 @@
 # This module is part of anima-tools and is released under the BSD 2
 # License: http://www.opensource.org/licenses/BSD-2-Clause
 
+import bisect
+import hashlib
+import math
+import multiprocessing
 import os
+import re
+import subprocess
+from cStringIO import StringIO
+from multiprocessing.pool import ThreadPool
+from xml.sax.saxutils import escape
+
+try:
+    from xml.etree import cElementTree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+
+
+XML_SPECIAL_CHARACTERS = re.compile('[&<>"]')
+
+
+def escape_xml(value):
+    """returns the given value as an utf-8 encoded string which can be used
+    as XML text or as a double quoted attribute value
+
+    :param value: Any value, unicode values are utf-8 encoded
+    :return: str
+    """
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    elif not isinstance(value, str):
+        value = str(value)
+    # most of the values do not need to be escaped
+    if XML_SPECIAL_CHARACTERS.search(value) is None:
+        return value
+    return escape(value, {'"': '&quot;'})
 
 
 class EditBase(object):
@@ -21,6 +55,18 @@ class EditBase(object):
     def to_xml(self, indentation=2, pre_indent=0):
         """returns an xml version of this PrevisBase object
         """
+        output = StringIO()
+        self.write_xml(output, indentation=indentation, pre_indent=pre_indent)
+        return output.getvalue()
+
+    def write_xml(self, file_handler, indentation=2, pre_indent=0):
+        """writes the xml version of this PrevisBase object to the given file
+        handler
+
+        :param file_handler: A file like object with a ``write`` method
+        :param int indentation: The number of spaces per indentation level
+        :param int pre_indent: The number of spaces before this element
+        """
         raise NotImplementedError
 
     def from_edl(self, edl_list):
@@ -170,39 +216,133 @@ class Sequence(EditBase, NameMixin, DurationMixin):
 
         self.media = media
 
-    def to_xml(self, indentation=2, pre_indent=0):
-        """returns an xml version of this Sequence object
+    def from_xml_file(self, source):
+        """Fills attributes by reading the given xmeml file incrementally.
+
+        Unlike :meth:`.from_xml` the whole document is not loaded in to memory,
+        every video ``<clipitem>`` element is converted to a Clip instance as
+        soon as it is parsed and then removed from the tree. The remaining,
+        small, tree is read with :meth:`.from_xml`.
+
+        ``<file id="..."/>`` elements without any content refer to an earlier
+        ``<file>`` element with the same id and use the same File instance.
+
+        Only the first sequence in the file is read.
+
+        :param source: The path of the XML file or a file like object
         """
-        template = """<?xml version="1.0" encoding="UTF-8"?>
+        if isinstance(source, (str, unicode)):
+            with open(source, 'rb') as xml_file:
+                return self.from_xml_file(xml_file)
+
+        files = {}
+        # the clips of every video track in order
+        track_clips = []
+        clips = []
+        sequence_element = None
+        sequence_depth = None
+        media_child_tag = None
+        track_element = None
+        depth = 0
+
+        for event, element in ElementTree.iterparse(
+                source, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if sequence_depth is None:
+                    if element.tag == 'sequence':
+                        sequence_element = element
+                        sequence_depth = depth
+                elif depth == sequence_depth + 2:
+                    # <video> or <audio> under <media>
+                    media_child_tag = element.tag
+                elif depth == sequence_depth + 3:
+                    track_element = element
+                continue
+
+            depth -= 1
+            if sequence_depth is None:
+                continue
+
+            if depth == sequence_depth + 3:
+                # a child of a track
+                if element.tag != 'clipitem':
+                    continue
+
+                if media_child_tag == 'video':
+                    clip = Clip()
+                    clip.from_xml(element)
+                    file_tag = element.find('file')
+                    if file_tag is not None:
+                        file_id = file_tag.get('id')
+                        if len(file_tag):
+                            files[file_id] = clip.file
+                        else:
+                            clip.file = files.get(file_id)
+                    clips.append(clip)
+
+                # it is the last child of the track for now
+                element.clear()
+                del track_element[-1]
+            elif depth == sequence_depth + 2:
+                if element.tag == 'track' and media_child_tag == 'video':
+                    track_clips.append(clips)
+                clips = []
+            elif depth < sequence_depth:
+                # end of the sequence
+                break
+
+        self.from_xml(sequence_element)
+        for track, clips in zip(self.media.video.tracks, track_clips):
+            track.clips = clips
+
+    def write_xml(self, file_handler, indentation=2, pre_indent=0):
+        """writes the xml version of this Sequence object to the given file
+        handler, the clips are written one by one
+
+        :param file_handler: A file like object with a ``write`` method
+        :param int indentation: The number of spaces per indentation level
+        :param int pre_indent: The number of spaces before this element
+        """
+        template_vars = {
+            'duration': self.duration,
+            'name': escape_xml(self.name),
+            'timecode': escape_xml(self.timecode),
+            'indentation': ' ' * indentation,
+            'pre_indent': ' ' * pre_indent
+        }
+
+        file_handler.write(
+            """<?xml version="1.0" encoding="UTF-8"?>
 <!DOCTYPE xmeml>
 <xmeml version="5">
 %(pre_indent)s<sequence>
 %(pre_indent)s%(indentation)s<duration>%(duration)s</duration>
 %(pre_indent)s%(indentation)s<name>%(name)s</name>
-%(rate)s
+""" % template_vars
+        )
+        self.rate.write_xml(
+            file_handler,
+            indentation=indentation,
+            pre_indent=indentation + pre_indent
+        )
+        file_handler.write(
+            """
 %(pre_indent)s%(indentation)s<timecode>
 %(pre_indent)s%(indentation)s%(indentation)s<string>%(timecode)s</string>
 %(pre_indent)s%(indentation)s</timecode>
-%(media)s
+""" % template_vars
+        )
+        self.media.write_xml(
+            file_handler,
+            indentation=indentation,
+            pre_indent=indentation + pre_indent
+        )
+        file_handler.write(
+            """
 %(pre_indent)s</sequence>
-</xmeml>"""
-
-        return template % {
-            'duration': self.duration,
-            'name': self.name,
-            'ntsc': str(self.ntsc).upper(),
-            'rate': self.rate.to_xml(
-                indentation=indentation,
-                pre_indent=indentation + pre_indent
-            ),
-            'timecode': self.timecode,
-            'media': self.media.to_xml(
-                indentation=indentation,
-                pre_indent=indentation + pre_indent
-            ),
-            'indentation': ' ' * indentation,
-            'pre_indent': ' ' * pre_indent
-        }
+</xmeml>""" % template_vars
+        )
 
     def from_edl(self, edl_list):
         """Fills attributes with the given edl.List instance
@@ -211,9 +351,49 @@ class Sequence(EditBase, NameMixin, DurationMixin):
         """
         import edl
         assert isinstance(edl_list, edl.List)
+        from timecode import Timecode
 
         self.name = edl_list.title
 
+        # get the last timecode like 23:59:59:xx to convert the negative
+        # record timecodes
+        tc_24_hours = Timecode(
+            edl_list.fps,
+            '23:59:59:%s' % edl_list.fps
+        )
+
+        self._from_edl_events(
+            (EDLEvent.from_edl_event(e) for e in edl_list.events),
+            tc_24_hours.frame_number  # + 1
+        )
+
+    def from_edl_file(self, source):
+        """Fills attributes by reading the given CMX3600 EDL file without the
+        ``edl`` and ``timecode`` libraries.
+
+        The events are read one by one with :class:`.EDLReader` and the
+        timecodes are converted with the :attr:`.rate` of this Sequence.
+
+        :param source: The path of the EDL file or a file like object
+        """
+        if isinstance(source, (str, unicode)):
+            with open(source, 'r') as edl_file:
+                return self.from_edl_file(edl_file)
+
+        converter = TimecodeConverter.get(self.rate.timebase)
+        reader = EDLReader(source, converter)
+        self._from_edl_events(reader, converter.frames_per_day)
+        self.name = reader.title
+
+    def _from_edl_events(self, events, frames_per_day):
+        """creates the Media, Video, Track and Clip instances from the given
+        EDLEvent instances
+
+        :param events: An iterable of :class:`.EDLEvent` instances
+        :param int frames_per_day: The frame count of 24 hours, which is
+          subtracted from the record start of the clips that are starting
+          before 00:00:00:00
+        """
         # create a Media instance
         self.media = Media()
 
@@ -227,32 +407,25 @@ class Sequence(EditBase, NameMixin, DurationMixin):
         # read Events in to Clips
         sequence_start = 1e20
         sequence_end = -1
-        for e in edl_list.events:
-            assert isinstance(e, edl.Event)
+        for e in events:
             clip = Clip()
 
             clip.name = e.reel
             clip.id = e.clip_name
             clip.type = 'Video' if e.track == 'V' else 'Audio'
 
-            clip.in_ = e.src_start_tc.frame_number
-            clip.out = e.src_end_tc.frame_number
+            clip.in_ = e.src_start
+            clip.out = e.src_end
 
             clip.duration = clip.out - clip.in_
 
-            clip.start = e.rec_start_tc.frame_number
-            clip.end = e.rec_end_tc.frame_number
+            clip.start = e.rec_start
+            clip.end = e.rec_end
 
             # check in and out points relative to each other
             if clip.start > clip.end:
                 # a possible negative number
-                from timecode import Timecode
-                # get the last timecode like 23:59:59:xx
-                tc_24_hours = Timecode(
-                    edl_list.fps,
-                    '23:59:59:%s' % edl_list.fps
-                )
-                clip.start -= tc_24_hours.frame_number  # + 1
+                clip.start -= frames_per_day
 
             if clip.start < sequence_start:
                 sequence_start = clip.start
@@ -268,7 +441,7 @@ class Sequence(EditBase, NameMixin, DurationMixin):
             #
             # a possible solution is to look to the original media
             # but we may not be able to reach the media itself
-            f.duration = e.src_end_tc.frame_number
+            f.duration = e.src_end
 
             f.pathurl = 'file://%s' % e.source_file
 
@@ -286,12 +459,47 @@ class Sequence(EditBase, NameMixin, DurationMixin):
         """Returns an edl.List instance equivalent of this Sequence instance
         """
         from edl import List, Event
-        from timecode import Timecode
 
         l = List(self.rate.timebase)
         l.title = self.name
 
         # convert clips to events
+        self._check_edl_media()
+        converter = TimecodeConverter.get(self.rate.timebase)
+        for edl_event in self._to_edl_events():
+            e = Event({})
+            e.num = edl_event.num
+            e.clip_name = edl_event.clip_name
+            e.reel = edl_event.reel
+            e.track = edl_event.track
+            e.tr_code = edl_event.tr_code
+            e.src_start_tc = converter.to_timecode(edl_event.src_start)
+            e.src_end_tc = converter.to_timecode(edl_event.src_end)
+            e.rec_start_tc = converter.to_timecode(edl_event.rec_start)
+            e.rec_end_tc = converter.to_timecode(edl_event.rec_end)
+            e.source_file = edl_event.source_file
+            e.comments.extend(edl_event.comments)
+            l.append(e)
+        return l
+
+    def write_edl(self, file_handler):
+        """writes the CMX3600 EDL version of this Sequence instance to the
+        given file handler without the ``edl`` and ``timecode`` libraries.
+        The output is the same with ``self.to_edl().to_string()``.
+
+        :param file_handler: A file like object with a ``write`` method
+        """
+        self._check_edl_media()
+        converter = TimecodeConverter.get(self.rate.timebase)
+        file_handler.write('TITLE: %s\n' % self.name)
+        for edl_event in self._to_edl_events():
+            file_handler.write('\n')
+            file_handler.write(edl_event.to_string(converter))
+
+    def _check_edl_media(self):
+        """raises a RuntimeError if there is no Media instance to convert to
+        EDL events
+        """
         if not self.media:
             raise RuntimeError(
                 'Can not run %(class)s.to_edl() without a Media instance, '
@@ -300,13 +508,18 @@ class Sequence(EditBase, NameMixin, DurationMixin):
                 }
             )
 
+    def _to_edl_events(self):
+        """generates the EDLEvent instances of the clips of this Sequence
+
+        :return: A generator of :class:`.EDLEvent` instances
+        """
         video = self.media.video
         if video is not None:
             i = 0
             for track in video.tracks:
                 for clip in track.clips:
                     i += 1
-                    e = Event({})
+                    e = EDLEvent()
                     e.num = '%06i' % i
                     e.clip_name = clip.id
                     e.reel = clip.name
@@ -314,23 +527,13 @@ class Sequence(EditBase, NameMixin, DurationMixin):
                     e.tr_code = 'C'  # TODO: for now use C (Cut) later on
                     # expand it to add other transition codes
 
-                    src_start_tc = Timecode(self.rate.timebase,
-                                            frames=clip.in_ + 1)
+                    e.src_start = clip.in_
                     # 1 frame after last frame shown
-                    src_end_tc = Timecode(self.rate.timebase,
-                                          frames=clip.out + 1)
-
-                    e.src_start_tc = str(src_start_tc)
-                    e.src_end_tc = str(src_end_tc)
+                    e.src_end = clip.out
 
-                    rec_start_tc = Timecode(self.rate.timebase,
-                                            frames=clip.start + 1)
+                    e.rec_start = clip.start
                     # 1 frame after last frame shown
-                    rec_end_tc = Timecode(self.rate.timebase,
-                                          frames=clip.end + 1)
-
-                    e.rec_start_tc = str(rec_start_tc)
-                    e.rec_end_tc = str(rec_end_tc)
+                    e.rec_end = clip.end
 
                     source_file = \
                         clip.file.pathurl.replace('file://localhost', '')
@@ -345,14 +548,35 @@ class Sequence(EditBase, NameMixin, DurationMixin):
                         '* SOURCE FILE: %s' % source_file
                     ])
 
-                    l.append(e)
-        return l
+                    yield e
+
+    def get_timeline_index(self):
+        """returns a :class:`.TimelineIndex` of the clips in all of the video
+        tracks of this Sequence, to find the clips on a frame or in a frame
+        range across the tracks. Use :attr:`.Track.timeline_index` to index
+        the clips of a single track.
+
+        :return: :class:`.TimelineIndex`
+        """
+        clips = []
+        if self.media and self.media.video:
+            for track in self.media.video.tracks:
+                clips.extend(track.clips)
+        return TimelineIndex(clips)
 
     def to_metafuze_xml(self):
         """Generates a MetaFuze compatible XML content per clip.
 
         :returns: list of strings
         """
+        return [job.xml for job in self.to_metafuze_jobs()]
+
+    def to_metafuze_jobs(self):
+        """Generates a :class:`.MetaFuzeJob` per clip to convert the clip
+        files to MXF with MetaFuze, see :func:`.run_metafuze_jobs`.
+
+        :returns: list of :class:`.MetaFuzeJob` instances
+        """
         metafuze_xml_template = """<?xml version='1.0' encoding='UTF-8'?>
 <MetaFuze_BatchTranscode xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:noNamespaceSchemaLocation="MetaFuzeBatchTranscode.xsd">
    <Configuration>
@@ -402,7 +626,7 @@ class Sequence(EditBase, NameMixin, DurationMixin):
       </Transcode>
    </Group>
 </MetaFuze_BatchTranscode>"""
-        rendered_xmls = []
+        jobs = []
         video = self.media.video
         if video is not None:
             for track in video.tracks:
@@ -431,9 +655,746 @@ class Sequence(EditBase, NameMixin, DurationMixin):
                         'height': video.height
                     }
 
-                    rendered_xmls.append(metafuze_xml_template % kwargs)
+                    jobs.append(
+                        MetaFuzeJob(
+                            metafuze_xml_template % kwargs,
+                            kwargs['file_pathurl'],
+                            kwargs['mxf_pathurl']
+                        )
+                    )
+
+        return jobs
+
+
+class MetaFuzeJob(object):
+    """A MetaFuze job which converts a clip file to MXF.
+
+    The job stores a hash of its XML and the size and modification time of
+    the source file next to the MXF file after a successful conversion, so
+    the clips that are not changed since their last conversion are skipped.
+
+    :param str xml: The MetaFuze XML content of the job
+    :param str source_path: The path of the clip file
+    :param str mxf_path: The path of the generated MXF file
+    """
+
+    command = ['metafuze', '-debug']
+    hash_extension = '.metafuze'
+
+    def __init__(self, xml, source_path, mxf_path):
+        self.xml = xml
+        self.source_path = source_path
+        self.mxf_path = mxf_path
+        self.xml_path = None
+        self.return_code = None
+        self.skipped = False
+
+    @property
+    def hash_path(self):
+        """returns the path of the file that stores the settings hash of the
+        last conversion
+        """
+        return '%s%s' % (self.mxf_path, self.hash_extension)
+
+    @property
+    def settings_hash(self):
+        """returns a hash of the XML content and the size and modification
+        time of the source file
+        """
+        try:
+            stat = os.stat(self.source_path)
+            source_info = '%s %s' % (stat.st_size, stat.st_mtime)
+        except OSError:
+            source_info = ''
+
+        xml = self.xml
+        if isinstance(xml, unicode):
+            xml = xml.encode('utf-8')
+        return hashlib.sha1('%s\n%s' % (source_info, xml)).hexdigest()
+
+    def is_up_to_date(self):
+        """returns True if the MXF file exists and it is generated with the
+        same settings and source file
+        """
+        if not os.path.exists(self.mxf_path):
+            return False
+        try:
+            with open(self.hash_path) as f:
+                return f.read().strip() == self.settings_hash
+        except IOError:
+            return False
+
+    def write(self, job_dir, index=0):
+        """writes the XML content of this job to the given job directory
+
+        :param str job_dir: The job directory
+        :param int index: The index of the job, used in the file name
+        :return: The path of the XML file
+        """
+        file_name = '%04i_%s.xml' % (
+            index, os.path.splitext(os.path.basename(self.mxf_path))[0]
+        )
+        self.xml_path = os.path.join(job_dir, file_name)
+        xml = self.xml
+        if isinstance(xml, unicode):
+            xml = xml.encode('utf-8')
+        with open(self.xml_path, 'w') as f:
+            f.write(xml)
+        return self.xml_path
+
+    def run(self):
+        """runs MetaFuze with the XML file of this job and stores the settings
+        hash if the MXF file is generated
+
+        :return: The return code of MetaFuze
+        """
+        settings_hash = self.settings_hash
+        self.return_code = subprocess.call(
+            self.command + [self.xml_path],
+            shell=os.name == 'nt'
+        )
+        if not self.return_code and os.path.exists(self.mxf_path):
+            with open(self.hash_path, 'w') as f:
+                f.write(settings_hash)
+        return self.return_code
+
+
+def run_metafuze_jobs(jobs, job_dir, worker_count=None):
+    """runs the given MetaFuze jobs in parallel and yields every job when it is
+    finished, the jobs that are up to date are skipped and yielded first::
+
+      seq = Sequence()
+      seq.from_xml_file('/tmp/sequence.xml')
+      for job in run_metafuze_jobs(seq.to_metafuze_jobs(), '/tmp/jobs'):
+          print(job.mxf_path, job.skipped, job.return_code)
+
+    :param jobs: A list of :class:`.MetaFuzeJob` instances
+    :param str job_dir: The directory to write the job XML files to
+    :param int worker_count: The maximum number of MetaFuze processes running
+      at the same time, the default is the number of cpus
+    """
+    if not os.path.exists(job_dir):
+        os.makedirs(job_dir)
+
+    pending_jobs = []
+    for i, job in enumerate(jobs):
+        if job.is_up_to_date():
+            job.skipped = True
+            yield job
+        else:
+            job.write(job_dir, i)
+            pending_jobs.append(job)
+
+    if not pending_jobs:
+        return
+
+    if worker_count is None:
+        worker_count = multiprocessing.cpu_count()
+
+    def run(job):
+        job.run()
+        return job
+
+    pool = ThreadPool(max(1, min(worker_count, len(pending_jobs))))
+    try:
+        for job in pool.imap_unordered(run, pending_jobs):
+            yield job
+    finally:
+        pool.close()
+        pool.join()
+
+
+class TimecodeConverter(object):
+    """Converts SMPTE timecodes to 0 based frame numbers and back with
+    integer arithmetic.
+
+    The results are the same with the ``timecode`` library (the
+    ``Timecode.frame_number`` attribute and ``str(Timecode)``), including the
+    drop frame timecodes of 29.97 and 59.94 fps, but the per rate values are
+    calculated only once. Use :meth:`.get` to get a shared instance per frame
+    rate.
+
+    :param str framerate: The frame rate, one of ['12', '23.98', '24', '25',
+      '29.97', '30', '50', '59.94', '60'].
+    """
+
+    __instances = {}
+
+    def __init__(self, framerate='25'):
+        framerate = str(framerate)
+        self.framerate = framerate
+        self.drop_frame = framerate in ['29.97', '59.94']
+
+        if framerate == '23.98':
+            framerate = '24'
+        fps = float(framerate)
+
+        if self.drop_frame:
+            self.int_framerate = int(round(fps))
+            # 6% of the frame rate is dropped in every minute except every
+            # tenth minute
+            self.drop_frames = int(round(fps * .066666))
+            self.frame_delimiter = ';'
+        else:
+            self.int_framerate = int(fps)
+            self.drop_frames = 0
+            self.frame_delimiter = ':'
+
+        self.frames_per_day = int(round(fps * 60 * 60)) * 24
+        self.frames_per_10_minutes = int(round(fps * 60 * 10))
+        self.frames_per_minute = int(round(fps) * 60) - self.drop_frames
+
+    @classmethod
+    def get(cls, framerate):
+        """returns the shared TimecodeConverter instance of the given
+        framerate
+
+        :param str framerate: The frame rate
+        :return: :class:`.TimecodeConverter`
+        """
+        framerate = str(framerate)
+        try:
+            return cls.__instances[framerate]
+        except KeyError:
+            converter = cls(framerate)
+            cls.__instances[framerate] = converter
+            return converter
+
+    def to_frames(self, timecode):
+        """returns the 0 based frame number of the given timecode
+
+        :param str timecode: A timecode like '01:00:00:00' or '01:00:00;00'
+        :return: int
+        """
+        hours, minutes, seconds, frames = \
+            map(int, timecode.replace(';', ':').split(':'))
+        int_framerate = self.int_framerate
+        total_minutes = 60 * hours + minutes
+        return (total_minutes * 60 + seconds) * int_framerate + frames - \
+            self.drop_frames * (total_minutes - total_minutes // 10)
+
+    def to_timecode(self, frame_number):
+        """returns the timecode of the given 0 based frame number, the
+        negative frame numbers and the frame numbers after 24 hours are
+        wrapped
+
+        :param int frame_number: The frame number
+        :return: str
+        """
+        frame_number %= self.frames_per_day
+
+        drop_frames = self.drop_frames
+        if drop_frames:
+            tens_of_minutes, remainder = \
+                divmod(frame_number, self.frames_per_10_minutes)
+            frame_number += drop_frames * 9 * tens_of_minutes
+            if remainder > drop_frames:
+                frame_number += drop_frames * (
+                    (remainder - drop_frames) // self.frames_per_minute
+                )
+
+        seconds, frames = divmod(frame_number, self.int_framerate)
+        minutes, seconds = divmod(seconds, 60)
+        hours, minutes = divmod(minutes, 60)
+        return '%02d:%02d:%02d%s%02d' % (
+            hours, minutes, seconds, self.frame_delimiter, frames
+        )
+
+
+class EDLEvent(object):
+    """A CMX3600 EDL event.
+
+    The timecodes are stored as 0 based frame numbers.
+    """
+
+    __slots__ = ['num', 'reel', 'track', 'tr_code', 'aux', 'src_start',
+                 'src_end', 'rec_start', 'rec_end', 'clip_name',
+                 'source_file', 'comments']
+
+    template = '%(num)-6s %(reel)-32s %(track)-5s %(tr_code)-3s %(aux)-4s ' \
+               '%(src_start)s %(src_end)s %(rec_start)s %(rec_end)s\n'
+
+    def __init__(self):
+        self.num = None
+        self.reel = None
+        self.track = None
+        self.tr_code = None
+        self.aux = None
+        self.src_start = 0
+        self.src_end = 0
+        self.rec_start = 0
+        self.rec_end = 0
+        self.clip_name = None
+        self.source_file = None
+        self.comments = []
+
+    @classmethod
+    def from_edl_event(cls, edl_event):
+        """creates an EDLEvent from the given edl.Event instance
+
+        :param edl_event: An edl.Event instance
+        :return: :class:`.EDLEvent`
+        """
+        e = cls()
+        e.num = edl_event.num
+        e.reel = edl_event.reel
+        e.track = edl_event.track
+        e.tr_code = edl_event.tr_code
+        e.aux = edl_event.aux
+        e.src_start = edl_event.src_start_tc.frame_number
+        e.src_end = edl_event.src_end_tc.frame_number
+        e.rec_start = edl_event.rec_start_tc.frame_number
+        e.rec_end = edl_event.rec_end_tc.frame_number
+        e.clip_name = edl_event.clip_name
+        e.source_file = edl_event.source_file
+        e.comments = edl_event.comments
+        return e
+
+    def to_string(self, converter):
+        """returns the EDL lines of this event, which are the same with the
+        ``edl.Event.to_string()`` output
+
+        :param converter: The :class:`.TimecodeConverter` of the EDL
+        :return: str
+        """
+        data = self.template % {
+            'num': self.num or '',
+            'reel': self.reel or '',
+            'track': self.track or '',
+            'tr_code': self.tr_code or '',
+            'aux': self.aux or '',
+            'src_start': converter.to_timecode(self.src_start),
+            'src_end': converter.to_timecode(self.src_end),
+            'rec_start': converter.to_timecode(self.rec_start),
+            'rec_end': converter.to_timecode(self.rec_end),
+        }
+        if self.comments:
+            data = '%s%s\n' % (data, '\n'.join(self.comments))
+        return data
+
 
-        return rendered_xmls
+class EDLReader(object):
+    """Reads the events of a CMX3600 EDL file one by one.
+
+    The title, events, ``* FROM CLIP NAME:`` and ``* SOURCE FILE:`` comments
+    are read in the same way with the ``edl`` library, the other lines are
+    skipped::
+
+      with open('/tmp/test.edl') as f:
+          reader = EDLReader(f, TimecodeConverter.get('24'))
+          for event in reader:
+              print(event.reel, event.rec_start)
+          print(reader.title)
+
+    :param file_handler: A file like object or any iterable of lines
+    :param converter: The :class:`.TimecodeConverter` of the EDL
+    """
+
+    title_regex = re.compile(r'TITLE: (.+)')
+    event_regex = re.compile(
+        r'(\d+)\s+(\S+)\s+(\S+)\s+(\S+)\s+(\S*)\s+(\d{1,2}:\d{1,2}:\d{1,2}'
+        r'[:;]\d{1,3})\s+(\d{1,2}:\d{1,2}:\d{1,2}[:;]\d{1,3})\s+(\d{1,2}:'
+        r'\d{1,2}:\d{1,2}[:;]\d{1,3})\s+(\d{1,2}:\d{1,2}:\d{1,2}[:;]'
+        r'\d{1,3})'
+    )
+    comment_regex = re.compile(r'\*\s*(.+)')
+    name_regex = re.compile(r'\*\s*FROM CLIP NAME:(\s+)(.+)')
+    comment_name_regex = re.compile(r'\*\s+FROM\s+CLIP\s+NAME:\s+(.+)')
+    source_regex = re.compile(r'\*\s*SOURCE FILE:(\s+)(.+)')
+
+    def __init__(self, file_handler, converter):
+        self.file_handler = file_handler
+        self.converter = converter
+        self.title = ''
+
+    def __iter__(self):
+        """yields the events, every event is yielded after all of its comment
+        lines are read
+        """
+        to_frames = self.converter.to_frames
+        event = None
+        for line in self.file_handler:
+            m = self.title_regex.match(line)
+            if m:
+                self.title = m.group(1).strip()
+
+            m = self.event_regex.search(line.strip())
+            if m:
+                if event is not None:
+                    yield event
+                event = EDLEvent()
+                (event.num, event.reel, event.track, event.tr_code,
+                 event.aux, src_start, src_end, rec_start, rec_end) = \
+                    [value.strip() for value in m.groups()]
+                event.src_start = to_frames(src_start)
+                event.src_end = to_frames(src_end)
+                event.rec_start = to_frames(rec_start)
+                event.rec_end = to_frames(rec_end)
+
+            if event is None or '*' not in line:
+                continue
+
+            m = self.name_regex.search(line)
+            if m:
+                event.clip_name = m.group(2).strip()
+
+            m = self.source_regex.search(line)
+            if m:
+                event.source_file = m.group(2).strip()
+
+            m = self.comment_regex.search(line)
+            if m:
+                event.comments.append('* %s' % m.group(1))
+                m = self.comment_name_regex.search(line)
+                if m:
+                    event.clip_name = m.group(1).strip()
+
+        if event is not None:
+            yield event
+
+
+class _IntervalNode(object):
+    """A node of the centered interval tree of :class:`.TimelineIndex`.
+
+    The node keeps the intervals that contain its center sorted by their
+    start and end frames. The intervals ending before or at the center are
+    in the left sub tree and the intervals starting after the center are in
+    the right sub tree.
+    """
+
+    __slots__ = ['center', 'left', 'right', 'by_start', 'by_end', 'size']
+
+    def __init__(self, center):
+        self.center = center
+        self.left = None
+        self.right = None
+        # (start, uid, clip) and (end, uid, clip) tuples
+        self.by_start = []
+        self.by_end = []
+        # the number of intervals in this node and its sub trees
+        self.size = 0
+
+
+class TimelineIndex(object):
+    """Indexes the clips by their start and end frames to answer which clips
+    are on a frame or in a frame range without scanning all of the clips.
+
+    The clips are treated as half open ``[start, end)`` frame ranges, so a
+    clip ending at frame 10 and a clip starting at frame 10 are not
+    overlapping. Point queries use a centered interval tree and range
+    queries use the same tree with a list of the clips sorted by their
+    start frames, both run in O(log n + k) time::
+
+      index = TimelineIndex(track.clips)
+      print(index.clips_at(100))
+      print(index.clips_in_range(100, 200))
+      gaps, overlaps = index.find_gaps_and_overlaps()
+
+    The index is updated with :meth:`.add_clip` and :meth:`.remove_clip`. It
+    stores the start and end frames of the clips when they are added, so
+    remove and add a clip again to update the index after changing its
+    ``start`` or ``end``. The tree is kept balanced by rebuilding the sub
+    tree that gets too deep while adding clips (like a scapegoat tree) and
+    the whole tree after removing as many clips as it has. Pass the clips to
+    the constructor instead of adding them one by one to index a lot of
+    clips at once.
+
+    :param clips: The :class:`.Clip` instances to index
+    """
+
+    # a sub tree is rebuilt when it is deeper than
+    # log(size) / log(1 / balance_factor)
+    balance_factor = 0.75
+
+    def __init__(self, clips=None):
+        self._root = None
+        # (start, uid, clip) tuples sorted by the start frame
+        self._by_start = []
+        # the start and end frames of the clips by their uids
+        self._frames = {}
+        self._removed_count = 0
+
+        if clips is not None:
+            frames = self._frames
+            for clip in clips:
+                if id(clip) in frames:
+                    raise ValueError('%s is already in the index' % clip)
+                frames[id(clip)] = (clip.start, clip.end)
+                self._by_start.append((clip.start, id(clip), clip))
+            self._by_start.sort()
+        self._build()
+
+    def __len__(self):
+        return len(self._by_start)
+
+    def __contains__(self, clip):
+        return id(clip) in self._frames
+
+    @property
+    def clips(self):
+        """returns the indexed clips sorted by their start frames
+        """
+        return [entry[2] for entry in self._by_start]
+
+    def _add_entry(self, clip):
+        """adds the clip to the start frame list and returns its uid
+        """
+        uid = id(clip)
+        if uid in self._frames:
+            raise ValueError('%s is already in the index' % clip)
+        self._frames[uid] = (clip.start, clip.end)
+        bisect.insort(self._by_start, (clip.start, uid, clip))
+        return uid
+
+    def _build(self):
+        """builds a balanced interval tree of all of the clips
+        """
+        entries = []
+        for start, uid, clip in self._by_start:
+            end = self._frames[uid][1]
+            if start < end:
+                entries.append((start, end, uid, clip))
+        self._root = self._build_node(entries)
+        self._removed_count = 0
+
+    @classmethod
+    def _build_node(cls, entries):
+        """returns the root node of the interval tree of the given
+        (start, end, uid, clip) tuples sorted by their start frames
+        """
+        if not entries:
+            return None
+
+        # the mid point of the median clip is in that clip, so every node has
+        # at least one clip, and the clips stay sorted in the sub trees
+        i = len(entries) // 2
+        start, end = entries[i][:2]
+        center = (start + end) / 2.0
+        node = _IntervalNode(center)
+        node.size = len(entries)
+
+        # the clips starting after the center are after the median clip
+        i = bisect.bisect_right(entries, (center, float('inf')), i)
+        node.right = cls._build_node(entries[i:])
+
+        entries = entries[:i]
+        node.left = cls._build_node([e for e in entries if e[1] <= center])
+        node.by_start = [(e[0], e[2], e[3]) for e in entries if e[1] > center]
+        node.by_end = sorted((e[1], e[2], e[3]) for e in entries
+                             if e[1] > center)
+        return node
+
+    def _rebuild_node(self, node):
+        """returns a balanced copy of the given sub tree
+        """
+        frames = self._frames
+        entries = []
+        nodes = [node]
+        while nodes:
+            node = nodes.pop()
+            if node is None:
+                continue
+            for start, uid, clip in node.by_start:
+                entries.append((start, frames[uid][1], uid, clip))
+            nodes.append(node.left)
+            nodes.append(node.right)
+        entries.sort(key=lambda entry: (entry[0], entry[2]))
+        return self._build_node(entries)
+
+    def _balance(self, path):
+        """rebuilds the deepest sub tree on the given path from the root that
+        is deeper than it should be for its size
+        """
+        log_factor = -math.log(self.balance_factor)
+        if len(path) <= 1 + math.log(self._root.size) / log_factor:
+            return
+
+        depth = len(path)
+        for i in reversed(range(len(path))):
+            node = path[i]
+            if depth - i > 1 + math.log(max(1, node.size)) / log_factor:
+                break
+        else:
+            i = 0
+            node = self._root
+
+        new_node = self._rebuild_node(node)
+        if not i:
+            self._root = new_node
+        elif path[i - 1].left is node:
+            path[i - 1].left = new_node
+        else:
+            path[i - 1].right = new_node
+
+    def add_clip(self, clip):
+        """adds the given clip to the index
+
+        :param clip: A :class:`.Clip` instance
+        """
+        uid = self._add_entry(clip)
+        start, end = clip.start, clip.end
+        if start >= end:
+            # an empty clip is not on any frame
+            return
+
+        path = []
+        node = self._root
+        while node is not None:
+            path.append(node)
+            if end <= node.center:
+                node = node.left
+            elif start > node.center:
+                node = node.right
+            else:
+                break
+
+        if node is None:
+            node = _IntervalNode((start + end) / 2.0)
+            if not path:
+                self._root = node
+            elif end <= path[-1].center:
+                path[-1].left = node
+            else:
+                path[-1].right = node
+            path.append(node)
+
+        bisect.insort(node.by_start, (start, uid, clip))
+        bisect.insort(node.by_end, (end, uid, clip))
+        for node in path:
+            node.size += 1
+        self._balance(path)
+
+    def remove_clip(self, clip):
+        """removes the given clip from the index
+
+        :param clip: A :class:`.Clip` instance
+        """
+        uid = id(clip)
+        try:
+            start, end = self._frames.pop(uid)
+        except KeyError:
+            raise ValueError('%s is not in the index' % clip)
+
+        i = bisect.bisect_left(self._by_start, (start, uid))
+        del self._by_start[i]
+        if start >= end:
+            return
+
+        node = self._root
+        while True:
+            node.size -= 1
+            if end <= node.center:
+                node = node.left
+            elif start > node.center:
+                node = node.right
+            else:
+                break
+
+        del node.by_start[bisect.bisect_left(node.by_start, (start, uid))]
+        del node.by_end[bisect.bisect_left(node.by_end, (end, uid))]
+
+        # rebuild the tree to drop the nodes with no clips
+        self._removed_count += 1
+        if self._removed_count > max(32, self._root.size):
+            self._build()
+
+    def _entries_at(self, frame):
+        """returns the (start, uid, clip) tuples of the clips that are on the
+        given frame
+        """
+        entries = []
+        node = self._root
+        while node is not None:
+            if frame < node.center:
+                for entry in node.by_start:
+                    if entry[0] > frame:
+                        break
+                    entries.append(entry)
+                node = node.left
+            elif frame > node.center:
+                frames = self._frames
+                for end, uid, clip in reversed(node.by_end):
+                    if end <= frame:
+                        break
+                    entries.append((frames[uid][0], uid, clip))
+                node = node.right
+            else:
+                entries.extend(node.by_start)
+                break
+        return entries
+
+    def clips_at(self, frame):
+        """returns the clips that are on the given frame sorted by their start
+        frames
+
+        :param frame: The frame number
+        :return: list of :class:`.Clip` instances
+        """
+        return [entry[2] for entry in sorted(self._entries_at(frame))]
+
+    def clips_in_range(self, start, end):
+        """returns the clips that are overlapping with the given ``[start,
+        end)`` frame range sorted by their start frames
+
+        :param start: The first frame of the range
+        :param end: The frame after the last frame of the range
+        :return: list of :class:`.Clip` instances
+        """
+        if start >= end:
+            return []
+        entries = sorted(self._entries_at(start))
+        # and the clips starting in the range
+        frames = self._frames
+        i = bisect.bisect_right(self._by_start, (start, float('inf')))
+        j = bisect.bisect_left(self._by_start, (end,), i)
+        entries.extend(entry for entry in self._by_start[i:j]
+                       if frames[entry[1]][1] > entry[0])
+        return [entry[2] for entry in entries]
+
+    def overlapping_clips(self, clip):
+        """returns the other clips that are overlapping with the given clip
+
+        :param clip: A :class:`.Clip` instance
+        :return: list of :class:`.Clip` instances
+        """
+        return [c for c in self.clips_in_range(clip.start, clip.end)
+                if c is not clip]
+
+    def find_gaps_and_overlaps(self):
+        """finds the gaps between the clips and the frame ranges that are
+        covered by more than one clip in a single pass over the clips
+
+        :return: A tuple of two lists of ``(start, end)`` frame ranges, the
+          first one is the gaps and the second one is the overlaps
+        """
+        gaps = []
+        overlaps = []
+        frames = self._frames
+        last_end = None
+        for start, uid, clip in self._by_start:
+            end = frames[uid][1]
+            if start >= end:
+                continue
+
+            if last_end is None:
+                last_end = end
+                continue
+
+            if start > last_end:
+                gaps.append((last_end, start))
+            elif start < last_end:
+                # this clip and the clip ending at last_end are both on the
+                # frames until the end of the shorter one
+                overlap_end = min(end, last_end)
+                if overlaps and overlaps[-1][1] >= start:
+                    if overlap_end > overlaps[-1][1]:
+                        overlaps[-1] = (overlaps[-1][0], overlap_end)
+                else:
+                    overlaps.append((start, overlap_end))
+
+            last_end = max(last_end, end)
+
+        return gaps, overlaps
 
 
 class Media(EditBase):
@@ -454,23 +1415,21 @@ class Media(EditBase):
         video.from_xml(xml_video_tag)
         self.video = video
 
-    def to_xml(self, indentation=2, pre_indent=0):
-        """returns an xml version of this Media object
-        """
-        template = """%(pre_indent)s<media>
-%(video)s
-%(pre_indent)s</media>"""
+    def write_xml(self, file_handler, indentation=2, pre_indent=0):
+        """writes the xml version of this Media object to the given file
+        handler
 
-        video_data = self.video.to_xml(
+        :param file_handler: A file like object with a ``write`` method
+        :param int indentation: The number of spaces per indentation level
+        :param int pre_indent: The number of spaces before this element
+        """
+        file_handler.write('%s<media>\n' % (' ' * pre_indent))
+        self.video.write_xml(
+            file_handler,
             indentation=indentation,
             pre_indent=indentation + pre_indent
         )
-
-        return template % {
-            'video': video_data,
-            'pre_indent': ' ' * pre_indent,
-            'indentation': ' ' * indentation
-        }
+        file_handler.write('\n%s</media>' % (' ' * pre_indent))
 
 
 class Video(EditBase):
@@ -502,8 +1461,28 @@ class Video(EditBase):
 
             self.tracks.append(track)
 
-    def to_xml(self, indentation=2, pre_indent=0):
-        """returns an xml version of this Video object
+    def optimize_clips(self, cross_track=True):
+        """optimizes the clips of all the tracks, see
+        :meth:`.Track.optimize_clips`
+
+        :param bool cross_track: If True (the default), the clips in different
+          tracks that are using the same file also use the same File
+          instance, so the file is written only once to the XML. Otherwise
+          every track is optimized separately.
+        """
+        files = {}
+        for track in self.tracks:
+            if not cross_track:
+                files = {}
+            track.optimize_clips(files=files)
+
+    def write_xml(self, file_handler, indentation=2, pre_indent=0):
+        """writes the xml version of this Video object to the given file
+        handler
+
+        :param file_handler: A file like object with a ``write`` method
+        :param int indentation: The number of spaces per indentation level
+        :param int pre_indent: The number of spaces before this element
         """
         template = """%(pre_indent)s<video>
 %(pre_indent)s%(indentation)s<format>
@@ -512,24 +1491,24 @@ class Video(EditBase):
 %(pre_indent)s%(indentation)s%(indentation)s%(indentation)s<height>%(height)s</height>
 %(pre_indent)s%(indentation)s%(indentation)s</samplecharacteristics>
 %(pre_indent)s%(indentation)s</format>
-%(tracks)s
-%(pre_indent)s</video>"""
-
-        track_data = []
-        for track in self.tracks:
-            track_data.append(
-                track.to_xml(indentation=indentation,
-                             pre_indent=indentation + pre_indent)
-            )
-        track_data_as_str = '\n'.join(track_data)
-
-        return template % {
+"""
+        file_handler.write(template % {
             'width': self.width,
             'height': self.height,
-            'tracks': track_data_as_str,
             'pre_indent': ' ' * pre_indent,
             'indentation': ' ' * indentation
-        }
+        })
+
+        for i, track in enumerate(self.tracks):
+            if i:
+                file_handler.write('\n')
+            track.write_xml(
+                file_handler,
+                indentation=indentation,
+                pre_indent=indentation + pre_indent
+            )
+
+        file_handler.write('\n%s</video>' % (' ' * pre_indent))
 
 
 class Track(EditBase):
@@ -540,34 +1519,126 @@ class Track(EditBase):
         self.locked = False
         self.enabled = True
         self.clips = []
+        self._timeline_index = None
+
+    @property
+    def timeline_index(self):
+        """returns the :class:`.TimelineIndex` of the clips of this track.
+
+        The index is created at the first call and it is kept up to date by
+        :meth:`.add_clip` and :meth:`.remove_clip`. Set it to None after
+        changing the ``clips`` list directly or the frames of a clip to
+        recreate it.
+        """
+        if self._timeline_index is None:
+            self._timeline_index = TimelineIndex(self.clips)
+        return self._timeline_index
+
+    @timeline_index.setter
+    def timeline_index(self, timeline_index):
+        """setter for the timeline_index attribute
+        """
+        self._timeline_index = timeline_index
+
+    def add_clip(self, clip):
+        """appends the given clip to the clips of this track and updates the
+        timeline index if it is created
+
+        :param clip: A :class:`.Clip` instance
+        """
+        self.clips.append(clip)
+        if self._timeline_index is not None:
+            self._timeline_index.add_clip(clip)
+
+    def remove_clip(self, clip):
+        """removes the given clip from the clips of this track and updates the
+        timeline index if it is created
 
-    def optimize_clips(self):
+        :param clip: A :class:`.Clip` instance
+        """
+        self.clips.remove(clip)
+        if self._timeline_index is not None:
+            self._timeline_index.remove_clip(clip)
+
+    def optimize_clips(self, files=None):
         """optimizes files across all clips to use the same file node if two or
-        more clips are using the same files
-        """
-        # check all clip files and set to the same file node if the path is
-        # the same
-        for i in range(len(self.clips)):
-            clip = self.clips[i]
-            # go over the rest of the clips
-            for j in range(i + 1, len(self.clips)):
-                compare_clip = self.clips[j]
-                if clip.file.pathurl == compare_clip.file.pathurl:
-                    compare_clip.file = clip.file
-
-                # also check the ids
-                if clip.id == compare_clip.id:
-                    # get the id randomized part
-                    random_part = clip.id.split(' ')[-1]
-                    if random_part != clip.id:
-                        random_id = int(random_part) + 1
-                        compare_clip.id = '%s %s' % (
-                            clip.id.split(' ')[0],
-                            random_id
-                        )
-                    else:
-                        random_id = 2
-                        compare_clip.id = '%s %s' % (clip.id, random_id)
+        more clips are using the same files, and renames the clips that have
+        the same id with the clips before them by adding or incrementing a
+        number suffix (ex: "shot2", "shot2 2", "shot2 3").
+
+        The clips are indexed by their file pathurls and ids in dictionaries,
+        so it runs in linear time instead of comparing every clip with every
+        other clip.
+
+        :param dict files: A dictionary of pathurls to File instances. Pass
+          the same dictionary for multiple tracks to share the File instances
+          between them, see :meth:`.Video.optimize_clips`.
+        """
+        if files is None:
+            files = {}
+
+        # use the first File instance for the same pathurl
+        for clip in self.clips:
+            if clip.file is not None:
+                clip.file = files.setdefault(clip.file.pathurl, clip.file)
+
+        # Every clip renames the clips after it that have the same id, so the
+        # clips with the same current id are kept in a group and the group is
+        # renamed at once. If there is already a group with the new id, the
+        # two groups are merged (union-find).
+        parents = []
+        group_ids = []
+        # the number of clips in the group that are not processed yet
+        pending_counts = []
+        groups_by_id = {}
+        clip_groups = []
+        for clip in self.clips:
+            group = groups_by_id.get(clip.id)
+            if group is None:
+                group = len(parents)
+                parents.append(group)
+                group_ids.append(clip.id)
+                pending_counts.append(0)
+                groups_by_id[clip.id] = group
+            pending_counts[group] += 1
+            clip_groups.append(group)
+
+        for clip, group in zip(self.clips, clip_groups):
+            # find the root group and compress the path
+            root = group
+            while parents[root] != root:
+                root = parents[root]
+            while parents[group] != root:
+                parents[group], group = root, parents[group]
+
+            clip_id = group_ids[root]
+            clip.id = clip_id
+            pending_counts[root] -= 1
+            if not pending_counts[root]:
+                continue
+
+            # rename the rest of the clips in the group
+            new_id = self._increment_clip_id(clip_id)
+            del groups_by_id[clip_id]
+            other_group = groups_by_id.get(new_id)
+            if other_group is not None:
+                parents[other_group] = root
+                pending_counts[root] += pending_counts[other_group]
+            group_ids[root] = new_id
+            groups_by_id[new_id] = root
+
+    @classmethod
+    def _increment_clip_id(cls, clip_id):
+        """returns the clip id with its number suffix incremented, or with a
+        " 2" suffix if it doesn't have a number suffix
+
+        :param str clip_id: The clip id
+        """
+        # get the id randomized part
+        random_part = clip_id.split(' ')[-1]
+        if random_part != clip_id:
+            return '%s %s' % (clip_id.split(' ')[0], int(random_part) + 1)
+        return '%s %s' % (clip_id, 2)
 
     def from_xml(self, xml_node):
         """Fills attributes with the given XML node
@@ -581,32 +1652,37 @@ class Track(EditBase):
         for clip_tag in xml_node.findall('clipitem'):
             clip = Clip()
             clip.from_xml(clip_tag)
-            self.clips.append(clip)
+            self.add_clip(clip)
 
-    def to_xml(self, indentation=2, pre_indent=0):
-        """returns an xml version of this Track object
+    def write_xml(self, file_handler, indentation=2, pre_indent=0):
+        """writes the xml version of this Track object to the given file
+        handler
+
+        :param file_handler: A file like object with a ``write`` method
+        :param int indentation: The number of spaces per indentation level
+        :param int pre_indent: The number of spaces before this element
         """
         template = """%(pre_indent)s<track>
 %(pre_indent)s%(indentation)s<locked>%(locked)s</locked>
 %(pre_indent)s%(indentation)s<enabled>%(enabled)s</enabled>
-%(clips)s
-%(pre_indent)s</track>"""
-
-        clip_data = []
-        for clip in self.clips:
-            clip_data.append(
-                clip.to_xml(indentation=indentation,
-                            pre_indent=indentation + pre_indent)
-            )
-        clip_data_as_str = '\n'.join(clip_data)
-
-        return template % {
+"""
+        file_handler.write(template % {
             'locked': str(self.locked).upper(),
             'enabled': str(self.enabled).upper(),
-            'clips': clip_data_as_str,
             'pre_indent': ' ' * pre_indent,
             'indentation': ' ' * indentation
-        }
+        })
+
+        for i, clip in enumerate(self.clips):
+            if i:
+                file_handler.write('\n')
+            clip.write_xml(
+                file_handler,
+                indentation=indentation,
+                pre_indent=indentation + pre_indent
+            )
+
+        file_handler.write('\n%s</track>' % (' ' * pre_indent))
 
 
 class Clip(EditBase, NameMixin, DurationMixin):
@@ -697,8 +1773,13 @@ class Clip(EditBase, NameMixin, DurationMixin):
 
             self.file = f
 
-    def to_xml(self, indentation=2, pre_indent=0):
-        """returns an xml version of this Clip object
+    def write_xml(self, file_handler, indentation=2, pre_indent=0):
+        """writes the xml version of this Clip object to the given file
+        handler
+
+        :param file_handler: A file like object with a ``write`` method
+        :param int indentation: The number of spaces per indentation level
+        :param int pre_indent: The number of spaces before this element
         """
         template = """%(pre_indent)s<clipitem id="%(id)s">
 %(pre_indent)s%(indentation)s<end>%(end)i</end>
@@ -706,33 +1787,37 @@ class Clip(EditBase, NameMixin, DurationMixin):
 %(pre_indent)s%(indentation)s<enabled>%(enabled)s</enabled>
 %(pre_indent)s%(indentation)s<start>%(start)i</start>
 %(pre_indent)s%(indentation)s<in>%(in)i</in>
-%(pre_indent)s%(indentation)s<duration>%(duration)i</duration>%(rate)s
-%(pre_indent)s%(indentation)s<out>%(out)i</out>
-%(file)s
-%(pre_indent)s</clipitem>"""
-
-        rate_xml = ''
-        if self.rate:
-            rate_xml = '\n%s' % self.rate.to_xml(
-                indentation=indentation,
-                pre_indent=pre_indent + indentation
-            )
+%(pre_indent)s%(indentation)s<duration>%(duration)i</duration>"""
 
-        return template % {
-            'id': self.id,
+        file_handler.write(template % {
+            'id': escape_xml(self.id),
             'start': self.start,
             'end': self.end,
-            'name': self.name,
+            'name': escape_xml(self.name),
             'enabled': self.enabled,
             'duration': self.duration,
             'in': self.in_,
-            'out': self.out,
-            'file': self.file.to_xml(indentation=indentation,
-                                     pre_indent=pre_indent + indentation),
             'pre_indent': ' ' * pre_indent,
-            'indentation': ' ' * indentation,
-            'rate': rate_xml
-        }
+            'indentation': ' ' * indentation
+        })
+
+        if self.rate:
+            file_handler.write('\n')
+            self.rate.write_xml(
+                file_handler,
+                indentation=indentation,
+                pre_indent=pre_indent + indentation
+            )
+
+        file_handler.write('\n%s%s<out>%i</out>\n' % (
+            ' ' * pre_indent, ' ' * indentation, self.out
+        ))
+        self.file.write_xml(
+            file_handler,
+            indentation=indentation,
+            pre_indent=pre_indent + indentation
+        )
+        file_handler.write('\n%s</clipitem>' % (' ' * pre_indent))
 
 
 class File(EditBase, NameMixin, DurationMixin):
@@ -828,8 +1913,14 @@ class File(EditBase, NameMixin, DurationMixin):
         if pathurl_node is not None:
             self.pathurl = pathurl_node.text
 
-    def to_xml(self, indentation=2, pre_indent=0):
-        """returns an xml version of this File object
+    def write_xml(self, file_handler, indentation=2, pre_indent=0):
+        """writes the xml version of this File object to the given file
+        handler. A File is written only once, the next calls write a
+        reference to it with the same id.
+
+        :param file_handler: A file like object with a ``write`` method
+        :param int indentation: The number of spaces per indentation level
+        :param int pre_indent: The number of spaces before this element
         """
         if self.exported_once:
             template = """%(pre_indent)s<file id="%(id)s"/>"""
@@ -841,14 +1932,14 @@ class File(EditBase, NameMixin, DurationMixin):
 %(pre_indent)s</file>"""
             self.exported_once = True
 
-        return template % {
-            'id': self.id,
+        file_handler.write(template % {
+            'id': escape_xml(self.id),
             'duration': self.duration,
-            'name': self.name,
-            'pathurl': self.pathurl,
+            'name': escape_xml(self.name),
+            'pathurl': escape_xml(self.pathurl),
             'pre_indent': ' ' * pre_indent,
             'indentation': ' ' * indentation
-        }
+        })
 
 
 class Rate(EditBase):
@@ -936,16 +2027,21 @@ class Rate(EditBase):
             self.timebase = rate_tag.find('timebase').text
             self.ntsc = rate_tag.find('ntsc').text.title() == 'True'
 
-    def to_xml(self, indentation=2, pre_indent=0):
-        """returns an xml version of this Media object
+    def write_xml(self, file_handler, indentation=2, pre_indent=0):
+        """writes the xml version of this Rate object to the given file
+        handler
+
+        :param file_handler: A file like object with a ``write`` method
+        :param int indentation: The number of spaces per indentation level
+        :param int pre_indent: The number of spaces before this element
         """
         template = """%(pre_indent)s<rate>
 %(pre_indent)s%(indentation)s<timebase>%(timebase)s</timebase>
 %(pre_indent)s%(indentation)s<ntsc>%(ntsc)s</ntsc>
 %(pre_indent)s</rate>"""
-        return template % {
+        file_handler.write(template % {
             'timebase': self.timebase,
             'ntsc': 'TRUE' if self.ntsc else 'FALSE',
             'pre_indent': ' ' * pre_indent,
             'indentation': ' ' * indentation
-        }
+        })
@@ -3,12 +3,625 @@
 #
 # This module is part of anima-tools and is released under the BSD 2
 # License: http://www.opensource.org/licenses/BSD-2-Clause
+import collections
+import itertools
 import os
+import threading
+import time
 
 from anima import logger, log_file_handler
 from anima.recent import RecentFileManager
 
 
+class RepositoryIndex(object):
+    """A prefix trie of the repository paths to find the repository of a path
+    without querying the database for every path.
+
+    The ``path``, ``windows_path``, ``linux_path`` and ``osx_path`` of all the
+    repositories are loaded with one query, and looking up a path takes a time
+    proportional to its length. The index is reloaded when it is older than
+    ``defaults.repository_index_ttl`` seconds, when a repository is created,
+    updated or deleted in this process or when :meth:`.refresh` is called.
+
+    Use the :meth:`.get` class method to get the instance shared by the whole
+    process::
+
+      index = RepositoryIndex.get()
+      repo = index.find_repo('/mnt/T/Project/Some/File.ma')
+      repos = index.find_repos(['/mnt/T/Project/Some/File.ma',
+                                'T:/Project/Some/Other/File.ma'])
+
+    :param float ttl: The time in seconds that the index is valid, the
+      default is ``defaults.repository_index_ttl``.
+    """
+
+    # the order of the paths that are checked for a repository
+    path_attributes = ['path', 'windows_path', 'linux_path', 'osx_path']
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, ttl=None):
+        if ttl is None:
+            from anima import defaults
+            ttl = defaults.repository_index_ttl
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self._trie = {}
+        self._loaded_at = None
+
+    @classmethod
+    def get(cls):
+        """returns the RepositoryIndex instance shared by the whole process
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                cls._listen_repository_changes()
+        return cls._instance
+
+    @classmethod
+    def _listen_repository_changes(cls):
+        """invalidates the shared index when a Repository is created, updated
+        or deleted
+        """
+        from sqlalchemy import event
+        from stalker import Repository
+
+        def invalidate(mapper, connection, target):
+            if cls._instance is not None:
+                cls._instance.invalidate()
+
+        for event_name in ['after_insert', 'after_update', 'after_delete']:
+            event.listen(Repository, event_name, invalidate)
+
+    @property
+    def is_expired(self):
+        """returns True if the index needs to be reloaded
+        """
+        return self._loaded_at is None \
+            or time.time() - self._loaded_at > self.ttl
+
+    def invalidate(self):
+        """marks the index to be reloaded at the next lookup
+        """
+        self._loaded_at = None
+
+    def refresh(self):
+        """reloads the repository paths from the database
+        """
+        from stalker import Repository
+        trie = {}
+        for repo_index, repo in enumerate(Repository.query.all()):
+            for path_index, attr_name in enumerate(self.path_attributes):
+                repo_path = getattr(repo, attr_name)
+                if repo_path is None:
+                    continue
+                node = trie
+                for char in repo_path:
+                    node = node.setdefault(char, {})
+                # the key None holds the repos ending at this node
+                node.setdefault(None, []).append(
+                    (repo_index, path_index, repo.id, len(repo_path))
+                )
+
+        with self.lock:
+            self._trie = trie
+            self._loaded_at = time.time()
+
+    def _match(self, path):
+        """returns the id of the repository of the given path and the length
+        of the repository path in the given path or (None, 0).
+
+        The first repository in the query order which has a path that the
+        given path starts with is returned, and for that repository its first
+        matching path in :attr:`.path_attributes` order is used.
+
+        :param str path: The path
+        """
+        with self.lock:
+            node = self._trie
+        best = node.get(None, [])[:]
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                break
+            best.extend(node.get(None, []))
+
+        if not best:
+            return None, 0
+        repo_index, path_index, repo_id, length = min(best)
+        return repo_id, length
+
+    def _match_all(self, paths):
+        """returns a list of (repo_id, length) tuples of the given paths,
+        reloads the index if it is expired
+        """
+        with self.lock:
+            if self.is_expired:
+                self.refresh()
+        return [self._match(path) for path in paths]
+
+    def _get_repos(self, repo_ids):
+        """returns a dictionary of the repositories with the given ids,
+        reloads the index if a repository is not found
+        """
+        from stalker import Repository
+        repo_ids = set(repo_ids)
+        repo_ids.discard(None)
+        repos = {}
+        for repo_id in repo_ids:
+            # uses the identity map of the session if it is already loaded
+            repo = Repository.query.get(repo_id)
+            if repo is None:
+                # the repository is deleted in another process
+                self.invalidate()
+            repos[repo_id] = repo
+        return repos
+
+    def find_repo(self, path):
+        """returns the repository from the given path or None
+
+        :param str path: path in a repository
+        :return: stalker.models.repository.Repository
+        """
+        return self.find_repos([path])[0]
+
+    def find_repos(self, paths):
+        """returns the repositories of the given paths in one go, None for the
+        paths that are not in a repository
+
+        :param list paths: A list of paths
+        :return: list of stalker.models.repository.Repository instances
+        """
+        matches = self._match_all(paths)
+        repos = self._get_repos([repo_id for repo_id, _ in matches])
+        if None in repos.values():
+            matches = self._match_all(paths)
+            repos = self._get_repos([repo_id for repo_id, _ in matches])
+        return [repos.get(repo_id) for repo_id, _ in matches]
+
+    def trim_repo_path(self, path):
+        """Trims the repository path value from the given path
+
+        :param str path: The path that wanted to be trimmed
+        :return: str
+        """
+        return self.trim_repo_paths([path])[0]
+
+    def trim_repo_paths(self, paths):
+        """Trims the repository path values from the given paths in one go
+
+        :param list paths: The paths that wanted to be trimmed
+        :return: list of str
+        """
+        return [path[length:] for path, (_, length) in
+                zip(paths, self._match_all(paths))]
+
+    def to_os_independent_paths(self, paths):
+        """Replaces the repository part of the given paths with the
+        repository environment variable like
+        ``Repository.to_os_independent_path()`` but in one go.
+
+        :param list paths: The paths
+        :return: list of str
+        """
+        return [
+            '$%s/%s' % (repo.env_var, repo.make_relative(path))
+            if repo else path
+            for path, repo in zip(paths, self.find_repos(paths))
+        ]
+
+
+class VersionLookupCache(object):
+    """Memoizes the Version lookups for the lifetime of an operation like a
+    save or a publish.
+
+    It is opt-in and used as a context manager, the lookups that are done in
+    the ``with`` block in the same thread are cached::
+
+      with VersionLookupCache() as cache:
+          env.save_as(version)
+
+      print(cache.hits, cache.misses)
+
+    Versions are cached by their os independent full path, and the latest
+    published Versions by their task id and take name. The cache is cleared
+    when the database session is committed, or explicitly by calling
+    :meth:`.invalidate`.
+
+    The ``hits`` and ``misses`` attributes are ``collections.Counter``
+    instances counting the lookups per lookup type (``'path'`` and
+    ``'latest_published_version'``).
+    """
+
+    # per thread stack of the active caches
+    _thread_data = threading.local()
+
+    def __init__(self):
+        self.data = collections.defaultdict(dict)
+        self.hits = collections.Counter()
+        self.misses = collections.Counter()
+        self._session = None
+
+    def __repr__(self):
+        return '<VersionLookupCache hits=%i misses=%i>' % (
+            sum(self.hits.values()), sum(self.misses.values())
+        )
+
+    def __enter__(self):
+        self._get_stack().append(self)
+        from sqlalchemy import event
+        from stalker.db.session import DBSession
+        self._session = DBSession()
+        event.listen(self._session, 'after_commit', self._after_commit)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        from sqlalchemy import event
+        event.remove(self._session, 'after_commit', self._after_commit)
+        self._session = None
+        self._get_stack().remove(self)
+        return False
+
+    @classmethod
+    def _get_stack(cls):
+        """returns the stack of active caches of the current thread
+        """
+        try:
+            return cls._thread_data.stack
+        except AttributeError:
+            cls._thread_data.stack = []
+            return cls._thread_data.stack
+
+    @classmethod
+    def current(cls):
+        """returns the active cache of the current thread or None
+        """
+        stack = cls._get_stack()
+        if stack:
+            return stack[-1]
+
+    def _after_commit(self, session):
+        """invalidates the cache after the session is committed
+        """
+        self.invalidate()
+
+    def invalidate(self):
+        """clears the cached values, the counters are kept
+        """
+        self.data.clear()
+
+    def get(self, lookup_type, key, loader):
+        """Returns the cached value of the given key or loads and caches it.
+
+        :param str lookup_type: The lookup type, like ``'path'``.
+        :param key: The key of the value.
+        :param loader: A callable returning the value if it is not cached.
+        """
+        data = self.data[lookup_type]
+        try:
+            value = data[key]
+        except KeyError:
+            self.misses[lookup_type] += 1
+            value = loader()
+            data[key] = value
+        else:
+            self.hits[lookup_type] += 1
+        return value
+
+    def get_many(self, lookup_type, keys):
+        """Returns the cached values of the given keys and the keys that are
+        not cached.
+
+        :param str lookup_type: The lookup type, like ``'path'``.
+        :param list keys: The keys.
+        :return: A dictionary of the cached values and a list of the keys
+          that are not cached.
+        """
+        data = self.data[lookup_type]
+        found = {}
+        missing = []
+        for key in keys:
+            if key in data:
+                found[key] = data[key]
+            else:
+                missing.append(key)
+        self.hits[lookup_type] += len(found)
+        self.misses[lookup_type] += len(missing)
+        return found, missing
+
+    def set(self, lookup_type, key, value):
+        """caches the given value
+
+        :param str lookup_type: The lookup type, like ``'path'``.
+        :param key: The key of the value.
+        :param value: The value.
+        """
+        self.data[lookup_type][key] = value
+
+    @classmethod
+    def lookup(cls, lookup_type, key, loader):
+        """Returns the value from the active cache of the current thread or
+        calls the loader if there is no active cache.
+
+        :param str lookup_type: The lookup type, like ``'path'``.
+        :param key: The key of the value.
+        :param loader: A callable returning the value.
+        """
+        cache = cls.current()
+        if cache is None:
+            return loader()
+        return cache.get(lookup_type, key, loader)
+
+    @classmethod
+    def get_latest_published_version(cls, task, take_name):
+        """returns the latest published Version of the given task and take
+        name
+
+        :param task: A :class:`~stalker.models.task.Task` instance
+        :param str take_name: The take name
+        """
+        from stalker import Version
+
+        def query():
+            return Version.query\
+                .filter_by(task=task)\
+                .filter_by(take_name=take_name)\
+                .filter_by(is_published=True)\
+                .order_by(Version.version_number.desc())\
+                .first()
+
+        return cls.lookup(
+            'latest_published_version', (task.id, take_name), query
+        )
+
+
+class ReferenceResolver(object):
+    """Resolves the referenced Versions of a Version to the ones that needs to
+    be left as they are, updated or created, like
+    :meth:`.EnvironmentBase.check_referenced_versions`.
+
+    The whole input graph of the Version and the latest published Versions
+    of all the involved tasks and takes are loaded with a few bulk queries,
+    instead of lazy loading them Version by Version::
+
+      resolver = ReferenceResolver(version)
+      reference_resolution = resolver.resolve()
+
+    :param version: The :class:`~stalker.models.version.Version` instance.
+    :param int chunk_size: The number of ids in one query, the default is
+      ``defaults.version_query_chunk_size``.
+    """
+
+    def __init__(self, version, chunk_size=None):
+        if chunk_size is None:
+            from anima import defaults
+            chunk_size = defaults.version_query_chunk_size
+        self.chunk_size = chunk_size
+        self.version = version
+
+        # the loaded versions by id
+        self.versions = {}
+        # the latest published versions by (task_id, take_name)
+        self.latest_published_versions = {}
+        # the input ids of the latest published versions
+        self.latest_published_version_input_ids = {}
+
+        self.load()
+
+    def _chunks(self, items):
+        """yields the given items in chunks
+        """
+        items = list(items)
+        for i in range(0, len(items), self.chunk_size):
+            yield items[i:i + self.chunk_size]
+
+    def _query_input_ids(self, version_ids):
+        """returns a dictionary of the given version ids and their input ids
+        """
+        from stalker.db.session import DBSession
+        from stalker.models.version import Version_Inputs
+        input_ids = {}
+        for chunk in self._chunks(version_ids):
+            for version_id, link_id in DBSession\
+                    .query(Version_Inputs.c.version_id,
+                           Version_Inputs.c.link_id)\
+                    .filter(Version_Inputs.c.version_id.in_(chunk)).all():
+                input_ids.setdefault(version_id, []).append(link_id)
+        return input_ids
+
+    def _load_versions(self, version_ids):
+        """loads the versions with the given ids which are not loaded yet
+        """
+        from stalker import Version
+        version_ids = set(version_ids).difference(self.versions)
+        for chunk in self._chunks(version_ids):
+            for version in Version.query.filter(Version.id.in_(chunk)).all():
+                self.versions[version.id] = version
+
+    def load(self):
+        """loads the input graph and the latest published versions
+        """
+        from sqlalchemy import inspect
+        from sqlalchemy.orm.attributes import set_committed_value
+
+        # load the inputs level by level
+        self.versions = {self.version.id: self.version}
+        visited = set([self.version.id])
+        level = [self.version]
+        while level:
+            # the versions with inputs already loaded are used as they are
+            unloaded_versions = [
+                v for v in level if 'inputs' in inspect(v).unloaded
+            ]
+            input_ids = \
+                self._query_input_ids([v.id for v in unloaded_versions])
+            self._load_versions(
+                itertools.chain.from_iterable(input_ids.values())
+            )
+            for v in unloaded_versions:
+                ids = input_ids.get(v.id, [])
+                # Links which are not Versions are lazy loaded
+                if all(i in self.versions for i in ids):
+                    set_committed_value(
+                        v, 'inputs', [self.versions[i] for i in ids]
+                    )
+
+            next_level = []
+            for v in level:
+                for input_v in v.inputs:
+                    self.versions.setdefault(input_v.id, input_v)
+                    if input_v.id not in visited:
+                        visited.add(input_v.id)
+                        next_level.append(input_v)
+            level = next_level
+
+        self._load_latest_published_versions()
+
+    def _load_latest_published_versions(self):
+        """loads the latest published versions of the tasks and takes of the
+        loaded versions and their inputs
+        """
+        from sqlalchemy import and_, func
+        from stalker import Version
+        from stalker.db.session import DBSession
+
+        keys = set((v.task_id, v.take_name) for v in self.versions.values())
+        self.latest_published_versions = dict((key, None) for key in keys)
+        task_ids = set(task_id for task_id, _ in keys)
+        for chunk in self._chunks(task_ids):
+            latest_version_numbers = DBSession\
+                .query(Version.task_id, Version.take_name,
+                       func.max(Version.version_number).label('number'))\
+                .filter(Version.is_published == True)\
+                .filter(Version.task_id.in_(chunk))\
+                .group_by(Version.task_id, Version.take_name)\
+                .subquery()
+            for version in Version.query.join(
+                    latest_version_numbers,
+                    and_(
+                        Version.task_id == latest_version_numbers.c.task_id,
+                        Version.take_name ==
+                        latest_version_numbers.c.take_name,
+                        Version.version_number ==
+                        latest_version_numbers.c.number
+                    ))\
+                    .filter(Version.is_published == True).all():
+                key = (version.task_id, version.take_name)
+                if key in keys:
+                    self.latest_published_versions[key] = version
+
+        # share them with the active lookup cache
+        cache = VersionLookupCache.current()
+        if cache:
+            for key, version in self.latest_published_versions.items():
+                cache.set('latest_published_version', key, version)
+
+        # the inputs of the latest published versions
+        from sqlalchemy import inspect
+        latest_published_versions = \
+            [v for v in self.latest_published_versions.values() if v]
+        unloaded_ids = [
+            v.id for v in latest_published_versions
+            if 'inputs' in inspect(v).unloaded
+        ]
+        self.latest_published_version_input_ids = dict(
+            (version_id, set(input_ids))
+            for version_id, input_ids
+            in self._query_input_ids(unloaded_ids).items()
+        )
+        for v in latest_published_versions:
+            if v.id not in unloaded_ids:
+                self.latest_published_version_input_ids[v.id] = \
+                    set(input_v.id for input_v in v.inputs)
+
+    def latest_published_version(self, version):
+        """returns the latest published version of the given version
+        """
+        return self.latest_published_versions.get(
+            (version.task_id, version.take_name)
+        )
+
+    def is_latest_published_version(self, version):
+        """returns True if the given version is the latest published version
+        """
+        if not version.is_published:
+            return False
+        latest_published_version = self.latest_published_version(version)
+        return latest_published_version is not None \
+            and latest_published_version.id == version.id
+
+    def resolve(self, reference_resolution=None):
+        """Returns the reference resolution dictionary of the version, see
+        :meth:`.EnvironmentBase.check_referenced_versions` for details.
+
+        :param dict reference_resolution: A reference resolution dictionary to
+          fill, the default is an empty one.
+        :return: dictionary
+        """
+        if reference_resolution is None:
+            from anima.env import empty_reference_resolution
+            reference_resolution = empty_reference_resolution()
+
+        # the ids of the versions in 'update' and 'create'
+        changed_ids = set()
+
+        # reverse walk in DFS
+        dfs_version_references = list(self.version.walk_inputs())
+
+        # pop the first element which is the current scene
+        dfs_version_references.pop(0)
+
+        # iterate back in the list
+        for v in reversed(dfs_version_references):
+            # check inputs first
+            to_be_updated_list = [
+                ref_v for ref_v in v.inputs
+                if not self.is_latest_published_version(ref_v)
+            ]
+
+            if to_be_updated_list:
+                action = 'create'
+                # check if there is a new published version of this version
+                # that is using all the updated versions of the references
+                latest_published_version = self.latest_published_version(v)
+                if latest_published_version and \
+                   not self.is_latest_published_version(v):
+                    # so there is a new published version, check if the
+                    # updated child versions are already referenced to it
+                    input_ids = self.latest_published_version_input_ids.get(
+                        latest_published_version.id, set()
+                    )
+                    latest_ref_versions = [
+                        self.latest_published_version(ref_v)
+                        for ref_v in to_be_updated_list
+                    ]
+                    if all([ref_v is not None and ref_v.id in input_ids
+                            for ref_v in latest_ref_versions]):
+                        # just update to this latest published version
+                        action = 'update'
+            else:
+                # nothing needs to be updated, so check if this version has a
+                # new version
+                if self.is_latest_published_version(v):
+                    action = 'leave'
+                else:
+                    action = 'update'
+
+                # if any of the inputs are updated or created then this one
+                # needs to be created
+                if any(rev_v.id in changed_ids for rev_v in v.inputs):
+                    action = 'create'
+
+            # so append this v to the related action list
+            reference_resolution[action].append(v)
+            if action != 'leave':
+                changed_ids.add(v.id)
+
+        return reference_resolution
+
+
 class EnvironmentBase(object):
     """Connects the environment (the host program) to Stalker.
 
@@ -140,22 +753,15 @@ class EnvironmentBase(object):
         :param path: The path that wanted to be trimmed
         :return: str
         """
-        # get the repo first
-        repo = self.find_repo(path)
+        return RepositoryIndex.get().trim_repo_path(path)
 
-        if not repo:
-            return path
+    def trim_repo_paths(self, paths):
+        """Trims the repository path values from the given paths in one go
 
-        # then try to trim the path
-        if path.startswith(repo.path):
-            return path[len(repo.path):]
-        elif path.startswith(repo.windows_path):
-            return path[len(repo.windows_path):]
-        elif path.startswith(repo.linux_path):
-            return path[len(repo.linux_path):]
-        elif path.startswith(repo.osx_path):
-            return path[len(repo.osx_path):]
-        return path
+        :param list paths: The paths that wanted to be trimmed
+        :return: list of str
+        """
+        return RepositoryIndex.get().trim_repo_paths(paths)
 
     @classmethod
     def find_repo(cls, path):
@@ -166,20 +772,17 @@ class EnvironmentBase(object):
         """
         # path could be using environment variables so expand them
         # path = os.path.expandvars(path)
+        return RepositoryIndex.get().find_repo(path)
 
-        # first find the repository
-        from stalker import Repository
+    @classmethod
+    def find_repos(cls, paths):
+        """returns the repositories of the given paths in one go
 
-        repos = Repository.query.all()
-        found_repo = None
-        for repo in repos:
-            if path.startswith(repo.path) \
-               or path.startswith(repo.windows_path) \
-               or path.startswith(repo.linux_path) \
-               or path.startswith(repo.osx_path):
-                found_repo = repo
-                break
-        return found_repo
+        :param list paths: paths in repositories
+        :return: list of stalker.models.repository.Repository instances, None
+          for the paths that are not in a repository
+        """
+        return RepositoryIndex.get().find_repos(paths)
 
     def get_versions_from_path(self, path):
         """Finds Version instances from the given path value.
@@ -235,22 +838,68 @@ class EnvironmentBase(object):
         :return: :class:`~stalker.models.version.Version`
         """
         logger.debug('full_path: %s' % full_path)
-        # convert '\\' to '/'
-        full_path = os.path.normpath(
-            os.path.expandvars(full_path)
-        ).replace('\\', '/')
+        version = cls.get_versions_from_full_paths([full_path])[full_path]
+        logger.debug('version: %s' % version)
+        return version
 
-        # trim repo path
-        from stalker import Repository, Version
-        os_independent_path = Repository.to_os_independent_path(full_path)
+    @classmethod
+    def get_versions_from_full_paths(cls, full_paths, chunk_size=None):
+        """Finds the Version instances of the given full paths in one go.
+
+        The paths are normalized and converted to os independent paths, and
+        the versions are queried in chunks of ``chunk_size`` paths, so
+        resolving thousands of paths needs only a few queries.
+
+        :param list full_paths: The full paths of the desired
+          :class:`~stalker.models.version.Version` instances.
+        :param int chunk_size: The number of paths in one query, the default
+          is ``defaults.version_query_chunk_size``.
+        :return: A dictionary of the given paths and the
+          :class:`~stalker.models.version.Version` instances, the value is None
+          for the paths without a Version.
+        """
+        if chunk_size is None:
+            from anima import defaults
+            chunk_size = defaults.version_query_chunk_size
 
-        # try to get a version with that info
-        logger.debug('getting a version with path: %s' % full_path)
+        # convert '\\' to '/'
+        unique_paths = list(set(full_paths))
+        normalized_paths = [
+            os.path.normpath(os.path.expandvars(full_path)).replace('\\', '/')
+            for full_path in unique_paths
+        ]
 
-        version = Version.query\
-            .filter(Version.full_path == os_independent_path).first()
-        logger.debug('version: %s' % version)
-        return version
+        # trim repo path
+        os_independent_paths = \
+            RepositoryIndex.get().to_os_independent_paths(normalized_paths)
+
+        # use the cached versions
+        query_paths = sorted(set(os_independent_paths))
+        versions_by_full_path = {}
+        cache = VersionLookupCache.current()
+        if cache:
+            versions_by_full_path, query_paths = \
+                cache.get_many('path', query_paths)
+
+        # try to get the versions with that info
+        from stalker import Version
+        for i in range(0, len(query_paths), chunk_size):
+            chunk = query_paths[i:i + chunk_size]
+            logger.debug('getting versions with %i paths' % len(chunk))
+            for version in Version.query\
+                    .filter(Version.full_path.in_(chunk)).all():
+                versions_by_full_path.setdefault(version.full_path, version)
+
+        if cache:
+            for query_path in query_paths:
+                version = versions_by_full_path.get(query_path)
+                cache.set('path', query_path, version)
+
+        return dict(
+            (full_path, versions_by_full_path.get(os_independent_path))
+            for full_path, os_independent_path
+            in zip(unique_paths, os_independent_paths)
+        )
 
     def get_current_version(self):
         """Returns the current Version instance from the environment.
@@ -289,8 +938,9 @@ class EnvironmentBase(object):
             recent_files = None
 
         if recent_files is not None:
+            versions = self.get_versions_from_full_paths(recent_files)
             for recent_file in recent_files:
-                version = self.get_version_from_full_path(recent_file)
+                version = versions[recent_file]
                 if version is not None:
                     break
 
@@ -14,7 +14,7 @@ import time
 
 from anima import logger
 from anima.env import empty_reference_resolution
-from anima.env.base import EnvironmentBase
+from anima.env.base import EnvironmentBase, ReferenceResolver
 from anima.env.mayaEnv import extension  # register extensions
 from anima.exc import PublishError
 from anima.repr import Representation
@@ -1170,6 +1170,10 @@ workspace -fr "furAttrMap" "Outputs/data/renderData/fur/furAttrMap";
                 'in total' % (parent_ref, ref_count)
             )
 
+        # get the versions of all the paths in one go
+        versions_by_path = \
+            self.get_versions_from_full_paths([ref.path for ref in refs])
+
         prev_path = ''
         versions = []
         logger.debug('loop through %i references' % ref_count)
@@ -1177,8 +1181,7 @@ workspace -fr "furAttrMap" "Outputs/data/renderData/fur/furAttrMap";
             logger.debug('checking ref: %s' % ref.path)
             path = ref.path
             if path != prev_path:
-                # try to get a version with the given path
-                version = self.get_version_from_full_path(path)
+                version = versions_by_path[path]
                 if version:
                     # check if this is a representation
                     if Representation.repr_separator in version.take_name:
@@ -1251,7 +1254,10 @@ workspace -fr "furAttrMap" "Outputs/data/renderData/fur/furAttrMap";
         references = sorted(pm.listReferences(), key=lambda x: x.path)
 
         # optimize it:
-        #   do only one search for each references to the same version
+        #   do only one search for all the references
+        versions_by_path = self.get_versions_from_full_paths(
+            [reference.path for reference in references]
+        )
         previous_ref_path = None
         previous_full_path = None
 
@@ -1264,7 +1270,7 @@ workspace -fr "furAttrMap" "Outputs/data/renderData/fur/furAttrMap";
             if path == previous_ref_path:
                 full_path = previous_full_path
             else:
-                version = self.get_version_from_full_path(path)
+                version = versions_by_path[path]
                 if version in reference_resolution['update']:
                     latest_published_version = version.latest_published_version
                     full_path = latest_published_version.absolute_full_path
@@ -1546,35 +1552,21 @@ workspace -fr "furAttrMap" "Outputs/data/renderData/fur/furAttrMap";
 
     def deep_version_inputs_update(self):
         """updates the inputs of the references of the current scene
+
+        The first level references are read from the current scene and the
+        deeper references are read directly from the referenced files with a
+        :class:`~anima.env.reference_scanner.ReferenceScanner`, so the nested
+        references don't need to be loaded.
         """
         # first update with data from first level references
         self.update_version_inputs()
 
-        # the go to the references
-        references_list = pm.listReferences()
-
-        prev_ref_path = None
-        while len(references_list):
-            current_ref = references_list.pop(0)
-            logger.debug('current_ref: %s' % current_ref.path)
-            self.update_version_inputs(current_ref)
-            # optimize it by only appending one instance of the same referenced
-            # file
-            # sort the references according to their paths so, all the
-            # references of the same file will be got together
-            logger.debug('sorting references')
-            all_refs = sorted(
-                pm.listReferences(current_ref),
-                key=lambda x: x.path
-            )
-            logger.debug('filtering references')
-            for ref in all_refs:
-                if ref.path != prev_ref_path:
-                    prev_ref_path = ref.path
-                    references_list.append(ref)
-
-            prev_ref_path = None
-            logger.debug('advancing to next ref')
+        # then read the referenced files
+        from anima.env.reference_scanner import ReferenceScanner
+        scanner = ReferenceScanner()
+        scanner.update_version_inputs(
+            [ref.path for ref in pm.listReferences()]
+        )
 
     def check_referenced_versions(self):
         """Deeply checks all the references in the scene and returns a
@@ -1615,88 +1607,16 @@ workspace -fr "furAttrMap" "Outputs/data/renderData/fur/furAttrMap";
             empty_reference_resolution(root=self.get_referenced_versions())
         caller.step()
 
-        # reverse walk in DFS
-        dfs_version_references = []
-
         version = self.get_current_version()
         if not version:
             return reference_resolution
 
-        for v in version.walk_inputs():
-            dfs_version_references.append(v)
+        # load the whole input graph in bulk
+        resolver = ReferenceResolver(version)
         caller.step()
-
-        # pop the first element which is the current scene
-        dfs_version_references.pop(0)
-
         caller.end_progress()
 
-        # register a new caller
-        caller = pdm.register(
-            len(dfs_version_references),
-            'Maya.check_referenced_versions()'
-        )
-
-        # iterate back in the list
-        for v in reversed(dfs_version_references):
-            # check inputs first
-            to_be_updated_list = []
-            for ref_v in v.inputs:
-                if not ref_v.is_latest_published_version():
-                    to_be_updated_list.append(ref_v)
-
-            if to_be_updated_list:
-                action = 'create'
-                # check if there is a new published version of this version
-                # that is using all the updated versions of the references
-                latest_published_version = v.latest_published_version
-                if latest_published_version and \
-                   not v.is_latest_published_version():
-                    # so there is a new published version
-                    # check if its children needs any update
-                    # and the updated child versions are already
-                    # referenced to the this published version
-                    if all([ref_v.latest_published_version
-                            in latest_published_version.inputs
-                            for ref_v in to_be_updated_list]):
-                        # so all new versions are referenced to this published
-                        # version, just update to this latest published version
-                        action = 'update'
-                    else:
-                        # not all references are in the inputs
-                        # so we need to create a new version as usual
-                        # and update the references to the latest versions
-                        action = 'create'
-            else:
-                # nothing needs to be updated,
-                # so check if this version has a new version,
-                # also there could be no reference under this referenced
-                # version
-                if v.is_latest_published_version():
-                    # do nothing
-                    action = 'leave'
-                else:
-                    # update to latest published version
-                    action = 'update'
-
-                # before setting the action check all the inputs in
-                # resolution_dictionary, if any of them are update, or create
-                # then set this one to 'create'
-                if any(rev_v in reference_resolution['update'] or
-                       rev_v in reference_resolution['create']
-                       for rev_v in v.inputs):
-                    action = 'create'
-
-            # so append this v to the related action list
-            reference_resolution[action].append(v)
-
-            # from stalker import Version
-            # assert isinstance(v, Version)
-            caller.step(message=v.nice_name)
-
-        caller.end_progress()
-
-        return reference_resolution
+        return resolver.resolve(reference_resolution)
 
     def update_versions(self, reference_resolution):
         """Updates maya versions with the given reference_resolution.
@@ -1753,8 +1673,10 @@ workspace -fr "furAttrMap" "Outputs/data/renderData/fur/furAttrMap";
         # order to the path
         references_list = sorted(references_list, key=lambda x: x.path)
 
-        prev_path = ''
-        prev_vers = None
+        # get the versions of all the references in one go
+        versions_by_path = self.get_versions_from_full_paths(
+            [ref.path for ref in references_list]
+        )
 
         # use a progress window for that
         wrp = MayaMainProgressBarWrapper()
@@ -1767,15 +1689,8 @@ workspace -fr "furAttrMap" "Outputs/data/renderData/fur/furAttrMap";
             #current_ref = references_list.pop(0)
             current_ref = ref
 
-            current_ref_path = current_ref.path
-
-            if current_ref_path != prev_path:
-                # get current version
-                current_version = \
-                    self.get_version_from_full_path(current_ref_path)
-                prev_vers = current_version
-            else:
-                current_version = prev_vers
+            # get current version
+            current_version = versions_by_path[current_ref.path]
 
             # update to a new version if present
             if current_version in reference_resolution['update']:
@@ -1857,9 +1772,13 @@ workspace -fr "furAttrMap" "Outputs/data/renderData/fur/furAttrMap";
             updated_namespaces = True
 
         # replace first level reference namespaces
-        for ref in pm.listReferences():
+        references = pm.listReferences()
+        versions_by_path = self.get_versions_from_full_paths(
+            [ref.path for ref in references]
+        )
+        for ref in references:
             # replace any possible old namespace with current one
-            ref_version = self.get_version_from_full_path(ref.path)
+            ref_version = versions_by_path[ref.path]
             old_namespace = ref.namespace
             try:
                 new_namespace = ref_version.nice_name
@@ -1998,8 +1917,10 @@ workspace -fr "furAttrMap" "Outputs/data/renderData/fur/furAttrMap";
                                  'Maya.fix_reference_namespaces()')
 
             from stalker import Version
+            versions_by_path = \
+                self.get_versions_from_full_paths(to_update_paths)
             for path in to_update_paths:
-                vers = self.get_version_from_full_path(path)
+                vers = versions_by_path[path]
 
                 logger.debug('vers: %s' % vers)
                 if not vers:
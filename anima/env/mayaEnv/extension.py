@@ -5,7 +5,6 @@
 # License: http://www.opensource.org/licenses/BSD-2-Clause
 
 import os
-import subprocess
 import tempfile
 import platform
 from contextlib import contextmanager
@@ -15,7 +14,8 @@ from pymel.core.uitypes import CheckBox, TextField
 from pymel.core.general import Attribute
 from pymel.core.system import FileReference
 
-from anima.edit import Sequence, Media, Video, Track, Clip, File, Rate
+from anima.edit import (Sequence, Media, Video, Track, Clip, File, Rate,
+                        run_metafuze_jobs)
 from anima.extension import extends
 from anima.repr import Representation
 
@@ -432,19 +432,12 @@ class SequenceManagerExtension(object):
                 (self.__class__.__name__, path.__class__.__name__)
             )
 
-        from xml.etree import ElementTree
-
+        seq = Sequence()
         try:
-            tree = ElementTree.parse(path)
+            seq.from_xml_file(path)
         except IOError:
             raise IOError('Please supply a valid path to an XML file!')
 
-        root = tree.getroot()
-        seq = Sequence()
-        xml_seq = root.getchildren()[0]
-
-        seq.from_xml(xml_seq)
-
         self.from_seq(seq)
 
     @extends(pm.nodetypes.SequenceManager)
@@ -739,39 +732,27 @@ class SequencerExtension(object):
         return seq.to_edl()
 
     @extends(pm.nodetypes.Sequencer)
-    def metafuze(self):
+    def metafuze(self, worker_count=None):
         """Calls "Avid Metafuze" with the given xml content to convert media
         files to MXF format.
 
-        :return: list of file path
-        """
+        The MetaFuze job files are written to a temp folder and the
+        conversions are run in parallel, the shots that are already converted
+        with the same settings are skipped, see
+        :func:`anima.edit.run_metafuze_jobs`.
 
+        :param int worker_count: The maximum number of conversions running at
+          the same time, the default is the number of cpus.
+        :return: yields the index of every finished conversion
+        """
         sm = pm.PyNode('sequenceManager1')
         seq = sm.generate_sequence_structure()
-        xmls = seq.to_metafuze_xml()
+        jobs = seq.to_metafuze_jobs()
 
-        # write the given content to tmp
-        for i, xml in enumerate(xmls):
-            temp_file_path = tempfile.mktemp(suffix='.xml')
+        job_dir = tempfile.mkdtemp(prefix='metafuze_')
+        for i, job in enumerate(
+                run_metafuze_jobs(jobs, job_dir, worker_count=worker_count)):
             yield i
-            with open(temp_file_path, 'w') as f:
-                f.write(xml)
-
-            subprocess.call(
-                ['metafuze',
-                 '-debug',
-                 temp_file_path],
-                #stderr=subprocess.PIPE,
-                shell=True
-            )
-
-            # remove the temp file
-            #os.remove(temp_file_path)
-            #print 'xml path: %s' % temp_file_path
-
-        #if return_code:
-        #    # there is an error
-        #    raise RuntimeError("Something went wrong in MXF conversion")
 
     @extends(pm.nodetypes.Sequencer)
     def convert_to_mxf(self, path):
@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+"""Reads the references of Maya scenes directly from the files.
+
+The reference graph of a scene can be built and the
+:attr:`~stalker.models.version.Version.inputs` of all the Versions in it can
+be updated without opening the scenes in Maya, so it can run on any machine
+that can reach the repositories and the database::
+
+  from anima.env.reference_scanner import ReferenceScanner
+  scanner = ReferenceScanner()
+  scanner.update_version_inputs(['/mnt/T/Project/Scene_Main_v001.ma'])
+
+or from the command line::
+
+  python -m anima.env.reference_scanner /mnt/T/Project/Scene_Main_v001.ma
+"""
+import os
+import re
+import struct
+from multiprocessing.pool import ThreadPool
+
+from anima import logger
+
+
+# the scenes are on the network storage, so use more threads than the cpu
+# count
+DEFAULT_WORKER_COUNT = 16
+
+# the copy number of the references like "Scene.ma{1}"
+copy_number_regex = re.compile(r'\{\d+\}$')
+# a quoted string or an unquoted word in a mel command
+mel_token_regex = re.compile(r'"((?:[^"\\]|\\.)*)"|(\S+)')
+
+# the chunk headers of the Maya IFF formats, the 64 bit format pads the tag
+# to 8 bytes and uses a 64 bit size
+iff_headers = {
+    b'FOR4': (struct.Struct('>4sL'), 4),
+    b'FOR8': (struct.Struct('>4s4xQ'), 8),
+}
+iff_group_tags = [
+    b'FOR4', b'FOR8', b'LIS4', b'LIS8', b'CAT4', b'CAT8', b'PROP'
+]
+
+
+def _strip_copy_number(path):
+    """removes the copy number from the given reference path
+    """
+    return copy_number_regex.sub('', path)
+
+
+def _parse_file_reference_command(command):
+    """returns the path of the given ``file`` mel command if it is a
+    ``file -r`` command, None otherwise.
+
+    The ``file -rdi`` commands which only keep the info of the deeper
+    references are skipped, they are read from the referenced scenes.
+
+    :param str command: A complete mel command
+    """
+    flags = []
+    strings = []
+    for quoted, word in mel_token_regex.findall(command.rstrip(';')):
+        if word:
+            flags.append(word)
+        else:
+            strings.append(
+                quoted.replace('\\"', '"').replace('\\\\', '\\')
+            )
+
+    if not flags or flags[0] != 'file' or not strings:
+        return None
+
+    if '-r' not in flags and '-reference' not in flags:
+        return None
+
+    # the path is the last argument
+    return _strip_copy_number(strings[-1])
+
+
+def read_ma_references(path):
+    """Returns the paths of the references in the given Maya ASCII file.
+
+    Only the header of the file is read, the reference commands are always
+    written before the first node.
+
+    :param str path: The path of the ``.ma`` file
+    :return: list of str
+    """
+    references = []
+    command = ''
+    with open(path) as f:
+        for line in f:
+            stripped_line = line.strip()
+            if not command:
+                if stripped_line.startswith('createNode'):
+                    break
+                if not stripped_line.startswith('file '):
+                    continue
+            command = ('%s %s' % (command, stripped_line)).strip()
+            if command.endswith(';'):
+                reference_path = _parse_file_reference_command(command)
+                if reference_path:
+                    references.append(reference_path)
+                command = ''
+    return references
+
+
+def read_mb_references(path):
+    """Returns the paths of the references in the given Maya Binary file.
+
+    The IFF chunks of the file are walked and only the ``FREF`` chunks are
+    read, the data of the other chunks is skipped.
+
+    :param str path: The path of the ``.mb`` file
+    :return: list of str
+    """
+    references = []
+    with open(path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        header, alignment = iff_headers.get(f.read(4), (None, None))
+        if header is None:
+            logger.debug('not a Maya Binary file: %s' % path)
+            return references
+
+        offset = 0
+        while offset + header.size <= file_size:
+            f.seek(offset)
+            tag, size = header.unpack(f.read(header.size))
+            data_offset = offset + header.size
+            if tag in iff_group_tags:
+                # go in to the group, skip the group type which is padded
+                # to the alignment
+                offset = data_offset + alignment
+                continue
+
+            if tag == b'FREF':
+                f.seek(data_offset)
+                for value in f.read(size).split(b'\0'):
+                    value = value.decode('utf-8', 'replace')
+                    if '/' in value or '\\' in value:
+                        references.append(_strip_copy_number(value))
+                        break
+
+            # the chunks are aligned
+            offset = data_offset + size + (-size % alignment)
+    return references
+
+
+def read_references(path):
+    """Returns the paths of the references in the given Maya scene, the other
+    files have no references.
+
+    :param str path: The path of the file
+    :return: list of str
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.ma':
+        return read_ma_references(path)
+    elif extension == '.mb':
+        return read_mb_references(path)
+    return []
+
+
+class ReferenceScanner(object):
+    """Builds the reference graph of Maya scenes by reading the files
+    directly, and updates the inputs of their Versions in bulk.
+
+    The graph is walked level by level and the files of a level are read by a
+    pool of ``worker_count`` threads. The paths in the graph are os
+    independent (``$REPO{id}/...``) like the
+    :attr:`~stalker.models.version.Version.full_path`, so the same scene is
+    read once even if it is referenced with different os paths.
+
+    :param int worker_count: The number of threads reading the files.
+    :param bool use_repositories: Use the repositories in the database to
+      convert the paths to os independent and native paths. If False the
+      paths are only normalized and the environment variables in them are
+      expanded, which doesn't need a database.
+    """
+
+    def __init__(self, worker_count=DEFAULT_WORKER_COUNT,
+                 use_repositories=True):
+        self.worker_count = worker_count
+        self.use_repositories = use_repositories
+        # the referenced paths by path, None for the files that can not be
+        # read
+        self.graph = {}
+
+    def to_os_independent_paths(self, paths):
+        """returns the os independent versions of the given paths
+
+        :param list paths: A list of paths
+        :return: list of str
+        """
+        normalized_paths = [
+            os.path.normpath(os.path.expandvars(path)).replace('\\', '/')
+            for path in paths
+        ]
+        if not self.use_repositories:
+            return normalized_paths
+
+        from anima.env.base import RepositoryIndex
+        return RepositoryIndex.get().to_os_independent_paths(normalized_paths)
+
+    @classmethod
+    def update_repository_env_vars(cls):
+        """sets the environment variables of all the repositories, so the os
+        independent paths can be expanded to native paths on this machine
+        """
+        from stalker import Repository
+        for repo in Repository.query.all():
+            os.environ[repo.env_var] = repo.path
+
+    def read_references(self, path):
+        """returns the references of the given os independent path or None if
+        the file can not be read
+
+        :param str path: An os independent path
+        """
+        native_path = os.path.expandvars(path)
+        try:
+            return read_references(native_path)
+        except (IOError, OSError, struct.error) as e:
+            logger.warning('can not read references of %s: %s' % (
+                native_path, e))
+            return None
+
+    def scan(self, paths):
+        """Reads the references of the given scenes and all the scenes
+        referenced by them.
+
+        :param list paths: The paths of the scenes
+        :return: The :attr:`.graph` dictionary of the os independent paths
+          and the list of the paths of their references, the value is None
+          for the files that can not be read.
+        """
+        if self.use_repositories:
+            self.update_repository_env_vars()
+
+        level = self.to_os_independent_paths(paths)
+        pool = ThreadPool(max(1, self.worker_count))
+        try:
+            while level:
+                level = sorted(set(level).difference(self.graph))
+                logger.debug('reading %i files' % len(level))
+                results = pool.map(self.read_references, level)
+
+                next_level = []
+                for path, references in zip(level, results):
+                    if references is not None:
+                        references = sorted(
+                            set(self.to_os_independent_paths(references))
+                        )
+                        next_level.extend(references)
+                    self.graph[path] = references
+                level = next_level
+        finally:
+            pool.close()
+            pool.join()
+
+        return self.graph
+
+    @classmethod
+    def _get_source_version(cls, version):
+        """returns the parent of the given Version if it is a representation
+        """
+        from anima.repr import Representation
+        if Representation.repr_separator in version.take_name \
+           and version.parent:
+            return version.parent
+        return version
+
+    def get_version_inputs(self, paths):
+        """Scans the given scenes and returns the Versions of the scanned files
+        and the Versions that they reference.
+
+        The representations are replaced with their parent Versions like
+        :meth:`anima.env.mayaEnv.Maya.update_version_inputs`, and the inputs
+        read from a representation scene are only used when the scene of the
+        original Version is not scanned.
+
+        :param list paths: The paths of the scenes
+        :return: A dictionary of the Versions and the list of their inputs.
+        """
+        from anima.env.base import EnvironmentBase
+        graph = self.scan(paths)
+
+        all_paths = set(graph)
+        for references in graph.values():
+            all_paths.update(references or [])
+        versions_by_path = \
+            EnvironmentBase.get_versions_from_full_paths(all_paths)
+
+        scanned_versions = []
+        for path, references in graph.items():
+            version = versions_by_path[path]
+            if references is not None and version is not None:
+                is_representation = \
+                    version is not self._get_source_version(version)
+                scanned_versions.append((is_representation, path, version))
+        # the scenes of the original versions come first
+        scanned_versions.sort(key=lambda x: x[:2])
+
+        inputs_by_version = {}
+        for is_representation, path, version in scanned_versions:
+            source_version = self._get_source_version(version)
+            if is_representation and source_version in inputs_by_version:
+                continue
+
+            inputs = []
+            for reference_path in graph[path]:
+                input_version = versions_by_path[reference_path]
+                if input_version is None:
+                    continue
+                input_version = self._get_source_version(input_version)
+                if input_version is not source_version \
+                   and input_version not in inputs:
+                    inputs.append(input_version)
+            inputs_by_version[source_version] = inputs
+
+        return inputs_by_version
+
+    def update_version_inputs(self, paths, chunk_size=None):
+        """Scans the given scenes and updates the inputs of the Versions of
+        all the scanned files with one commit.
+
+        Only the rows of the Versions which have different inputs are deleted
+        from and inserted to the ``Version_Inputs`` table, in chunks of
+        ``chunk_size`` Versions.
+
+        :param list paths: The paths of the scenes
+        :param int chunk_size: The number of ids in one query, the default is
+          ``defaults.version_query_chunk_size``.
+        :return: The list of the updated Versions
+        """
+        if chunk_size is None:
+            from anima import defaults
+            chunk_size = defaults.version_query_chunk_size
+
+        from stalker.db.session import DBSession
+        from stalker.models.version import Version_Inputs
+
+        inputs_by_version = self.get_version_inputs(paths)
+        versions_by_id = dict((v.id, v) for v in inputs_by_version)
+        version_ids = sorted(versions_by_id)
+
+        current_input_ids = {}
+        for i in range(0, len(version_ids), chunk_size):
+            chunk = version_ids[i:i + chunk_size]
+            for version_id, link_id in DBSession\
+                    .query(Version_Inputs.c.version_id,
+                           Version_Inputs.c.link_id)\
+                    .filter(Version_Inputs.c.version_id.in_(chunk)).all():
+                current_input_ids.setdefault(version_id, set()).add(link_id)
+
+        changed_ids = [
+            version_id for version_id in version_ids
+            if set(v.id for v in inputs_by_version[versions_by_id[version_id]])
+            != current_input_ids.get(version_id, set())
+        ]
+        logger.debug('updating the inputs of %i versions' % len(changed_ids))
+        if not changed_ids:
+            return []
+
+        for i in range(0, len(changed_ids), chunk_size):
+            chunk = changed_ids[i:i + chunk_size]
+            DBSession.execute(
+                Version_Inputs.delete()
+                .where(Version_Inputs.c.version_id.in_(chunk))
+            )
+
+        rows = [
+            {'version_id': version_id, 'link_id': input_version.id}
+            for version_id in changed_ids
+            for input_version in inputs_by_version[versions_by_id[version_id]]
+        ]
+        if rows:
+            DBSession.execute(Version_Inputs.insert(), rows)
+
+        updated_versions = [versions_by_id[i] for i in changed_ids]
+        for version in updated_versions:
+            DBSession.expire(version, ['inputs'])
+        DBSession.commit()
+
+        return updated_versions
+
+
+if __name__ == '__main__':
+    import sys
+    from anima.utils import do_db_setup
+    do_db_setup()
+    for v in ReferenceScanner().update_version_inputs(sys.argv[1:]):
+        print('updated: %s' % v.absolute_full_path)
@@ -7,19 +7,30 @@ import glob
 import os
 from edl import Parser
 import re
+from multiprocessing.pool import ThreadPool
 from pyseq import pyseq
 import timecode
 
 
+# the output folders are on the network storage, so use more threads than
+# the cpu count
+DEFAULT_WORKER_COUNT = 16
+
+
 class Avid2Resolve(object):
     """Converts AVID edl files to Resolve also replaces render outputs
     """
     scene_number_regex = re.compile(r'[0-9]+')
 
+    # the maximum number of values in one "IN" clause
+    query_chunk_size = 500
+
     def __init__(self):
         self.avid_edl_path = ''
         self.events = []
         self.fps = ''
+        # the latest outputs per shot name
+        self.latest_outputs = {}
 
     def read_avid_edl(self, avid_eld_path, fps='24'):
         """
@@ -74,68 +85,163 @@ class Avid2Resolve(object):
         # this part is not very parametric, and depends highly to out
         # project structure
         if task:
-            # get the task folder
-            output_path = '%s/Outputs/Main' % task.absolute_path
-
-            # check the folder and get the latest output folder
-            version_folders = reversed(
-                sorted(
-                    glob.glob(
-                        os.path.join(output_path, '*')
-                    )
+            return self.find_latest_output_in_path(
+                self.get_output_path(task), shot.name
+            )
+
+        return None
+
+    @classmethod
+    def get_output_path(cls, task):
+        """returns the main output folder of the given task
+        """
+        return '%s/Outputs/Main' % task.absolute_path
+
+    @classmethod
+    def find_latest_output_in_path(cls, output_path, shot_name=''):
+        """finds the latest exr sequence in the version folders under the
+        given output path. It only touches the file system, so it can be
+        called from multiple threads.
+
+        :param str output_path: The output folder of a task which contains
+          the version folders
+        :param str shot_name: The shot name, used in the messages
+        :return: The path of the latest exr sequence or an empty string
+        """
+        # check the folder and get the latest output folder
+        version_folders = reversed(
+            sorted(
+                glob.glob(
+                    os.path.join(output_path, '*')
                 )
             )
-            for version_folder in version_folders:
-                # check if the current version folder has exr files
-                exr_path = ('%s/exr/*.exr' % version_folder).replace('\\', '/')
-                png_path = ('%s/png/*.png' % version_folder).replace('\\', '/')
-                seqs = pyseq.getSequences(exr_path)
-
-                # and if not go to a previous version
-                # until you check all the version paths
-                if seqs:
-                    return 'localhost/%s/%s' % (
-                        os.path.normpath(os.path.split(seqs[0].path())[0]).replace('\\', '/'),
-                        seqs[0].format('%h|5B%03s-%03e|5D%t').replace('|', '%')
+        )
+        for version_folder in version_folders:
+            # check if the current version folder has exr files
+            exr_path = ('%s/exr/*.exr' % version_folder).replace('\\', '/')
+            png_path = ('%s/png/*.png' % version_folder).replace('\\', '/')
+            seqs = pyseq.getSequences(exr_path)
+
+            # and if not go to a previous version
+            # until you check all the version paths
+            if seqs:
+                return 'localhost/%s/%s' % (
+                    os.path.normpath(os.path.split(seqs[0].path())[0]).replace('\\', '/'),
+                    seqs[0].format('%h|5B%03s-%03e|5D%t').replace('|', '%')
+                )
+            else:
+                # also check png sequences
+                png_seqs = pyseq.getSequences(png_path)
+                if png_seqs:
+                    print(
+                        "%s %s has PNG but no EXR" %
+                        (shot_name, version_folder.split('/')[-1])
                     )
-                else:
-                    # also check png sequences
-                    png_seqs = pyseq.getSequences(png_path)
-                    if png_seqs:
-                        print(
-                            "%s %s has PNG but no EXR" %
-                            (shot.name, version_folder.split('/')[-1])
-                        )
 
-            return ''
+        return ''
 
-        return None
+    def resolve_latest_outputs(self, shot_names, task_type='Comp',
+                               worker_count=DEFAULT_WORKER_COUNT):
+        """finds the latest outputs of the given task type of the Shots with
+        the given names and stores them in :attr:`.latest_outputs`.
+
+        The Shots and their Tasks are queried in bulk, the Shot names that
+        are already resolved are skipped and the output folders are scanned
+        in a thread pool.
 
-    def convert_paths(self):
+        The value of a Shot name in :attr:`.latest_outputs` is None if there
+        is no Shot with that name, an empty string if the Shot has no output
+        and the path of the latest exr sequence otherwise.
+
+        :param shot_names: The Shot names
+        :param str task_type: The name of the output task of the Shots
+        :param int worker_count: The number of threads scanning the output
+          folders
+        :return: dict
+        """
+        from stalker import Shot, Task
+
+        latest_outputs = self.latest_outputs
+        shot_names = sorted(set(shot_names).difference(latest_outputs))
+
+        shots_by_name = {}
+        for i in range(0, len(shot_names), self.query_chunk_size):
+            chunk = shot_names[i:i + self.query_chunk_size]
+            for shot in Shot.query.filter(Shot.name.in_(chunk)).all():
+                shots_by_name.setdefault(shot.name, shot)
+
+        shot_ids = [shot.id for shot in shots_by_name.values()]
+        tasks_by_shot_id = {}
+        for i in range(0, len(shot_ids), self.query_chunk_size):
+            chunk = shot_ids[i:i + self.query_chunk_size]
+            tasks = Task.query\
+                .filter(Task.parent_id.in_(chunk))\
+                .filter(Task.name == task_type)\
+                .all()
+            for task in tasks:
+                tasks_by_shot_id.setdefault(task.parent_id, task)
+
+        # get the paths in this thread, they need the database
+        scans = []
+        for shot_name in shot_names:
+            shot = shots_by_name.get(shot_name)
+            if shot is None:
+                latest_outputs[shot_name] = None
+                continue
+
+            task = tasks_by_shot_id.get(shot.id)
+            if task is None:
+                latest_outputs[shot_name] = ''
+                continue
+
+            scans.append((shot_name, self.get_output_path(task)))
+
+        if scans:
+            pool = ThreadPool(max(1, min(worker_count, len(scans))))
+            try:
+                results = pool.map(
+                    lambda scan: self.find_latest_output_in_path(
+                        scan[1], scan[0]
+                    ),
+                    scans
+                )
+            finally:
+                pool.close()
+                pool.join()
+
+            for (shot_name, output_path), latest_output in \
+                    zip(scans, results):
+                latest_outputs[shot_name] = latest_output
+
+        return latest_outputs
+
+    def convert_paths(self, worker_count=DEFAULT_WORKER_COUNT):
         """converts event paths with proper ones
+
+        :param int worker_count: The number of threads scanning the output
+          folders, see :meth:`.resolve_latest_outputs`
         """
-        from stalker import Shot
-        # do a db connection
-        for e in self.events:
-            # get the reel which shows the shot name
-            # (or something similar to it)
-            shot_name = self.get_shot_name(e.reel)
-
-            # find the shot in Stalker
-            shot = Shot.query.filter(Shot.name == shot_name).first()
-            if shot:
-                # get the shot path
-                latest_output = self.find_latest_outputs(shot)
-                if latest_output:
-                    e.source_file = str(latest_output)
-                else:
-                    e.source_file = ''
+        # stupid AVID places the source clips to either 8th or 1st hour
+        first_hour = timecode.Timecode(self.fps, start_timecode='01:00:00:00')
+        eigth_hour = timecode.Timecode(self.fps, start_timecode='07:59:00:00')
+        twelfth_hour = timecode.Timecode(self.fps, start_timecode='11:59:00:00')
+
+        # get the reel which shows the shot name
+        # (or something similar to it)
+        shot_names = [self.get_shot_name(e.reel) for e in self.events]
+
+        # find the shots in Stalker and their outputs at once
+        latest_outputs = self.resolve_latest_outputs(
+            shot_names, worker_count=worker_count
+        )
+
+        for e, shot_name in zip(self.events, shot_names):
+            latest_output = latest_outputs[shot_name]
+            if latest_output is not None:
+                # there is a shot
+                e.source_file = str(latest_output)
 
             # set the in and out points correctly
-            # stupid AVID places the source clips to either 8th or 1st hour
-            first_hour = timecode.Timecode(self.fps, start_timecode='01:00:00:00')
-            eigth_hour = timecode.Timecode(self.fps, start_timecode='07:59:00:00')
-            twelfth_hour = timecode.Timecode(self.fps, start_timecode='11:59:00:00')
             if e.src_start_tc.frames >= twelfth_hour.frames:
                 e.src_start_tc -= twelfth_hour - 1
                 e.src_end_tc -= twelfth_hour - 1
@@ -4,7 +4,16 @@
 # This module is part of anima-tools and is released under the BSD 2
 # License: http://www.opensource.org/licenses/BSD-2-Clause
 
+import os
+import mmap
 import struct
+import tempfile
+import multiprocessing
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 LUTS = {
@@ -94,14 +103,100 @@ LUTS = {
 }
 
 
+# the available encoding/decoding engines, the "python" backend is the pure
+# Python fallback and always available, "numpy" is used whenever NumPy can be
+# imported
+BACKEND_PYTHON = 'python'
+BACKEND_NUMPY = 'numpy'
+
+default_backend = BACKEND_NUMPY if numpy is not None else BACKEND_PYTHON
+
+# struct byte order characters to NumPy byte order characters
+NUMPY_BYTE_ORDERS = {
+    '!': '>',
+    '>': '>',
+    '<': '<',
+    '=': '=',
+    '@': '=',
+}
+
+
+def available_backends():
+    """Returns the names of the backends that can be used in this Python
+    interpreter.
+
+    :returns: list
+    """
+    backends = [BACKEND_PYTHON]
+    if numpy is not None:
+        backends.append(BACKEND_NUMPY)
+    return backends
+
+
+def set_default_backend(backend):
+    """Sets the backend that is used when no backend is given to the encode
+    and decode functions.
+
+    :param str backend: One of the names returned by
+      :func:`.available_backends`
+    """
+    global default_backend
+    default_backend = __validate_backend(backend)
+
+
+def __validate_backend(backend):
+    """Validates the given backend name and returns the name of the backend
+    to be used.
+
+    :param str backend: The backend name, ``None`` means the
+      ``default_backend``.
+    :returns: str
+    """
+    if backend is None:
+        return default_backend
+
+    if backend not in (BACKEND_PYTHON, BACKEND_NUMPY):
+        raise ValueError(
+            'backend should be one of %s, not %s' %
+            ([BACKEND_PYTHON, BACKEND_NUMPY], backend)
+        )
+
+    if backend == BACKEND_NUMPY and numpy is None:
+        raise RuntimeError(
+            'The "%s" backend needs NumPy, which is not installed' % backend
+        )
+
+    return backend
+
+
+def __special_words(special_values, char_to_int):
+    """Returns the 32-bit words that the given special values are standing
+    for.
+
+    :param dict special_values: A dict where the keys are the five character
+      encoded values and the values are the special characters replacing them
+    :param dict char_to_int: The decoding LUT
+    :returns: dict where the keys are the words and the values are the
+      special characters
+    """
+    special_words = {}
+    for key, special_char in special_values.items():
+        word = 0
+        for char in key:
+            word = word * 85 + char_to_int[char]
+        special_words[word] = special_char
+    return special_words
+
+
 def __b85_encode(data, lut, byte_order, special_values=None):
     """Encodes the given string data in to Base85 using the given LUT
 
     :param str data: A string which contains a string to be encoded in Base85
     :param dict lut: The lut to be used in encoding
     :param str byte_order: The byte order character for struct.unpack
-    :param dict special_values: If given, pre defined special values are going
-      to be replaced with corresponding special characters
+    :param dict special_values: If given, the words that are encoded to one of
+      the pre defined special values are replaced with the corresponding
+      special character
     :returns: str
     """
     # pad data
@@ -112,6 +207,25 @@ def __b85_encode(data, lut, byte_order, special_values=None):
     number_of_chunks = len(data) // 4
     byte_format = '%s%sI' % (byte_order, number_of_chunks)
     unpack = struct.unpack
+
+    if special_values:
+        special_words = __special_words(
+            special_values,
+            dict((char, i) for i, char in enumerate(lut))
+        )
+        special_words_get = special_words.get
+        for x in unpack(byte_format, data):
+            special_char = special_words_get(x)
+            if special_char is not None:
+                parts_append(special_char)
+                continue
+            parts_append(lut[(x // 52200625)])
+            parts_append(lut[(x // 614125) % 85])
+            parts_append(lut[(x // 7225) % 85])
+            parts_append(lut[(x // 85) % 85])
+            parts_append(lut[x % 85])
+        return ''.join(parts)
+
     for x in unpack(byte_format, data):
         # network order (big endian), 32-bit unsigned integer
         # note: x86 is little endian
@@ -120,86 +234,262 @@ def __b85_encode(data, lut, byte_order, special_values=None):
         parts_append(lut[(x // 7225) % 85])
         parts_append(lut[(x // 85) % 85])
         parts_append(lut[x % 85])
-    return_val = ''.join(parts)
-    if special_values:
-        for key in special_values.keys():
-            return_val = return_val.replace(key, special_values[key])
-            #return_val = special_values[key].join(return_val.split(key))
-    return return_val
+    return ''.join(parts)
 
 
-def __encode_multithreaded(f, data):
-    """The base function that runs the given function f in multithreaded
-    fashion.
+def __b85_encode_numpy(data, lut, byte_order, special_values=None):
+    """Encodes the given string data in to Base85 using the given LUT with
+    NumPy.
 
-    :param f: The function
-    :param data: The data
-    :return:
+    The whole data is converted to an array of 32-bit unsigned integers, then
+    the five Base85 digit planes are calculated for all of the words at once
+    and mapped through the LUT in one go.
+
+    :param str data: A string which contains a string to be encoded in Base85
+    :param list lut: The lut to be used in encoding
+    :param str byte_order: The byte order character for struct.unpack
+    :param dict special_values: If given, the words that are encoded to one of
+      the pre defined special values are replaced with the corresponding
+      special character
+    :returns: str
     """
-    import multiprocessing
-    import platform
-    number_of_threads = multiprocessing.cpu_count() / 2
+    # pad data
+    padding = (4 - len(data) % 4) % 4
+    if padding:
+        data = ''.join([data, '\0' * padding])
 
-    if platform.system() == 'Windows':
-        multiprocessing.set_executable('C:/Python27/pythonw.exe')
-    elif platform.system() == 'Linux':
-        multiprocessing.set_executable('/usr/bin/python')
+    words = numpy.frombuffer(
+        data,
+        dtype=numpy.dtype('%su4' % NUMPY_BYTE_ORDERS[byte_order])
+    ).astype(numpy.uint32)
 
-    p = multiprocessing.Pool(number_of_threads)
+    digits = numpy.empty((len(words), 5), dtype=numpy.uint8)
+    digits[:, 0] = words // 52200625
+    digits[:, 1] = (words // 614125) % 85
+    digits[:, 2] = (words // 7225) % 85
+    digits[:, 3] = (words // 85) % 85
+    digits[:, 4] = words % 85
 
-    number_of_chunks = len(data) // 4
-    chunk_per_thread = number_of_chunks / number_of_threads
-    split_per_char = chunk_per_thread * 4
+    numpy_lut = numpy.frombuffer(''.join(lut), dtype=numpy.uint8)
+    encoded_data = numpy_lut[digits]
 
-    thread_data = []
-    for i in range(0, len(data), split_per_char):
-        thread_data.append(data[i:i + split_per_char])
+    if special_values:
+        # write the special character to the first column of the special
+        # words and drop the remaining four columns
+        keep = numpy.ones(encoded_data.shape, dtype=numpy.bool_)
+        special_words = __special_words(
+            special_values,
+            dict((char, i) for i, char in enumerate(lut))
+        )
+        for word, special_char in special_words.items():
+            is_special = words == word
+            encoded_data[is_special, 0] = ord(special_char)
+            keep[is_special, 1:] = False
+        return encoded_data[keep].tobytes()
+
+    return encoded_data.tobytes()
+
+
+def __get_special_values(alphabet, special_values):
+    """Returns the special values dictionary of the given alphabet if
+    special_values is True.
+
+    :param str alphabet: One of the keys of the LUTS dictionary
+    :param bool special_values: If the special values should be used
+    :returns: dict or None
+    """
+    if not special_values:
+        return None
 
-    data = ''.join(p.map(f, thread_data))
-    p.close()
-    return data
+    if 'special_values' not in LUTS[alphabet]:
+        raise ValueError(
+            'The "%s" alphabet has no special values' % alphabet
+        )
 
+    return LUTS[alphabet]['special_values']
 
-def rfc1924_b85_encode(data):
-    """Encodes the given string data in to Base85 using the RFC1924 LUT
+
+def encode(data, alphabet, backend=None, special_values=False):
+    """Encodes the given data with the LUT of the given alphabet by using the
+    given backend.
 
     :param str data: A string which contains a string to be encoded in Base85
+    :param str alphabet: One of the keys of the LUTS dictionary
+    :param str backend: The backend name, ``None`` means the
+      ``default_backend``.
+    :param bool special_values: If True, the words matching one of the
+      special values of the alphabet (0.0 and 1.0 for arnold) are encoded as
+      a single special character. The default is False.
     :returns: str
     """
-    lut = LUTS['rfc1924']['int_to_char']
-    byte_order = LUTS['rfc1924']['byte_order']
-    return __b85_encode(data, lut, byte_order)
+    lut = LUTS[alphabet]['int_to_char']
+    byte_order = LUTS[alphabet]['byte_order']
+    special_values = __get_special_values(alphabet, special_values)
+    if __validate_backend(backend) == BACKEND_NUMPY:
+        return __b85_encode_numpy(data, lut, byte_order, special_values)
+    return __b85_encode(data, lut, byte_order, special_values)
+
 
+def b85_encode(data, backend=None):
+    """Encodes the given string data in to Base85 using the standard LUT
 
-def rfc1924_b85_encode_multithreaded(data):
+    :param str data: A string which contains a string to be encoded in Base85
+    :param str backend: The backend to be used, defaults to
+      ``default_backend``
+    :returns: str
+    """
+    return encode(data, 'standard', backend)
+
+
+def rfc1924_b85_encode(data, backend=None):
     """Encodes the given string data in to Base85 using the RFC1924 LUT
 
     :param str data: A string which contains a string to be encoded in Base85
+    :param str backend: The backend to be used, defaults to
+      ``default_backend``
+    :returns: str
+    """
+    return encode(data, 'rfc1924', backend)
+
+
+def rfc1924_b85_encode_multithreaded(data, worker_count=None):
+    """Encodes the given string data in to Base85 using the RFC1924 LUT by
+    using the shared :class:`.Pool` returned by :func:`.get_pool`.
+
+    :param str data: A string which contains a string to be encoded in Base85
+    :param int worker_count: The number of worker processes, defaults to the
+      number of CPUs.
     :returns: str
     """
-    return __encode_multithreaded(rfc1924_b85_encode, data)
+    return get_pool(worker_count).encode(data, 'rfc1924')
 
 
-def arnold_b85_encode(data):
+def arnold_b85_encode(data, backend=None, special_values=False):
     """Encodes the given string data in to Base85 using the arnold LUT
 
     :param str data: String to be encoded in Base85
+    :param str backend: The backend to be used, defaults to
+      ``default_backend``
+    :param bool special_values: If True, 0.0 and 1.0 are encoded as "z" and
+      "y" respectively. The default is False.
     :returns: str
     """
-    lut = LUTS['arnold']['int_to_char']
-    byte_order = LUTS['arnold']['byte_order']
-    special_values = LUTS['arnold']['special_values']
-    #return __b85_encode(data, lut, byte_order, special_values)
-    return __b85_encode(data, lut, byte_order)
+    return encode(data, 'arnold', backend, special_values)
 
 
-def arnold_b85_encode_multithreaded(data):
-    """Encodes the given string data in to Base85 using arnold LUT.
+def arnold_b85_encode_multithreaded(data, worker_count=None):
+    """Encodes the given string data in to Base85 using arnold LUT by using the
+    shared :class:`.Pool` returned by :func:`.get_pool`.
 
     :param str data: String to be encoded in Base85
+    :param int worker_count: The number of worker processes, defaults to the
+      number of CPUs.
     :return: str
     """
-    return __encode_multithreaded(arnold_b85_encode, data)
+    return get_pool(worker_count).encode(data, 'arnold')
+
+
+class Encoder(object):
+    """An incremental Base85 encoder.
+
+    The data can be fed in arbitrary sized pieces with :meth:`.encode` which
+    returns the encoded and line wrapped data for the complete 32-bit words
+    received so far. The trailing bytes that do not fill a word are kept until
+    more data arrives or :meth:`.flush` is called, so the concatenation of all
+    the returned strings is identical to encoding the whole data at once and
+    splitting it every ``line_length`` characters::
+
+      encoder = Encoder('arnold', line_length=500)
+      for chunk in chunks:
+          ass_file.write(encoder.encode(chunk))
+      ass_file.write(encoder.flush())
+
+    :param str alphabet: One of the keys of the LUTS dictionary, default is
+      'arnold'.
+    :param int line_length: The number of encoded characters per line, 0
+      disables line wrapping. The default is 0.
+    :param str backend: The backend to be used, defaults to
+      ``default_backend``
+    :param bool special_values: If True, the special values of the alphabet
+      are encoded as single characters. The default is False.
+    """
+
+    def __init__(self, alphabet='arnold', line_length=0, backend=None,
+                 special_values=False):
+        if alphabet not in LUTS:
+            raise ValueError(
+                'alphabet should be one of %s, not %s' %
+                (sorted(LUTS.keys()), alphabet)
+            )
+        self.alphabet = alphabet
+        self.line_length = line_length
+        self.backend = backend
+        self.special_values = special_values
+        self.remainder = ''
+        self.encoded_length = 0
+
+    def encode(self, data):
+        """Encodes the given data and returns the encoded data of all the
+        complete words received so far.
+
+        :param str data: A string which contains the data to be encoded
+        :returns: str
+        """
+        if self.remainder:
+            data = ''.join([self.remainder, data])
+        word_aligned_length = len(data) - len(data) % 4
+        self.remainder = data[word_aligned_length:]
+        if not word_aligned_length:
+            return ''
+        if word_aligned_length != len(data):
+            data = data[:word_aligned_length]
+        return self._wrap(
+            encode(data, self.alphabet, self.backend, self.special_values)
+        )
+
+    def flush(self):
+        """Encodes the remaining data by padding it to a full word and resets
+        the encoder.
+
+        :returns: str
+        """
+        encoded_data = ''
+        if self.remainder:
+            encoded_data = self._wrap(
+                encode(
+                    self.remainder, self.alphabet, self.backend,
+                    self.special_values
+                )
+            )
+        self.remainder = ''
+        self.encoded_length = 0
+        return encoded_data
+
+    def _wrap(self, encoded_data):
+        """Inserts new lines in to the given encoded data by considering the
+        previously returned data.
+
+        :param str encoded_data: The encoded data
+        :returns: str
+        """
+        encoded_data_length = len(encoded_data)
+        line_length = self.line_length
+        offset = self.encoded_length
+        self.encoded_length += encoded_data_length
+        if not line_length:
+            return encoded_data
+
+        parts = []
+        parts_append = parts.append
+        i = 0
+        while i < encoded_data_length:
+            position = offset + i
+            if position and not position % line_length:
+                parts_append('\n')
+            j = i + line_length - position % line_length
+            parts_append(encoded_data[i:j])
+            i = j
+        return ''.join(parts)
 
 
 def __b85_decode(data, lut, byte_order, special_values=None):
@@ -210,21 +500,39 @@ def __b85_decode(data, lut, byte_order, special_values=None):
       values are the integer correspondence of those characters and will be
       used to generate an integer number.
     :param str byte_order: The byte order character for struct.pack
-    :param bool unpack_z: replaces character "z" with appropriate characters
-      for the "0 special case" (where it is not converted to a 5 character
-      string but "z")
+    :param dict special_values: If given, the special characters are decoded
+      as the words of the corresponding pre defined special values (ex: "z"
+      is decoded as 0 for arnold)
     """
-    if special_values:
-        for key in special_values.keys():
-            # if the data is massive, then we are using twice the memory
-            # use key.join(data.split(special_values[key]))
-            data = data.replace(special_values[key], key)
-            #data = key.join(data.split(special_values[key]))
-
     parts = []
     parts_append = parts.append
     pack = struct.pack
     byte_format = '%sI' % byte_order
+
+    if special_values:
+        special_words = dict(
+            (special_char, pack(byte_format, word))
+            for word, special_char
+            in __special_words(special_values, lut).items()
+        )
+        special_words_get = special_words.get
+        i = 0
+        data_length = len(data)
+        while i < data_length:
+            special_word = special_words_get(data[i])
+            if special_word is not None:
+                parts_append(special_word)
+                i += 1
+                continue
+            int_sum = 52200625 * lut[data[i]] + \
+                614125 * lut[data[i + 1]] + \
+                7225 * lut[data[i + 2]] + \
+                85 * lut[data[i + 3]] + \
+                lut[data[i + 4]]
+            parts_append(pack(byte_format, int_sum))
+            i += 5
+        return ''.join(parts)
+
     for i in xrange(0, len(data), 5):
         int_sum = 52200625 * lut[data[i]] + \
             614125 * lut[data[i + 1]] + \
@@ -234,37 +542,347 @@ def __b85_decode(data, lut, byte_order, special_values=None):
         parts_append(pack(byte_format, int_sum))
     return ''.join(parts)
 
-def b85_decode(data):
+
+def __b85_decode_numpy(data, lut, byte_order, special_values=None):
+    """Decodes the given string data by using the given LUT and byte order
+    with NumPy.
+
+    The encoded characters are mapped to their digit values through a 256
+    element table and the five digit planes are summed up for all of the
+    words at once.
+
+    :param str data: A string which contains the encoded data
+    :param dict lut: A dict where the keys are encoded characters and the
+      values are the integer correspondence of those characters.
+    :param str byte_order: The byte order character for struct.pack
+    :param dict special_values: If given, the special characters are decoded
+      as the words of the corresponding pre defined special values
+    :returns: str
+    """
+    numpy_lut = numpy.zeros(256, dtype=numpy.uint64)
+    for char, value in lut.items():
+        numpy_lut[ord(char)] = value
+
+    chars = numpy.frombuffer(data, dtype=numpy.uint8)
+
+    if special_values:
+        # expand every special character back to its five character value
+        is_special = numpy.zeros(len(chars), dtype=numpy.bool_)
+        for special_char in special_values.values():
+            is_special |= chars == ord(special_char)
+
+        if is_special.any():
+            counts = numpy.where(is_special, 5, 1)
+            special_chars = chars[is_special]
+            special_starts = (numpy.cumsum(counts) - counts)[is_special]
+            chars = numpy.repeat(chars, counts)
+            for key, special_char in special_values.items():
+                starts = special_starts[special_chars == ord(special_char)]
+                for i, char in enumerate(key):
+                    chars[starts + i] = ord(char)
+
+    digits = numpy_lut[chars[:len(chars) // 5 * 5]].reshape(-1, 5)
+
+    words = digits[:, 0] * 52200625 + \
+        digits[:, 1] * 614125 + \
+        digits[:, 2] * 7225 + \
+        digits[:, 3] * 85 + \
+        digits[:, 4]
+
+    return words.astype(
+        numpy.dtype('%su4' % NUMPY_BYTE_ORDERS[byte_order])
+    ).tobytes()
+
+
+def decode(data, alphabet, backend=None, special_values=False):
+    """Decodes the given data with the LUT of the given alphabet by using the
+    given backend.
+
+    :param str data: A string which contains the encoded data
+    :param str alphabet: One of the keys of the LUTS dictionary
+    :param str backend: The backend name, ``None`` means the
+      ``default_backend``.
+    :param bool special_values: If True, the special characters of the
+      alphabet are decoded as the words they are standing for. The default is
+      False.
+    :returns: str
+    """
+    lut = LUTS[alphabet]['char_to_int']
+    byte_order = LUTS[alphabet]['byte_order']
+    special_values = __get_special_values(alphabet, special_values)
+    if __validate_backend(backend) == BACKEND_NUMPY:
+        return __b85_decode_numpy(data, lut, byte_order, special_values)
+    return __b85_decode(data, lut, byte_order, special_values)
+
+
+def b85_decode(data, backend=None):
     """Decodes the given string data by using the standard LUT and network (=
     big endian) byte order.
 
     :param str data: A string which contains the encoded data
+    :param str backend: The backend to be used, defaults to
+      ``default_backend``
     """
-    lut = LUTS['standard']['char_to_int']
-    byte_order = LUTS['standard']['byte_order']
-    return __b85_decode(data, lut, byte_order)
+    return decode(data, 'standard', backend)
+
 
-def rfc1924_b85_decode(data):
+def rfc1924_b85_decode(data, backend=None):
     """Decodes the given string data by using the RFC1924 LUT and network (=
     big endian) byte order.
 
     :param str data: A string which contains the encoded data
+    :param str backend: The backend to be used, defaults to
+      ``default_backend``
     """
-    lut = LUTS['rfc1924']['char_to_int']
-    byte_order = LUTS['rfc1924']['byte_order']
-    return __b85_decode(data, lut, byte_order)
+    return decode(data, 'rfc1924', backend)
 
-def arnold_b85_decode(data):
+
+def arnold_b85_decode(data, backend=None, special_values=False):
     """Decodes the given string data by using the Arnold LUT and network (=
     big endian) byte order.
 
     :param str data: A string which contains the encoded data
+    :param str backend: The backend to be used, defaults to
+      ``default_backend``
+    :param bool special_values: If True, "z" and "y" are decoded as 0.0 and
+      1.0 respectively. The default is False.
     """
-    lut = LUTS['arnold']['char_to_int']
-    byte_order = LUTS['arnold']['byte_order']
-    special_values = LUTS['arnold']['special_values']
-    #return __b85_decode(data, lut, byte_order, special_values)
-    return __b85_decode(data, lut, byte_order)
+    return decode(data, 'arnold', backend, special_values)
+
+def _run_pool_job(args):
+    """Encodes or decodes a chunk of the input file and writes the result to
+    the output file. This is the function that is run in the worker processes
+    of :class:`.Pool`.
+
+    :param tuple args: A tuple of (function name, alphabet, backend, special
+      values, input path, input offset, input length, output path, output
+      offset)
+    :returns: int
+    """
+    function_name, alphabet, backend, special_values, input_path, \
+        input_offset, input_length, output_path, output_offset = args
+
+    with open(input_path, 'rb') as input_file:
+        input_map = mmap.mmap(
+            input_file.fileno(), 0, access=mmap.ACCESS_READ
+        )
+        try:
+            data = input_map[input_offset:input_offset + input_length]
+        finally:
+            input_map.close()
+
+    if function_name == 'encode':
+        result = encode(data, alphabet, backend, special_values)
+    else:
+        result = decode(data, alphabet, backend)
+    del data
+
+    with open(output_path, 'r+b') as output_file:
+        output_map = mmap.mmap(output_file.fileno(), 0)
+        try:
+            output_map[output_offset:output_offset + len(result)] = result
+        finally:
+            output_map.close()
+
+    return len(result)
+
+
+class Pool(object):
+    """A persistent process pool that encodes and decodes Base85 data in
+    parallel.
+
+    The data is split in to chunks on word boundaries (4 bytes for encoding,
+    5 characters for decoding), so the result is identical to the serial
+    :func:`.encode` and :func:`.decode` functions. The input data is written
+    once to a memory mapped temporary file that all the workers read their
+    chunk from and the workers write their results directly in to a second
+    memory mapped file, so neither the input nor the output is pickled
+    between the processes.
+
+    When the special values are used while encoding, the chunks are written
+    to their maximum size slots in the output file and joined afterwards.
+    Decoding data with special values can not be split on word boundaries
+    without scanning the data, so it is done in the current process.
+
+    The worker processes are started on first use and are reused until
+    :meth:`.close` is called::
+
+      with Pool(worker_count=8) as pool:
+          encoded_data = pool.encode(data, 'arnold')
+
+    :param int worker_count: The number of worker processes, defaults to the
+      number of CPUs.
+    :param str backend: The backend to be used by the workers, defaults to
+      ``default_backend``
+    :param int min_chunk_size: The minimum number of words per chunk. Data
+      that is smaller than this is encoded in the current process.
+    :param str executable: The Python executable for the worker processes.
+      Needed on Windows when running inside a host application (Maya,
+      Houdini etc.) where ``sys.executable`` is not a Python interpreter.
+    """
+
+    def __init__(self, worker_count=None, backend=None,
+                 min_chunk_size=65536, executable=None):
+        if worker_count is None:
+            worker_count = multiprocessing.cpu_count()
+        if worker_count < 1:
+            raise ValueError(
+                'worker_count should be a positive integer, not %s' %
+                worker_count
+            )
+        self.worker_count = worker_count
+        self.backend = backend
+        self.min_chunk_size = min_chunk_size
+        self.executable = executable
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def pool(self):
+        """returns the multiprocessing pool, starts it if necessary
+        """
+        if self._pool is None:
+            if self.executable:
+                multiprocessing.set_executable(self.executable)
+            self._pool = multiprocessing.Pool(self.worker_count)
+        return self._pool
+
+    def close(self):
+        """stops the worker processes
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def encode(self, data, alphabet='arnold', special_values=False):
+        """Encodes the given data in parallel
+
+        :param str data: A string which contains the data to be encoded
+        :param str alphabet: One of the keys of the LUTS dictionary
+        :param bool special_values: If True, the special values of the
+          alphabet are encoded as single characters. The default is False.
+        :returns: str
+        """
+        return self._run('encode', data, alphabet, 4, 5, special_values)
+
+    def decode(self, data, alphabet='arnold', special_values=False):
+        """Decodes the given data in parallel
+
+        :param str data: A string which contains the encoded data
+        :param str alphabet: One of the keys of the LUTS dictionary
+        :param bool special_values: If True, the special characters of the
+          alphabet are decoded as the words they are standing for. The data
+          is decoded in the current process in this case.
+        :returns: str
+        """
+        if special_values:
+            return decode(data, alphabet, self.backend, special_values)
+        return self._run('decode', data, alphabet, 5, 4)
+
+    def _run(self, function_name, data, alphabet, input_word_size,
+             output_word_size, special_values=False):
+        """Runs the given function over the word aligned chunks of the data
+
+        :param str function_name: "encode" or "decode"
+        :param str data: The input data
+        :param str alphabet: One of the keys of the LUTS dictionary
+        :param int input_word_size: The size of one word in the input data
+        :param int output_word_size: The size of one word in the output data
+        :param bool special_values: If the special values are going to be
+          used while encoding
+        :returns: str
+        """
+        word_count = (len(data) + input_word_size - 1) // input_word_size
+        if self.worker_count == 1 or word_count < 2 * self.min_chunk_size:
+            if function_name == 'encode':
+                return encode(data, alphabet, self.backend, special_values)
+            return decode(data, alphabet, self.backend)
+
+        words_per_chunk = max(
+            self.min_chunk_size,
+            (word_count + self.worker_count - 1) // self.worker_count
+        )
+        chunk_size = words_per_chunk * input_word_size
+        output_chunk_size = words_per_chunk * output_word_size
+        output_size = word_count * output_word_size
+        if function_name == 'decode':
+            # incomplete words are ignored while decoding
+            output_size = len(data) // input_word_size * output_word_size
+
+        input_path = self._create_temp_file(data)
+        output_path = self._create_temp_file(size=output_size)
+        try:
+            jobs = [
+                (function_name, alphabet, self.backend, special_values,
+                 input_path, i, chunk_size,
+                 output_path, i // chunk_size * output_chunk_size)
+                for i in range(0, len(data), chunk_size)
+            ]
+            output_lengths = self.pool.map(_run_pool_job, jobs)
+
+            with open(output_path, 'rb') as output_file:
+                if not special_values:
+                    return output_file.read()
+
+                # the chunks are shorter than their slots
+                parts = []
+                for job, output_length in zip(jobs, output_lengths):
+                    output_file.seek(job[-1])
+                    parts.append(output_file.read(output_length))
+                return ''.join(parts)
+        finally:
+            os.remove(input_path)
+            os.remove(output_path)
+
+    @classmethod
+    def _create_temp_file(cls, data=None, size=None):
+        """Creates a temporary file to be memory mapped by the workers. Uses
+        the RAM backed /dev/shm if it exists.
+
+        :param str data: The content of the file
+        :param int size: The size of the file if no data is given
+        :returns: str
+        """
+        temp_dir = None
+        if os.path.isdir('/dev/shm'):
+            temp_dir = '/dev/shm'
+        file_descriptor, path = tempfile.mkstemp(
+            prefix='anima_base85_', dir=temp_dir
+        )
+        with os.fdopen(file_descriptor, 'wb') as temp_file:
+            if data is not None:
+                temp_file.write(data)
+            else:
+                temp_file.truncate(size)
+        return path
+
+
+__default_pool = None
+
+
+def get_pool(worker_count=None):
+    """Returns a process wide shared :class:`.Pool`. The pool is recreated if
+    a different worker_count is requested.
+
+    :param int worker_count: The number of worker processes, defaults to the
+      number of CPUs.
+    :returns: :class:`.Pool`
+    """
+    global __default_pool
+    if worker_count is None:
+        worker_count = multiprocessing.cpu_count()
+    if __default_pool is None or __default_pool.worker_count != worker_count:
+        if __default_pool is not None:
+            __default_pool.close()
+        __default_pool = Pool(worker_count)
+    return __default_pool
+
 
 def mapper(encoded_data, raw_data, special_values=None):
     """A simple utility to create a lut for known Base85 encoding
@@ -5,73 +5,609 @@
 # License: http://www.opensource.org/licenses/BSD-2-Clause
 
 import os
-import gzip
+import re
+import sys
+import json
+import array
 import struct
 import time
+import hashlib
+import multiprocessing
 
 
-from anima.render.arnold import base85
+from anima.render.arnold import base85, pgzip
 reload(base85)
+reload(pgzip)
 
 try:
     import hou
 except ImportError:
     hou = None
 
-from cStringIO import StringIO
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# the number of raw bytes encoded at once while streaming to a file, should
+# be a multiple of 4
+STREAM_CHUNK_SIZE = 4 * 1024 * 1024
+
+# the int primitive and vertex attributes that polygon2ass reads the topology
+# from in bulk, if they exist
+NSIDES_ATTRIBUTE_NAME = 'nsides'
+VIDXS_ATTRIBUTE_NAME = 'vidxs'
 
 
 class Buffer(object):
-    """Buffer class for efficient string concatenation.
+    """A growable output buffer for the rendered ass data.
 
-    This class uses cStringIO for the general store and a string buffer as an
-    intermediate storage, then concatenates every 1000 element in to the
-    cStringIO file handler.
+    The written data is copied in to a preallocated ``bytearray``, which
+    doubles its size when it is full, so writing does not create any
+    intermediate strings. If a file_handler is given the data is written
+    through to it instead.
+
+    :class:`.Template`, :class:`.Base85Data` and :class:`.UIntData` can write
+    themselves to a Buffer, use :func:`.render` to render them to a string.
+
+    :param int size: The initial size of the buffer in bytes
+    :param file_handler: A file like object to write the data to
     """
 
-    def __init__(self, str_buffer_size=1000):
-        self.i = 0
-        self.str_buffer = []
-        self.file_str = StringIO()
-        self.file_str_write = self.file_str.write
-        self.str_buffer_append = self.str_buffer.append
-        self.str_buffer_size = str_buffer_size
+    def __init__(self, size=65536, file_handler=None):
+        self.file_handler = file_handler
+        self.length = 0
+        self.data = bytearray(size if file_handler is None else 0)
 
-    def flush(self):
-        """flushes the data to the StringIO buffer and resets the counter
-        """
-        self.file_str_write(' '.join(self.str_buffer))
-        self.str_buffer = []
-        self.i = 0
+    def __len__(self):
+        return self.length
+
+    def write(self, data):
+        """writes the given data to the buffer or to the file handler
 
-    def append(self, data):
-        """appends the data to the str_buffer if the limit is reached then the
-        data in the buffer is flushed to the cStringIO
+        :param str data: The data to write
         """
-        self_i = self.i
-        self_i += 1
-        if self_i == self.str_buffer_size:
-            self.flush()
-        self.str_buffer_append(`data`)
+        data_length = len(data)
+        if self.file_handler is not None:
+            self.file_handler.write(data)
+            self.length += data_length
+            return
+
+        start = self.length
+        end = start + data_length
+        size = len(self.data)
+        if end > size:
+            self.data.extend(bytearray(max(end, 2 * size) - size))
+        self.data[start:end] = data
+        self.length = end
+
+    def getbuffer(self):
+        """returns a memoryview of the written data without copying it.
+
+        The buffer can not grow while the returned memoryview exists.
+        """
+        return memoryview(self.data)[:self.length]
 
     def getvalue(self):
-        """returns the string data
+        """returns the written data as a string
+        """
+        return self.getbuffer().tobytes()
+
+
+def render(data):
+    """renders the given :class:`.Template`, :class:`.Base85Data` or
+    :class:`.UIntData` to a string through a :class:`.Buffer`
+
+    :param data: The data to render
+    :return: str
+    """
+    output_buffer = Buffer(data.estimated_length)
+    data.write(output_buffer)
+    return output_buffer.getvalue()
+
+
+class Base85Data(object):
+    """Raw binary data that is Base85 encoded and line split only when it is
+    written.
+
+    The data can be given in multiple parts (ex: ``P`` and ``pprime`` for
+    motion blur) which are encoded as if they were concatenated, without
+    actually concatenating them.
+
+    When written to a file with :meth:`.write` the data is encoded in
+    ``chunk_size`` pieces, so the encoded and line split copies of the data
+    never exist in memory as a whole.
+
+    :param parts: The raw data strings
+    :param int line_length: The number of encoded characters per line
+    :param int chunk_size: The number of raw bytes that are encoded at once
+      while writing to a file
+    :param bool special_values: If True, 0.0 and 1.0 values are encoded as
+      "z" and "y" respectively. The default is False.
+    """
+
+    def __init__(self, *parts, **kwargs):
+        self.parts = parts
+        self.line_length = kwargs.get('line_length', 500)
+        self.chunk_size = kwargs.get('chunk_size', STREAM_CHUNK_SIZE)
+        self.special_values = kwargs.get('special_values', False)
+
+    @property
+    def encoded_length(self):
+        """returns the length of the encoded data without the new lines and
+        the special values
+        """
+        data_length = sum(map(len, self.parts))
+        return (data_length + 3) // 4 * 5
+
+    @property
+    def estimated_length(self):
+        """returns the maximum length of the encoded and line split data
+        """
+        encoded_length = self.encoded_length
+        if self.line_length:
+            encoded_length += encoded_length // self.line_length
+        return encoded_length
+
+    def __str__(self):
+        return render(self)
+
+    def write(self, file_handler):
+        """writes the encoded and line split data to the given file handler
+
+        :param file_handler: A file like object
+        """
+        encoder = base85.Encoder(
+            'arnold',
+            line_length=self.line_length,
+            special_values=self.special_values
+        )
+        chunk_size = self.chunk_size
+        file_handler_write = file_handler.write
+        for data in self.parts:
+            for i in xrange(0, len(data), chunk_size):
+                file_handler_write(encoder.encode(data[i:i + chunk_size]))
+        file_handler_write(encoder.flush())
+
+    def update_hash(self, hash_object):
+        """updates the given hash object with the raw data and the encoding
+        options
+
+        :param hash_object: A ``hashlib`` hash object
+        """
+        hash_object.update(
+            'b85 %s %s\n' % (self.line_length, self.special_values)
+        )
+        for data in self.parts:
+            hash_object.update(data)
+
+
+class Template(object):
+    """A lazily rendered ``%`` template.
+
+    Renders to the same string with ``str()`` as ``template % template_vars``
+    would do, but :meth:`.write` writes the template text directly to a file
+    and lets :class:`.Base85Data` and nested :class:`.Template` values write
+    their own content, so the whole document is never built in memory.
+
+    :param str template: A template string with ``%(name)s`` style keys
+    :param dict template_vars: The template variables
+    """
+
+    marker_re = re.compile('\x00([^\x00]+)\x00')
+
+    def __init__(self, template, template_vars):
+        self.template = template
+        self.template_vars = template_vars
+
+    @property
+    def estimated_length(self):
+        """returns the estimated length of the rendered template
+        """
+        estimated_length = len(self.template)
+        for value in self.template_vars.values():
+            value_length = getattr(value, 'estimated_length', None)
+            if value_length is None:
+                value_length = len(str(value))
+            estimated_length += value_length
+        return estimated_length
+
+    def __str__(self):
+        return render(self)
+
+    def write(self, file_handler):
+        """writes the rendered template to the given file handler
+
+        :param file_handler: A file like object
+        """
+        streamed_vars = {}
+        template_vars = dict(self.template_vars)
+        for key, value in self.template_vars.items():
+            if hasattr(value, 'write'):
+                streamed_vars[key] = value
+                template_vars[key] = '\x00%s\x00' % key
+
+        rendered_template = self.template % template_vars
+        for i, part in enumerate(self.marker_re.split(rendered_template)):
+            if i % 2:
+                streamed_vars[part].write(file_handler)
+            elif part:
+                file_handler.write(part)
+
+    def update_hash(self, hash_object):
+        """updates the given hash object with the template and the template
+        variables, without rendering the template
+
+        :param hash_object: A ``hashlib`` hash object
+        """
+        hash_object.update(self.template)
+        for key in sorted(self.template_vars):
+            value = self.template_vars[key]
+            hash_object.update('\x00%s\x00' % key)
+            if hasattr(value, 'update_hash'):
+                value.update_hash(hash_object)
+            else:
+                hash_object.update(str(value))
+
+
+class UIntData(object):
+    """An array of unsigned integers that is written either as ASCII or as
+    Base85 encoded ``b85UINT`` data.
+
+    When encoded, arrays that have values smaller than 256 are stored with one
+    byte per value and a "B" prefix, otherwise every value is stored as a 32
+    bit little endian unsigned integer.
+
+    :param values: An ``array.array`` of integers
+    :param bool encoded: If True the data is Base85 encoded. The default is
+      False.
+    :param int line_length: The number of values per line for ASCII data and
+      the number of encoded characters per line for encoded data.
+    :param bool special_values: If True, the special values are used while
+      encoding. The default is False.
+    """
+
+    def __init__(self, values, encoded=False, line_length=500,
+                 special_values=False):
+        self.values = values
+        self.encoded = encoded
+        self.line_length = line_length
+        self.special_values = special_values
+
+    @property
+    def data_type(self):
+        """returns the ASS data type of the data
+        """
+        if self.encoded:
+            return 'b85UINT'
+        return 'UINT'
+
+    def _get_encoded_data(self):
+        """returns the Base85Data or Template that represents the encoded data
+        """
+        values = self.values
+        if values and max(values) < 256:
+            return Template(
+                'B%(data)s',
+                {
+                    'data': Base85Data(
+                        array.array('B', values).tostring(),
+                        line_length=self.line_length,
+                        special_values=self.special_values
+                    )
+                }
+            )
+
+        if values.typecode not in ('i', 'I') or sys.byteorder != 'little':
+            values = array.array('I', values)
+            if sys.byteorder != 'little':
+                values.byteswap()
+
+        return Base85Data(
+            values.tostring(),
+            line_length=self.line_length,
+            special_values=self.special_values
+        )
+
+    @property
+    def estimated_length(self):
+        """returns the estimated length of the rendered data, without looking
+        at the values
         """
-        # do a last flush
-        self.flush()
-        return self.file_str.getvalue()
+        value_count = len(self.values)
+        if self.encoded:
+            encoded_length = value_count * 5
+            return 1 + encoded_length + encoded_length // self.line_length
+
+        # assume 7 digit values on average
+        return value_count * 8
+
+    def __str__(self):
+        return render(self)
+
+    def write(self, file_handler):
+        """writes the data to the given file handler
+
+        :param file_handler: A file like object
+        """
+        if self.encoded:
+            self._get_encoded_data().write(file_handler)
+            return
+
+        values = self.values
+        line_length = self.line_length
+        file_handler_write = file_handler.write
+        for i in xrange(0, len(values), line_length):
+            if i:
+                file_handler_write('\n')
+            file_handler_write(' '.join(map(str, values[i:i + line_length])))
+
+    def update_hash(self, hash_object):
+        """updates the given hash object with the values and the encoding
+        options
+
+        :param hash_object: A ``hashlib`` hash object
+        """
+        hash_object.update(
+            'uint %s %s %s\n' %
+            (self.encoded, self.line_length, self.special_values)
+        )
+        hash_object.update(array.array('I', self.values).tostring())
 
 
 def geometry2ass(
         path, name, min_pixel_width, mode, export_type, export_motion,
-        export_color, render_type, double_sided=True, invert_normals=False, **kwargs
+        export_color, render_type, double_sided=True, invert_normals=False,
+        stream=True, special_values=False, encode_topology=False,
+        export_uvs=True, export_normals=True, compress_level=9,
+        compress_block_size=pgzip.DEFAULT_BLOCK_SIZE,
+        compress_worker_count=None, **kwargs
 ):
     """exports geometry to ass format
+
+    If stream is True (the default) the encoded data is written to the file
+    in chunks instead of rendering the whole file content in memory first.
+
+    If special_values is True, the 0.0 and 1.0 values in the encoded data are
+    written as single "z" and "y" characters, which makes the files smaller.
+
+    If encode_topology is True, the polygon topology (nsides and vidxs) is
+    written as Base85 encoded data instead of ASCII.
+
+    export_uvs and export_normals are used for polygons only, see
+    :func:`.polygon2ass`.
+
+    ``.gz`` files are compressed in parallel with
+    :class:`.pgzip.ParallelGzipFile`, compress_level, compress_block_size and
+    compress_worker_count are passed to it.
     """
-    ass_path = path
     start_time = time.time()
 
-    parts = os.path.splitext(ass_path)
+    ass_path, asstoc_path, use_gzip = get_output_paths(path)
+    node = hou.pwd()
+
+    if use_gzip:
+        ass_file = pgzip.ParallelGzipFile(
+            ass_path,
+            compress_level=compress_level,
+            block_size=compress_block_size,
+            worker_count=compress_worker_count
+        )
+    else:
+        ass_file = open(ass_path, 'w')
+    ass_file_handler = ass_file if stream else None
+
+    data = export_geometry(
+        node, name, min_pixel_width, mode, export_type, export_motion,
+        export_color, render_type, double_sided=double_sided,
+        invert_normals=invert_normals, special_values=special_values,
+        encode_topology=encode_topology, export_uvs=export_uvs,
+        export_normals=export_normals, file_handler=ass_file_handler
+    )
+
+    write_start = time.time()
+    if data:
+        ass_file.write(data)
+    ass_file.close()
+    write_end = time.time()
+
+    print('Writing to file              : %3.3f' % (write_end - write_start))
+
+    write_asstoc(asstoc_path, node.geometry())
+
+    end_time = time.time()
+    print('All Conversion took          : %3.3f sec' % (end_time - start_time))
+    print('******************************************************************')
+
+
+def geometry2ass_sequence(
+        path, frames, name, min_pixel_width, mode, export_type,
+        export_motion, export_color, render_type, double_sided=True,
+        invert_normals=False, special_values=False, encode_topology=False,
+        export_uvs=True, export_normals=True, worker_count=None,
+        executable=None, manifest_path=None, force=False, node=None,
+        compress_level=9, **kwargs
+):
+    """exports the geometry of the given frames to ass files in parallel
+
+    Every frame is cooked in this process and its lazily rendered
+    :class:`.Template` is sent to a process pool, where the Base85 encoding
+    and the (gzip) writing of the ass file is done. The ``.asstoc`` file of
+    every frame is written with the bounds of the frame and a summary manifest
+    is written as JSON.
+
+    The manifest stores the hash of the exported data of every frame. Frames
+    whose hash did not change since the last export and whose ass file still
+    exists are skipped, unless force is True.
+
+    The other arguments are the same as in :func:`.geometry2ass`.
+
+    :param str path: The ass file path with a ``%`` style frame number
+      pattern, ex: ``/cache/hair.%04d.ass.gz``
+    :param frames: A list of frame numbers
+    :param int worker_count: The number of worker processes, defaults to the
+      cpu count. If 1, the frames are written in this process.
+    :param str executable: The Python executable for the worker processes,
+      see :class:`.base85.Pool`.
+    :param str manifest_path: The path of the manifest file, defaults to
+      ``<path before the frame pattern>.manifest.json``
+    :param bool force: If True, all the frames are exported.
+    :param node: The SOP node to export, defaults to ``hou.pwd()``
+    :param int compress_level: The gzip compression level of ``.gz`` files.
+    :return: The manifest as a dictionary
+    """
+    start_time = time.time()
+
+    if node is None:
+        node = hou.pwd()
+
+    if worker_count is None:
+        worker_count = multiprocessing.cpu_count()
+    if worker_count < 1:
+        raise ValueError(
+            'worker_count should be a positive integer, not %s' %
+            worker_count
+        )
+
+    if manifest_path is None:
+        manifest_path = '%s.manifest.json' % \
+            path.split('%')[0].rstrip('._-')
+
+    previous_frames = {}
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path) as manifest_file:
+                previous_frames = json.load(manifest_file).get('frames', {})
+        except ValueError:  # not a valid manifest, export all the frames
+            pass
+
+    pool = None
+    if worker_count > 1:
+        if executable:
+            multiprocessing.set_executable(executable)
+        pool = multiprocessing.Pool(worker_count)
+
+    frames_info = {}
+    # the frames that are being written, kept limited so the raw data of the
+    # whole sequence is not queued in memory
+    pending_jobs = []
+
+    def collect_job():
+        frame_key, job = pending_jobs.pop(0)
+        frames_info[frame_key]['time'] = job.get()
+
+    current_frame = hou.frame()
+    try:
+        for frame in frames:
+            hou.setFrame(frame)
+            frame_key = str(frame)
+
+            ass_path, asstoc_path, use_gzip = get_output_paths(path % frame)
+            template = export_geometry(
+                node, name, min_pixel_width, mode, export_type,
+                export_motion, export_color, render_type,
+                double_sided=double_sided, invert_normals=invert_normals,
+                special_values=special_values,
+                encode_topology=encode_topology, export_uvs=export_uvs,
+                export_normals=export_normals, return_template=True
+            )
+            hash_object = hashlib.md5()
+            template.update_hash(hash_object)
+            geometry_hash = hash_object.hexdigest()
+
+            bounds = write_asstoc(asstoc_path, node.geometry())
+
+            previous_info = previous_frames.get(frame_key, {})
+            exported = force \
+                or previous_info.get('hash') != geometry_hash \
+                or not os.path.exists(ass_path)
+
+            frames_info[frame_key] = {
+                'path': ass_path,
+                'asstoc_path': asstoc_path,
+                'hash': geometry_hash,
+                'bounds': bounds,
+                'exported': exported,
+                'time': 0,
+            }
+
+            if not exported:
+                continue
+
+            args = (ass_path, template, use_gzip, compress_level)
+            if pool is None:
+                frames_info[frame_key]['time'] = _write_ass_file(args)
+                continue
+
+            pending_jobs.append(
+                (frame_key, pool.apply_async(_write_ass_file, (args,)))
+            )
+            del template
+            if len(pending_jobs) >= 2 * worker_count:
+                collect_job()
+
+        while pending_jobs:
+            collect_job()
+    finally:
+        hou.setFrame(current_frame)
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    exported_frame_count = \
+        len([info for info in frames_info.values() if info['exported']])
+    manifest = {
+        'path': path,
+        'frames': frames_info,
+        'exported_frame_count': exported_frame_count,
+        'skipped_frame_count': len(frames_info) - exported_frame_count,
+        'time': time.time() - start_time,
+    }
+    with open(manifest_path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+
+    print('Exported Frames              : %s' % exported_frame_count)
+    print('Skipped Frames               : %s' % manifest['skipped_frame_count'])
+    print('All Conversion took          : %3.3f sec' % manifest['time'])
+    print('******************************************************************')
+
+    return manifest
+
+
+def _write_ass_file(args):
+    """writes the given template to an ass file, runs in the worker processes
+    of :func:`.geometry2ass_sequence`
+
+    :param args: A tuple of the ass file path, the :class:`.Template`, a
+      bool showing if the file is gzip compressed and the compression level
+    :return: The time it took to write the file in seconds
+    """
+    ass_path, template, use_gzip, compress_level = args
+    start_time = time.time()
+    if use_gzip:
+        # the frames are already written in parallel
+        ass_file = pgzip.ParallelGzipFile(
+            ass_path, compress_level=compress_level, worker_count=1
+        )
+    else:
+        ass_file = open(ass_path, 'w')
+    try:
+        template.write(ass_file)
+    finally:
+        ass_file.close()
+    return time.time() - start_time
+
+
+def get_output_paths(path):
+    """returns the normalized ass file path, the asstoc file path and a bool
+    showing if the ass file is gzip compressed, and creates the output
+    directory
+
+    :param str path: The ass file path, ``.ass`` or ``.ass.gz``
+    :return: (ass_path, asstoc_path, use_gzip)
+    """
+    parts = os.path.splitext(path)
     extension = parts[1]
     use_gzip = False
     if extension == '.gz':
@@ -82,63 +618,218 @@ def geometry2ass(
 
     asstoc_path = '%s.asstoc' % basename
 
-    node = hou.pwd()
-
-    file_handler = open
-    if use_gzip:
-        file_handler = gzip.open
-
     # normalize path
-    ass_path = os.path.normpath(ass_path)
+    ass_path = os.path.normpath(path)
     try:
         os.makedirs(os.path.dirname(ass_path))
     except OSError:  # path exists
         pass
 
-    data = ''
+    return ass_path, asstoc_path, use_gzip
+
+
+def write_asstoc(asstoc_path, geo):
+    """writes the bounds stored in the "bound_min" and "bound_max" detail
+    attributes of the given geometry to an asstoc file
+
+    :param str asstoc_path: The asstoc file path
+    :param geo: A ``hou.Geometry`` instance
+    :return: The bounds as a list of 6 floats
+    """
+    bounding_min = geo.attribValue("bound_min")
+    bounding_max = geo.attribValue("bound_max")
+    bounds = list(bounding_min[:3]) + list(bounding_max[:3])
+
+    bounding_box_info = 'bounds %s %s %s %s %s %s' % tuple(bounds)
+
+    with open(asstoc_path, 'w') as asstoc_file:
+        asstoc_file.write(bounding_box_info)
+
+    return bounds
+
+
+def export_geometry(
+        node, name, min_pixel_width, mode, export_type, export_motion,
+        export_color, render_type, double_sided=True, invert_normals=False,
+        special_values=False, encode_topology=False, export_uvs=True,
+        export_normals=True, file_handler=None, return_template=False
+):
+    """exports the geometry of the given node with the exporter of the given
+    export_type (0: curves, 1: polygons, 2: particles)
+
+    :return: The rendered data, or the :class:`.Template` if return_template
+      is True, or None if a file_handler is given
+    """
     if export_type == 0:
-        data = curves2ass(node, name, min_pixel_width, mode, export_motion)
+        return curves2ass(
+            node, name, min_pixel_width, mode, export_motion,
+            file_handler=file_handler,
+            special_values=special_values,
+            return_template=return_template
+        )
     elif export_type == 1:
-        data = polygon2ass(
+        return polygon2ass(
             node,
             name,
             export_motion,
             export_color,
             double_sided,
             invert_normals,
+            file_handler=file_handler,
+            special_values=special_values,
+            encode_topology=encode_topology,
+            export_uvs=export_uvs,
+            export_normals=export_normals,
+            return_template=return_template
         )
     elif export_type == 2:
-        data = particle2ass(node, name, export_motion, export_color, render_type)
+        return particle2ass(
+            node, name, export_motion, export_color, render_type,
+            file_handler=file_handler,
+            special_values=special_values,
+            return_template=return_template
+        )
 
-    write_start = time.time()
-    ass_file = file_handler(ass_path, 'w')
-    ass_file.write(data)
-    ass_file.close()
-    write_end = time.time()
 
-    print('Writing to file              : %3.3f' % (write_end - write_start))
+def get_polygon_topology(geo):
+    """Returns the vertex count of every primitive and the point number of
+    every vertex of the given geometry as two ``array.array`` of 32 bit
+    integers.
 
-    bounding_min = node.geometry().attribValue("bound_min")
-    bounding_max = node.geometry().attribValue("bound_max")
+    If the geometry has an int primitive attribute called "nsides" and an int
+    vertex attribute called "vidxs" (see ``NSIDES_ATTRIBUTE_NAME`` and
+    ``VIDXS_ATTRIBUTE_NAME``) the values are read in bulk from them. They can
+    be created with a Primitive Wrangle running::
 
-    bounding_box_info = 'bounds %s %s %s %s %s %s' % (
-        bounding_min[0], bounding_min[1], bounding_min[2],
-        bounding_max[0], bounding_max[1], bounding_max[2]
-    )
+      i@nsides = primvertexcount(0, @primnum);
 
-    with open(asstoc_path, 'w') as asstoc_file:
-        asstoc_file.write(bounding_box_info)
+    and a Vertex Wrangle running::
 
-    end_time = time.time()
-    print('All Conversion took          : %3.3f sec' % (end_time - start_time))
-    print('******************************************************************')
+      i@vidxs = @ptnum;
+
+    Otherwise the primitives and vertices are iterated in Python.
+
+    :param geo: A ``hou.Geometry`` instance
+    :returns: (array.array, array.array)
+    """
+    nsides = array.array('i')
+    vidxs = array.array('i')
+
+    if geo.findPrimAttrib(NSIDES_ATTRIBUTE_NAME) \
+       and geo.findVertexAttrib(VIDXS_ATTRIBUTE_NAME):
+        nsides.fromstring(
+            geo.primIntAttribValuesAsString(NSIDES_ATTRIBUTE_NAME)
+        )
+        vidxs.fromstring(
+            geo.vertexIntAttribValuesAsString(VIDXS_ATTRIBUTE_NAME)
+        )
+        return nsides, vidxs
+
+    nsides_append = nsides.append
+    vidxs_extend = vidxs.extend
+    for prim in geo.iterPrims():
+        vertices = prim.vertices()
+        nsides_append(len(vertices))
+        vidxs_extend([vertex.point().number() for vertex in vertices])
+
+    return nsides, vidxs
+
+
+def get_float_attribute_values(geo, name, component_count):
+    """Returns the values of the given vertex or point float attribute as a
+    string of packed 32-bit floats with only the first component_count
+    components of every element.
+
+    Vertex attributes are preferred over point attributes.
+
+    :param geo: A ``hou.Geometry`` instance
+    :param str name: The attribute name
+    :param int component_count: The number of components to return per
+      element, ex: 2 for uvs
+    :returns: (str, bool) the data and True if it is a point attribute, or
+      (None, False) if there is no such attribute
+    """
+    attribute = geo.findVertexAttrib(name)
+    is_point_attribute = False
+    if attribute:
+        data = geo.vertexFloatAttribValuesAsString(name)
+    else:
+        attribute = geo.findPointAttrib(name)
+        if not attribute:
+            return None, False
+        is_point_attribute = True
+        data = geo.pointFloatAttribValuesAsString(name)
+
+    size = attribute.size()
+    if size == component_count:
+        return data, is_point_attribute
+
+    # drop the extra components (ex: the w of the uvs)
+    if numpy is not None:
+        values = numpy.frombuffer(data, dtype=numpy.float32)
+        data = values.reshape(-1, size)[:, :component_count].tobytes()
+    else:
+        values = array.array('f', data)
+        element_count = len(values) // size
+        stripped_values = array.array('f', [0]) * \
+            (element_count * component_count)
+        for i in range(component_count):
+            stripped_values[i::component_count] = values[i::size]
+        data = stripped_values.tostring()
+
+    return data, is_point_attribute
+
+
+def index_data(data, item_size):
+    """Removes the duplicate items from the given data and returns the unique
+    items and the index of every item in the unique items.
+
+    :param str data: A string of packed values
+    :param int item_size: The size of one item in bytes, ex: 8 for a uv
+      made of two 32-bit floats
+    :returns: (str, array.array)
+    """
+    indices = array.array('i')
+    if numpy is not None:
+        items = numpy.frombuffer(data, dtype=numpy.dtype('V%s' % item_size))
+        unique_items, item_indices = numpy.unique(items, return_inverse=True)
+        indices.fromstring(item_indices.astype(numpy.int32).tobytes())
+        return unique_items.tobytes(), indices
+
+    unique_items = []
+    unique_items_append = unique_items.append
+    index_lut = {}
+    indices_append = indices.append
+    for i in xrange(0, len(data), item_size):
+        item = data[i:i + item_size]
+        index = index_lut.get(item)
+        if index is None:
+            index = index_lut[item] = len(unique_items)
+            unique_items_append(item)
+        indices_append(index)
+    return ''.join(unique_items), indices
 
 
 def polygon2ass(
         node, name, export_motion=False, export_color=False, double_sided=True,
-        invert_normals=False
+        invert_normals=False, file_handler=None, special_values=False,
+        encode_topology=False, export_uvs=True, export_normals=True,
+        return_template=False
 ):
     """exports polygon geometry to ass format
+
+    If a file_handler is given the data is written to it and None is returned
+
+    If return_template is True the :class:`.Template` is returned without
+    rendering it.
+
+    If encode_topology is True the nsides and vidxs arrays (and the uvidxs and
+    nidxs arrays) are written as Base85 encoded b85UINT data, otherwise as
+    ASCII UINT data.
+
+    The "uv" and "N" vertex or point attributes are exported as uvlist/uvidxs
+    and nlist/nidxs if export_uvs and export_normals are True and the
+    attributes exist. Duplicate vertex values are stored only once.
     """
     sample_count = 2 if export_motion else 1
 
@@ -160,9 +851,9 @@ def polygon2ass(
 polymesh
 {
  name %(name)s
- nsides %(primitive_count)i 1 UINT
+ nsides %(primitive_count)i 1 %(nsides_data_type)s
 %(number_of_points_per_primitive)s
- vidxs %(vertex_count)s 1 UINT
+ vidxs %(vertex_count)s 1 %(vidxs_data_type)s
 %(vertex_ids)s
  vlist %(point_count)s %(sample_count)s b85POINT
 %(point_positions)s
@@ -176,15 +867,11 @@ polymesh
  matrix
 %(matrix)s
  id 683108022
+%(uv_template)s
+%(normal_template)s
 %(color_template)s
 }"""
-    #  uvidxs %(vertex_count)s 1 UINT
-    #%(uv_ids)s
-    # uvlist %(vertex_count)s 1 b85POINT2
-    #%(vertex_uvs)s
 
-    skip_normals = False
-    skip_uvs = False
     skip_colors = False
 
     intrinsic_values = geo.intrinsicValueDict()
@@ -193,87 +880,107 @@ polymesh
     point_count = intrinsic_values['pointcount']
     vertex_count = intrinsic_values['vertexcount']
 
-    number_of_points_per_primitive = []
-    vertex_ids = []
-    # vertex_normals = []
-    # vertex_uvs = []
-    # uv_ids = []
-    # combined_uv_ids = []
-    ## uv_ids = split_data(' '.join(map(str, range(vertex_count))), 500)
-    # j = 0
-    # for i in range(vertex_count):
-    #     uv_ids.append(str(i))
-    #     j += 1
-    #     if j > 500:
-    #         j = 0
-    #         combined_uv_ids.append(' '.join(uv_ids))
-    #         uv_ids = []
-    vertex_colors = []
-
-    ## join for a last time
-    # if uv_ids:
-    #     combined_uv_ids.append(' '.join(uv_ids))
     #
-    # uv_ids = combined_uv_ids
-
-    # just for the first vertex try to read the uv to determine if we should
-    # skip the uvs or not
-    # skip_uvs = True
-
-    i = 0
-    j = 0
-    combined_vertex_ids = []
-    # combined_vertex_normals = []
-    combined_number_of_points_per_primitive = []
+    # Topology
+    #
+    topology_start = time.time()
+    number_of_points_per_primitive, vertex_ids = get_polygon_topology(geo)
+    topology_end = time.time()
+    print('Getting Topology           : %3.3f' %
+          (topology_end - topology_start))
+
+    splitted_number_of_points_per_primitive = UIntData(
+        number_of_points_per_primitive,
+        encoded=encode_topology,
+        special_values=special_values
+    )
+    splitted_vertex_ids = UIntData(
+        vertex_ids,
+        encoded=encode_topology,
+        special_values=special_values
+    )
 
-    for prim in geo.iterPrims():
-        number_of_points_per_primitive.append(`prim.numVertices()`)
-        i += 1
-        if i > 500:
-            i = 0
-            combined_number_of_points_per_primitive.append(' '.join(number_of_points_per_primitive))
-            number_of_points_per_primitive = []
-        for vertex in prim.vertices():
-            point = vertex.point()
-            point_id = point.number()
-            vertex_ids.append(`point_id`)
-            # vertex_normals.extend(point.floatListAttribValue('N'))
-            # vertex_uv = vertex.floatListAttribValue('uv')
-            # vertex_uvs.append(vertex_uv[0])
-            # vertex_uvs.append(vertex_uv[1])
-            j += 1
-            if j > 500:
-                j = 0
-                combined_vertex_ids.append(' '.join(vertex_ids))
-                vertex_ids = []
-                # combined_vertex_normals.append(' '.join(map(str, vertex_normals)))
-                # vertex_normals = []
-                vertex_colors = []
-
-    # join for a last time
-    if number_of_points_per_primitive:
-        combined_number_of_points_per_primitive.append(' '.join(number_of_points_per_primitive))
-
-    if vertex_ids:
-        combined_vertex_ids.append(' '.join(vertex_ids))
-
-    # if vertex_normals:
-    #     combined_vertex_normals.append(' '.join(map(str, vertex_normals)))
-
-    ## encode uvs
-    # encoded_vertex_uvs = '%s' % base85.arnold_b85_encode(
-    #     struct.pack(
-    #         '<%sd' % len(vertex_uvs),
-    #         *vertex_uvs
-    #     )
-    # )
-    # splitted_vertex_uvs = split_data(encoded_vertex_uvs, 500)
+    #
+    # UVs
+    #
+    uv_template = ''
+    if export_uvs:
+        uv_start = time.time()
+        uvs, is_point_attribute = get_float_attribute_values(geo, 'uv', 2)
+        if uvs is not None:
+            if is_point_attribute:
+                uv_ids = vertex_ids
+            else:
+                uvs, uv_ids = index_data(uvs, 8)
+            uv_ids = UIntData(
+                uv_ids,
+                encoded=encode_topology,
+                special_values=special_values
+            )
+
+            uv_template = Template(
+                """ uvlist %(uv_count)s 1 b85POINT2
+%(uvs)s
+ uvidxs %(vertex_count)s 1 %(uv_ids_data_type)s
+%(uv_ids)s""",
+                {
+                    'uv_count': len(uvs) // 8,
+                    'uvs': Base85Data(
+                        uvs, line_length=500, special_values=special_values
+                    ),
+                    'vertex_count': vertex_count,
+                    'uv_ids': uv_ids,
+                    'uv_ids_data_type': uv_ids.data_type
+                }
+            )
+        uv_end = time.time()
+        print('Getting UVs                : %3.3f' % (uv_end - uv_start))
 
-    point_positions = geo.pointFloatAttribValuesAsString('P')
+    #
+    # Normals
+    #
+    normal_template = ''
+    if export_normals:
+        normal_start = time.time()
+        normals, is_point_attribute = \
+            get_float_attribute_values(geo, 'N', 3)
+        if normals is not None:
+            if is_point_attribute:
+                normal_ids = vertex_ids
+            else:
+                normals, normal_ids = index_data(normals, 12)
+            normal_ids = UIntData(
+                normal_ids,
+                encoded=encode_topology,
+                special_values=special_values
+            )
+
+            normal_template = Template(
+                """ nlist %(normal_count)s %(sample_count)s b85VECTOR
+%(normals)s
+ nidxs %(vertex_count)s 1 %(normal_ids_data_type)s
+%(normal_ids)s""",
+                {
+                    'normal_count': len(normals) // 12,
+                    'sample_count': sample_count,
+                    # the same normals are used for all the motion keys
+                    'normals': Base85Data(
+                        *[normals] * sample_count,
+                        line_length=500, special_values=special_values
+                    ),
+                    'vertex_count': vertex_count,
+                    'normal_ids': normal_ids,
+                    'normal_ids_data_type': normal_ids.data_type
+                }
+            )
+        normal_end = time.time()
+        print('Getting Normals            : %3.3f' %
+              (normal_end - normal_start))
+
+    point_positions = [geo.pointFloatAttribValuesAsString('P')]
 
     if export_motion:
-        point_prime_positions = geo.pointFloatAttribValuesAsString('pprime')
-        point_positions = '%s%s' % (point_positions, point_prime_positions)
+        point_positions.append(geo.pointFloatAttribValuesAsString('pprime'))
 
     try:
         point_colors = geo.pointFloatAttribValuesAsString('color')
@@ -282,118 +989,21 @@ polymesh
         skip_colors = True
         point_colors = ''
 
-    # try:
-    #    point_normals = geo.pointFloatAttribValuesAsString('N')
-    #    # point_normals = geo.pointFloatAttribValues('N')
-    # except hou.OperationFailed:
-    #    # no normal attribute skip it
-    #    skip_normals = True
-    #    point_normals = ''
-
-    #
-    # Number Of Points Per Primitive
-    #
-    encode_start = time.time()
-    #encoded_number_of_points_per_primitive = 'B%s' % base85.arnold_b85_encode(
-    #    struct.pack(
-    #        '>%sB' % len(number_of_points_per_primitive),
-    #        *number_of_points_per_primitive
-    #    )
-    #)
-    encoded_number_of_points_per_primitive = '\n'.join(combined_number_of_points_per_primitive)
-    encode_end = time.time()
-    print('Encoding Number of Points  : %3.3f' % (encode_end - encode_start))
-
-    split_start = time.time()
-    #splitted_number_of_points_per_primitive = \
-    #    re.sub(
-    #        "(.{500})", "\\1\n",
-    #        #' '.join(number_of_points_per_primitive),
-    #        encoded_number_of_points_per_primitive,
-    #        0
-    #    )
-    #splitted_number_of_points_per_primitive = ' '.join(encoded_number_of_points_per_primitive)
-    splitted_number_of_points_per_primitive = encoded_number_of_points_per_primitive
-    split_end = time.time()
-    print('Splitting Number of Points : %3.3f' % (split_end - split_start))
-
     #
     # Point Positions
     #
-    encode_start = time.time()
-    # encoded_point_positions = base85.arnold_b85_encode_multithreaded(point_positions)
-    encoded_point_positions = base85.arnold_b85_encode(point_positions)
-    encode_end = time.time()
-    print('Encoding Point Position    : %3.3f' % (encode_end - encode_start))
-
-    split_start = time.time()
-    splitted_point_positions = split_data(encoded_point_positions, 500)
-    split_end = time.time()
-    print('Splitting Point Positions : %3.3f' % (split_end - split_start))
-
-    # #
-    # # Vertex Normals
-    # #
-    # encode_start = time.time()
-    # encoded_vertex_normals = '\n'.join(combined_vertex_normals)#base85.arnold_b85_encode(point_normals)
-    # encode_end = time.time()
-    # print('Encoding Point Normals     : %3.3f' % (encode_end - encode_start))
-    #
-    # split_start = time.time()
-    # # splitted_vertex_normals = re.sub("(.{500})", "\\1\n", encoded_point_normals, 0)
-    # splitted_vertex_normals = encoded_vertex_normals
-    # # # split every n-th data
-    # # n = 100
-    # # splitted_point_normals = []
-    # # for i in range(len(point_normals) / n):
-    # #     start_index = n * i
-    # #     end_index = n * (i+1)
-    # #     splitted_point_normals.extend(point_normals[start_index:end_index])
-    # #     splitted_point_normals.append('\n')
-    # #
-    # # splitted_point_normals = ' '.join(map(str, splitted_point_normals))
-    # split_end = time.time()
-    # print('Splitting Vertex Normals    : %3.3f' % (split_end - split_start))
+    # encoded and splitted while the data is rendered
+    splitted_point_positions = Base85Data(
+        *point_positions, line_length=500, special_values=special_values
+    )
 
     # #
     # # Vertex Colors
     # #
 
-    encode_start = time.time()
-    encoded_point_colors = base85.arnold_b85_encode(point_colors)
-    encode_end = time.time()
-    print('Encoding Point colors     : %3.3f' % (encode_end - encode_start))
-
-    split_start = time.time()
-    splitted_point_colors = split_data(encoded_point_colors, 100)
-    split_end = time.time()
-    print('Splitting Vertex Colors    : %3.3f' % (split_end - split_start))
-
-    #
-    # Vertex Ids
-    #
-    encode_start = time.time()
-    #encoded_vertex_ids = 'B%s' % base85.arnold_b85_encode(
-    #    struct.pack(
-    #        '>%sB' % len(vertex_ids),
-    #        *vertex_ids
-    #    )
-    #)
-    encoded_vertex_ids = '\n'.join(combined_vertex_ids)
-    encode_end = time.time()
-    print('Encoding Vertex Ids        : %3.3f' % (encode_end - encode_start))
-
-    split_start = time.time()
-    #splitted_vertex_ids = re.sub(
-    #    "(.{500})", "\\1\n",
-    #    #' '.join(vertex_ids),
-    #    encoded_vertex_ids,
-    #    0
-    #)
-    #splitted_vertex_ids = ' '.join(encoded_vertex_ids)
-    splitted_vertex_ids = encoded_vertex_ids
-    split_end = time.time()
-    print('Splitting Vertex Ids       : %3.3f' % (split_end - split_start))
+    splitted_point_colors = Base85Data(
+        point_colors, line_length=100, special_values=special_values
+    )
 
     matrix = """1 0 0 0
 0 1 0 0
@@ -411,35 +1021,52 @@ polymesh
             %(splitted_point_colors)s
         """
 
-        color_template = color_template % {
-            'point_count': point_count,
-            'splitted_point_colors':splitted_point_colors
-        }
+        color_template = Template(
+            color_template,
+            {
+                'point_count': point_count,
+                'splitted_point_colors': splitted_point_colors
+            }
+        )
 
-    data = base_template % {
+    data = Template(base_template, {
         'name': name,
         'point_count': point_count,
         'vertex_count': vertex_count,
         'primitive_count': primitive_count,
         'sample_count': sample_count,
         'number_of_points_per_primitive': splitted_number_of_points_per_primitive,
+        'nsides_data_type': splitted_number_of_points_per_primitive.data_type,
         'vertex_ids': splitted_vertex_ids,
+        'vidxs_data_type': splitted_vertex_ids.data_type,
         'point_positions': splitted_point_positions,
         'matrix': matrix,
+        'uv_template': uv_template,
+        'normal_template': normal_template,
         'color_template': color_template,
         'sidedness': 255 if double_sided else 0,
         'invert_normals': 'on' if invert_normals else 'off',
-        # 'uv_ids': uv_ids,
-        # 'vertex_uvs': splitted_vertex_uvs,
-        # 'normal_count': vertex_count,
-        # 'vertex_normals': splitted_vertex_normals,
-    }
+    })
+
+    if return_template:
+        return data
 
-    return data
+    if file_handler:
+        data.write(file_handler)
+        return
 
+    return str(data)
 
-def particle2ass(node, name, export_motion=False, export_color=False, render_type=0):
+
+def particle2ass(node, name, export_motion=False, export_color=False,
+                 render_type=0, file_handler=None, special_values=False,
+                 return_template=False):
     """exports polygon geometry to ass format
+
+    If a file_handler is given the data is written to it and None is returned
+
+    If return_template is True the :class:`.Template` is returned without
+    rendering it.
     """
     sample_count = 2 if export_motion else 1
 
@@ -487,24 +1114,15 @@ points
     #
     # Point Positions
     #
-    point_positions = geo.pointFloatAttribValuesAsString('P')
+    point_positions = [geo.pointFloatAttribValuesAsString('P')]
     if export_motion:
-        point_prime_positions = geo.pointFloatAttribValuesAsString('pprime')
-        point_positions = '%s%s' % (point_positions, point_prime_positions)
-        del point_prime_positions
-
-    encode_start = time.time()
-    # encoded_point_positions = base85.arnold_b85_encode_multithreaded(point_positions)
-    encoded_point_positions = base85.arnold_b85_encode(point_positions)
-    encode_end = time.time()
-    print('Encoding Point Position    : %3.3f' % (encode_end - encode_start))
-    del point_positions
+        point_positions.append(geo.pointFloatAttribValuesAsString('pprime'))
 
-    split_start = time.time()
-    splitted_point_positions = split_data(encoded_point_positions, 500)
-    split_end = time.time()
-    print('Splitting Point Positions : %3.3f' % (split_end - split_start))
-    del encoded_point_positions
+    # encoded and splitted while the data is rendered
+    splitted_point_positions = Base85Data(
+        *point_positions, line_length=500, special_values=special_values
+    )
+    del point_positions
 
     #
     # Point Radius
@@ -516,18 +1134,11 @@ points
         skip_radius = True
         point_radius = ''
 
-    encode_start = time.time()
-    encoded_point_radius = base85.arnold_b85_encode(point_radius)
-    encode_end = time.time()
-    print('Encoding Point Radius    : %3.3f' % (encode_end - encode_start))
+    splitted_point_radius = Base85Data(
+        point_radius, line_length=500, special_values=special_values
+    )
     del point_radius
 
-    split_start = time.time()
-    splitted_point_radius = split_data(encoded_point_radius, 500)
-    split_end = time.time()
-    print('Splitting Point Radius : %3.3f' % (split_end - split_start))
-    del encoded_point_radius
-
     render_type = render_type
     render_as = "disk"
 
@@ -548,30 +1159,26 @@ points
             skip_colors = True
             point_colors = ''
 
-        encode_start = time.time()
-        encoded_point_colors = base85.arnold_b85_encode(point_colors)
-        encode_end = time.time()
-        print('Encoding Point colors     : %3.3f' % (encode_end - encode_start))
+        splitted_point_colors = Base85Data(
+            point_colors, line_length=100, special_values=special_values
+        )
         del point_colors
 
-        split_start = time.time()
-        splitted_point_colors = split_data(encoded_point_colors, 100)
-        split_end = time.time()
-        print('Splitting Point Colors : %3.3f' % (split_end - split_start))
-        del encoded_point_colors
-
         color_template = """
             declare rgbPP uniform RGB
             rgbPP %(point_count)s 1 b85RGB
             %(splitted_point_colors)s
         """
 
-        color_template = color_template % {
-            'point_count': point_count,
-            'splitted_point_colors': splitted_point_colors
-        }
+        color_template = Template(
+            color_template,
+            {
+                'point_count': point_count,
+                'splitted_point_colors': splitted_point_colors
+            }
+        )
 
-    data = base_template % {
+    data = Template(base_template, {
         'name': name,
         'point_count': point_count,
         'sample_count': sample_count,
@@ -579,15 +1186,227 @@ points
         'point_radius': splitted_point_radius,
         'point_positions': splitted_point_positions,
         'color_template': color_template,
-    }
+    })
     del splitted_point_radius
     del splitted_point_positions
-    return data
+
+    if return_template:
+        return data
+
+    if file_handler:
+        data.write(file_handler)
+        return
+
+    return str(data)
+
+
+def get_curve_point_counts(geo):
+    """returns the number of points of every curve in the given geometry.
+
+    The counts are read in bulk from the ``nsides`` primitive int attribute if
+    it exists, otherwise the primitives are iterated. If all the curves have
+    the same number of points that number is returned as an int.
+
+    :param geo: A ``hou.Geometry`` instance
+    :return: An int for curves with a constant point count or an
+      ``array.array`` of ints
+    """
+    point_counts = array.array('i')
+    if geo.findPrimAttrib(NSIDES_ATTRIBUTE_NAME):
+        point_counts.fromstring(
+            geo.primIntAttribValuesAsString(NSIDES_ATTRIBUTE_NAME)
+        )
+    else:
+        point_counts.extend(prim.numVertices() for prim in geo.iterPrims())
+
+    if point_counts and point_counts.count(point_counts[0]) == \
+       len(point_counts):
+        return point_counts[0]
+    return point_counts
+
+
+def get_curve_offsets(point_counts, number_of_curves):
+    """returns the index of the first point of every curve and the total
+    point count as the last item
+
+    :param point_counts: The point counts as returned by
+      :func:`.get_curve_point_counts`
+    :param int number_of_curves: The number of curves
+    :return: An ``array.array`` of ints with number_of_curves + 1 items
+    """
+    if isinstance(point_counts, (int, long)):
+        return array.array(
+            'i', xrange(0, (number_of_curves + 1) * point_counts, point_counts)
+        )
+
+    offsets = array.array('i', [0])
+    offset = 0
+    for point_count in point_counts:
+        offset += point_count
+        offsets.append(offset)
+    return offsets
+
+
+def duplicate_end_points(data, point_counts, number_of_curves, item_size=12):
+    """repeats the first and the last item of every curve in the given raw
+    point data, which is needed for the start and end tangents of
+    "catmull-rom" curves.
+
+    :param str data: The raw point data, ex: the ``P`` attribute values
+    :param point_counts: The point counts as returned by
+      :func:`.get_curve_point_counts`
+    :param int number_of_curves: The number of curves
+    :param int item_size: The size of one point in bytes, the default is 12
+      for 3 floats.
+    :return: str
+    """
+    if numpy is not None:
+        items = numpy.frombuffer(data, dtype=numpy.dtype('V%s' % item_size))
+        if isinstance(point_counts, (int, long)):
+            # (curves, points, 3)
+            items = items.reshape(number_of_curves, point_counts)
+            return numpy.concatenate(
+                [items[:, :1], items, items[:, -1:]], axis=1
+            ).tobytes()
+
+        counts = numpy.frombuffer(point_counts, dtype=numpy.int32)
+        new_counts = counts + 2
+        new_starts = numpy.cumsum(new_counts) - new_counts
+        # the index of every new point in its curve, shifted by one for the
+        # repeated first point and clipped for the repeated last point
+        indices = numpy.arange(new_counts.sum()) \
+            - numpy.repeat(new_starts, new_counts) - 1
+        indices = numpy.clip(
+            indices, 0, numpy.repeat(counts - 1, new_counts)
+        )
+        indices += numpy.repeat(numpy.cumsum(counts) - counts, new_counts)
+        return items[indices].tobytes()
+
+    offsets = get_curve_offsets(point_counts, number_of_curves)
+    parts = []
+    parts_append = parts.append
+    for i in xrange(number_of_curves):
+        start = offsets[i] * item_size
+        end = offsets[i + 1] * item_size
+        parts_append(data[start:start + item_size])
+        parts_append(data[start:end])
+        parts_append(data[end - item_size:end])
+    return ''.join(parts)
+
+
+def repeat_items(data, point_counts, number_of_curves, item_size=4):
+    """repeats every item in the given raw per curve data for every point of
+    the curve
+
+    :param str data: The raw per curve data
+    :param point_counts: The point counts as returned by
+      :func:`.get_curve_point_counts`
+    :param int number_of_curves: The number of curves
+    :param int item_size: The size of one item in bytes
+    :return: str
+    """
+    if numpy is not None:
+        items = numpy.frombuffer(data, dtype=numpy.dtype('V%s' % item_size))
+        if not isinstance(point_counts, (int, long)):
+            point_counts = numpy.frombuffer(point_counts, dtype=numpy.int32)
+        return numpy.repeat(items, point_counts).tobytes()
+
+    if isinstance(point_counts, (int, long)):
+        point_counts = [point_counts] * number_of_curves
+    return ''.join(
+        data[i * item_size:(i + 1) * item_size] * point_count
+        for i, point_count in enumerate(point_counts)
+    )
+
+
+def take_items(data, indices, item_size=4):
+    """returns the items at the given indices of the given raw data
+
+    :param str data: The raw data
+    :param indices: An ``array.array`` of item indices
+    :param int item_size: The size of one item in bytes
+    :return: str
+    """
+    if numpy is not None:
+        items = numpy.frombuffer(data, dtype=numpy.dtype('V%s' % item_size))
+        return items[numpy.frombuffer(indices, dtype=numpy.int32)].tobytes()
+
+    return ''.join(
+        data[i * item_size:(i + 1) * item_size] for i in indices
+    )
+
+
+def get_curve_radius(geo, point_counts, number_of_curves):
+    """returns the raw per point radius data of the curves from the "width"
+    point, vertex, primitive or detail attribute, which is the same lookup
+    order of ``hou.Vertex.attribValue()``.
+
+    :param geo: A ``hou.Geometry`` instance
+    :param point_counts: The point counts as returned by
+      :func:`.get_curve_point_counts`
+    :param int number_of_curves: The number of curves
+    :return: str
+    """
+    if geo.findPointAttrib('width'):
+        return geo.pointFloatAttribValuesAsString('width')
+
+    if geo.findVertexAttrib('width'):
+        return geo.vertexFloatAttribValuesAsString('width')
+
+    if geo.findPrimAttrib('width'):
+        return repeat_items(
+            geo.primFloatAttribValuesAsString('width'), point_counts,
+            number_of_curves
+        )
+
+    if geo.findGlobalAttrib('width'):
+        point_count = geo.intrinsicValue('pointcount')
+        return struct.pack('f', geo.attribValue('width')) * point_count
+
+    raise ValueError('the curves have no "width" attribute')
+
+
+def get_curve_param_coords(geo, offsets):
+    """returns the raw per curve u and v param coords of the curves.
+
+    The values are read from the "uv_u" and "uv_v" primitive attributes if
+    they exist, otherwise from the first point of every curve in the "uv"
+    vertex or point attribute.
+
+    :param geo: A ``hou.Geometry`` instance
+    :param offsets: The curve offsets as returned by
+      :func:`.get_curve_offsets`
+    :return: (u, v) as strings
+    """
+    if geo.findPrimAttrib('uv_u') \
+       or not (geo.findPointAttrib('uv') or geo.findVertexAttrib('uv')):
+        return (
+            geo.primFloatAttribValuesAsString('uv_u'),
+            geo.primFloatAttribValuesAsString('uv_v')
+        )
+
+    uvs = get_float_attribute_values(geo, 'uv', 2)[0]
+    root_uvs = take_items(uvs, offsets[:-1], item_size=8)
+    if numpy is not None:
+        root_uvs = numpy.frombuffer(root_uvs, dtype=numpy.float32)
+        return root_uvs[0::2].tobytes(), root_uvs[1::2].tobytes()
+
+    root_uvs = array.array('f', root_uvs)
+    return root_uvs[0::2].tostring(), root_uvs[1::2].tostring()
 
 
 def curves2ass(node, hair_name, min_pixel_width=0.5, mode='ribbon',
-               export_motion=False):
+               export_motion=False, file_handler=None,
+               special_values=False, return_template=False):
     """exports the node content to ass file
+
+    If a file_handler is given the data is written to it and None is returned
+
+    If return_template is True the :class:`.Template` is returned without
+    rendering it.
+
+    The curves can have different number of points, see
+    :func:`.get_curve_point_counts` for how the point counts are read.
     """
     sample_count = 2 if export_motion else 1
     template_vars = dict()
@@ -635,60 +1454,32 @@ curves
     # write down the radius for the tip twice
     radius_count = real_point_count
 
-    real_number_of_points_in_one_curve = real_point_count / number_of_curves
-    number_of_points_in_one_curve = real_number_of_points_in_one_curve + 2
-    number_of_points_per_curve = [`number_of_points_in_one_curve`] * number_of_curves
-
-    curve_ids = ' '.join(`id_` for id_ in xrange(number_of_curves))
-
-    radius = None
+    point_counts = get_curve_point_counts(geo)
+    offsets = get_curve_offsets(point_counts, number_of_curves)
+    if isinstance(point_counts, (int, long)):
+        number_of_points_per_curve = array.array(
+            'i', [point_counts + 2]
+        ) * number_of_curves
+    else:
+        number_of_points_per_curve = array.array(
+            'i', [curve_point_count + 2 for curve_point_count in point_counts]
+        )
 
-    pack = struct.pack
+    curve_ids = UIntData(array.array('i', xrange(number_of_curves)))
 
-    # try to find the width as a point attribute to speed things up
     getting_radius_start = time.time()
-    radius_attribute = geo.findPointAttrib('width')
-    if radius_attribute:
-        # this one works 100 times faster then iterating over each vertex
-        radius = geo.pointFloatAttribValuesAsString('width')
-    else:
-        # no radius in points, so iterate over each vertex
-        radius_i = 0
-        radius_str_buffer = []
-        radius_file_str = StringIO()
-        radius_file_str_write = radius_file_str.write
-        radius_str_buffer_append = radius_str_buffer.append
-        for prim in geo.prims():
-            prim_vertices = prim.vertices()
-
-            # radius
-            radius_i += real_number_of_points_in_one_curve
-            if radius_i >= 1000:
-                radius_file_str_write(''.join(radius_str_buffer))
-                radius_str_buffer = []
-                radius_str_buffer_append = radius_str_buffer.append
-                radius_i = 0
-
-            for vertex in prim_vertices:
-                radius_str_buffer_append(pack('f', vertex.attribValue('width')))
-
-        # do flushes again before getting the values
-        radius_file_str_write(''.join(radius_str_buffer))
-        radius = radius_file_str.getvalue()
+    radius = get_curve_radius(geo, point_counts, number_of_curves)
     getting_radius_end = time.time()
     print('Getting Radius Info          : %3.3f' %
           (getting_radius_end - getting_radius_start))
 
     # point positions
-    encode_start = time.time()
-
     # for motion blur use pprime
     getting_point_positions_start = time.time()
-    point_positions = geo.pointFloatAttribValuesAsString('P')
+    point_positions = [geo.pointFloatAttribValuesAsString('P')]
 
     if export_motion:
-        point_prime_positions = geo.pointFloatAttribValuesAsString('pprime')
-        point_positions = '%s%s' % (point_positions, point_prime_positions)
+        point_positions.append(geo.pointFloatAttribValuesAsString('pprime'))
 
     getting_point_positions_end = time.time()
     print('Getting Point Position       : %3.3f' %
@@ -697,79 +1488,55 @@ curves
     # repeat every first and last point coordinates
     # (3 value each 3 * 4 = 12 characters) of every curve
     zip_start = time.time()
-    point_positions = ''.join(
-        map(
-            lambda x: '%s%s%s' % (x[:12], x, x[-12:]),
-            map(
-                ''.join,
-                zip(*[iter(point_positions)] * (real_number_of_points_in_one_curve*4*3)))
-        )
-    )
+    point_positions = [
+        duplicate_end_points(data, point_counts, number_of_curves)
+        for data in point_positions
+    ]
     zip_end = time.time()
     print('Zipping Point Position       : %3.3f' % (zip_end - zip_start))
 
-    # encoded_point_positions = base85.arnold_b85_encode_multithreaded(point_positions)
-    encoded_point_positions = base85.arnold_b85_encode(point_positions)
-    encode_end = time.time()
-    print('Encoding Point Position      : %3.3f' % (encode_end - encode_start))
-
-    split_start = time.time()
-    splitted_point_positions = split_data(encoded_point_positions, 500)
-    split_end = time.time()
-    print('Splitting Point Positions    : %3.3f' % (split_end - split_start))
+    # encoded and splitted while the data is rendered
+    splitted_point_positions = Base85Data(
+        *point_positions, line_length=500, special_values=special_values
+    )
 
     # radius
-    encode_start = time.time()
-    encoded_radius = base85.arnold_b85_encode(radius)
-    encode_end = time.time()
-    print('Radius encode                : %3.3f' % (encode_end - encode_start))
-
-    split_start = time.time()
-    splitted_radius = split_data(encoded_radius, 500)
+    splitted_radius = Base85Data(
+        radius, line_length=500, special_values=special_values
+    )
     # extend for motion blur
     # if export_motion:
-    #     splitted_radius = '%(data)s%(data)s' % {'data': splitted_radius}
-    split_end = time.time()
-    print('Splitting Radius             : %3.3f' % (split_end - split_start))
+    #     splitted_radius = Template(
+    #         '%(data)s%(data)s', {'data': splitted_radius}
+    #     )
 
     # uv
     getting_uv_start = time.time()
-    u = geo.primFloatAttribValuesAsString('uv_u')
-    v = geo.primFloatAttribValuesAsString('uv_v')
+    u, v = get_curve_param_coords(geo, offsets)
     getting_uv_end = time.time()
     print('Getting uv                   : %3.3f' %
           (getting_uv_end - getting_uv_start))
 
-    encode_start = time.time()
-    encoded_u = base85.arnold_b85_encode(u)
-    encode_end = time.time()
-    print('Encoding UParamcoord         : %3.3f' % (encode_end - encode_start))
-
-    split_start = time.time()
-    splitted_u = split_data(encoded_u, 500)
+    splitted_u = Base85Data(
+        u, line_length=500, special_values=special_values
+    )
     if export_motion:
-        splitted_u = '%(data)s%(data)s' % {'data': splitted_u}
-    split_end = time.time()
-    print('Splitting UParamCoord        : %3.3f' % (split_end - split_start))
+        splitted_u = Template('%(data)s%(data)s', {'data': splitted_u})
 
-    encode_start = time.time()
-    encoded_v = base85.arnold_b85_encode(v)
-    encode_end = time.time()
-    print('Encoding VParamcoord         : %3.3f' % (encode_end - encode_start))
-
-    split_start = time.time()
-    splitted_v = split_data(encoded_v, 500)
+    splitted_v = Base85Data(
+        v, line_length=500, special_values=special_values
+    )
     if export_motion:
-        splitted_v = '%(data)s%(data)s' % {'data': splitted_v}
-    split_end = time.time()
-    print('Splitting VParamCoord        : %3.3f' % (split_end - split_start))
+        splitted_v = Template('%(data)s%(data)s', {'data': splitted_v})
 
-    print('len(encoded_point_positions) : %s' % len(encoded_point_positions))
+    print('len(encoded_point_positions) : %s' %
+          splitted_point_positions.encoded_length)
     print('(p + 2 * c) * 5 * 3          : %s' % (point_count * 5 * 3))
-    print('len(encoded_radius)          : %s' % len(encoded_radius))
+    print('len(encoded_radius)          : %s' %
+          splitted_radius.encoded_length)
     print('len(uv)                      : %s' % len(u))
-    print('len(encoded_u)               : %s' % len(encoded_u))
-    print('len(encoded_v)               : %s' % len(encoded_v))
+    print('len(encoded_u)               : %s' % Base85Data(u).encoded_length)
+    print('len(encoded_v)               : %s' % Base85Data(v).encoded_length)
 
     # extend for motion blur
     matrix = """1 0 0 0
@@ -778,14 +1545,14 @@ curves
   0 0 0 1
 """
     if export_motion:
-        number_of_points_per_curve.extend(number_of_points_per_curve)
+        number_of_points_per_curve *= 2
         matrix += matrix
 
     template_vars.update({
         'name': node.path().replace('/', '_'),
         'curve_count': number_of_curves,
         'real_point_count': real_point_count,
-        'number_of_points_per_curve': ' '.join(number_of_points_per_curve),
+        'number_of_points_per_curve': UIntData(number_of_points_per_curve),
         'point_count': point_count,
         'point_positions': splitted_point_positions,
         'radius': splitted_radius,
@@ -799,11 +1566,18 @@ curves
         'matrix': matrix
     })
 
-    rendered_curve_data = base_template % template_vars
+    rendered_curve_data = Template(base_template, template_vars)
 
     del geo
 
-    return rendered_curve_data
+    if return_template:
+        return rendered_curve_data
+
+    if file_handler:
+        rendered_curve_data.write(file_handler)
+        return
+
+    return str(rendered_curve_data)
 
 
 def split_data(data, chunk_size):
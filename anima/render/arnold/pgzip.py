@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+"""Parallel gzip writer.
+
+The data is split in to blocks which are compressed in parallel as
+independent gzip members and written in order. A gzip file with multiple
+members is a valid gzip file, so the output can be read with ``gzip.open``,
+``gunzip`` or Arnold.
+"""
+
+import time
+import zlib
+import struct
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+
+# the number of uncompressed bytes per gzip member
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def compress_member(data, compress_level):
+    """compresses the given data as a complete gzip member
+
+    :param str data: The uncompressed data
+    :param int compress_level: The zlib compression level, 0-9
+    :return: The gzip member as a string
+    """
+    # use a compress object, it releases the GIL while compressing so the
+    # blocks can be compressed in threads
+    compressor = zlib.compressobj(
+        compress_level, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, 0
+    )
+    if compress_level == 9:
+        extra_flags = 2
+    elif compress_level == 1:
+        extra_flags = 4
+    else:
+        extra_flags = 0
+    # no file name and unknown OS
+    header = struct.pack(
+        '<BBBBIBB', 0x1f, 0x8b, 8, 0, int(time.time()), extra_flags, 255
+    )
+    trailer = struct.pack(
+        '<II', zlib.crc32(data) & 0xffffffff, len(data) & 0xffffffff
+    )
+    return ''.join(
+        [header, compressor.compress(data), compressor.flush(), trailer]
+    )
+
+
+class ParallelGzipFile(object):
+    """A write only gzip file which compresses the data in parallel.
+
+    Every ``block_size`` bytes of data is compressed as an independent gzip
+    member in a thread pool and the members are written to the file in order.
+    Use it as a context manager or call :meth:`.close` to write the remaining
+    data::
+
+      with ParallelGzipFile('/tmp/test.ass.gz', compress_level=6) as f:
+          f.write(data)
+
+    :param str path: The file path
+    :param int compress_level: The zlib compression level, 0-9. The default
+      is 9, which is the default of ``gzip.open``.
+    :param int block_size: The number of uncompressed bytes per gzip member.
+      Smaller blocks use less memory but compress slightly worse.
+    :param int worker_count: The number of compression threads, defaults to
+      the cpu count. If 1, the blocks are compressed in the calling thread.
+    """
+
+    def __init__(self, path, compress_level=9, block_size=DEFAULT_BLOCK_SIZE,
+                 worker_count=None):
+        if not 0 <= compress_level <= 9:
+            raise ValueError(
+                'compress_level should be between 0 and 9, not %s' %
+                compress_level
+            )
+        if block_size < 1:
+            raise ValueError(
+                'block_size should be a positive integer, not %s' % block_size
+            )
+        if worker_count is None:
+            worker_count = multiprocessing.cpu_count()
+        if worker_count < 1:
+            raise ValueError(
+                'worker_count should be a positive integer, not %s' %
+                worker_count
+            )
+
+        self.path = path
+        self.compress_level = compress_level
+        self.block_size = block_size
+        self.worker_count = worker_count
+
+        self._file = open(path, 'wb')
+        self._pool = None
+        if worker_count > 1:
+            self._pool = ThreadPool(worker_count)
+        self._buffer = []
+        self._buffer_size = 0
+        self._pending_members = []
+        self._member_count = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, data):
+        """writes the given data
+
+        :param str data: The uncompressed data
+        """
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+        if not data:
+            return
+
+        self._buffer.append(data)
+        self._buffer_size += len(data)
+        if self._buffer_size < self.block_size:
+            return
+
+        data = ''.join(self._buffer)
+        block_size = self.block_size
+        full_size = len(data) - len(data) % block_size
+        for i in xrange(0, full_size, block_size):
+            self._compress(data[i:i + block_size])
+
+        remainder = data[full_size:]
+        self._buffer = [remainder] if remainder else []
+        self._buffer_size = len(remainder)
+
+    def flush(self):
+        """writes the already compressed members to the file
+        """
+        self._write_members(wait=False)
+        self._file.flush()
+
+    def close(self):
+        """compresses the remaining data, writes all the members and closes
+        the file
+        """
+        if self.closed:
+            return
+
+        try:
+            # an empty file still needs one member to be a valid gzip file
+            if self._buffer or not self._member_count:
+                self._compress(''.join(self._buffer))
+                self._buffer = []
+                self._buffer_size = 0
+            self._write_members(wait=True)
+        finally:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+            self._file.close()
+            self.closed = True
+
+    def _compress(self, data):
+        """compresses the given block in the pool
+
+        :param str data: The uncompressed block
+        """
+        self._member_count += 1
+        if self._pool is None:
+            self._file.write(compress_member(data, self.compress_level))
+            return
+
+        self._pending_members.append(
+            self._pool.apply_async(
+                compress_member, (data, self.compress_level)
+            )
+        )
+        # limit the number of blocks in memory
+        if len(self._pending_members) >= 2 * self.worker_count:
+            self._file.write(self._pending_members.pop(0).get())
+        self._write_members(wait=False)
+
+    def _write_members(self, wait):
+        """writes the compressed members in order
+
+        :param bool wait: If True, waits for all the members to be
+          compressed, otherwise writes only the ones that are ready.
+        """
+        pending_members = self._pending_members
+        while pending_members and (wait or pending_members[0].ready()):
+            self._file.write(pending_members.pop(0).get())
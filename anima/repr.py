@@ -185,13 +185,10 @@ class Representation(object):
                 base_take_name, self.repr_separator, repr_name
             )
 
-        from stalker import Version
-        return Version.query\
-            .filter_by(task=self.version.task)\
-            .filter_by(take_name=take_name)\
-            .filter_by(is_published=True)\
-            .order_by(Version.version_number.desc())\
-            .first()
+        from anima.env.base import VersionLookupCache
+        return VersionLookupCache.get_latest_published_version(
+            self.version.task, take_name
+        )
 
     @property
     def repr(self):
@@ -1719,8 +1719,11 @@ class MainDialog(QtWidgets.QDialog, AnimaDialogBase):
                     return
 
         from anima.exc import PublishError
+        from anima.env.base import VersionLookupCache
         try:
-            environment.save_as(new_version, **kwargs)
+            with VersionLookupCache() as cache:
+                environment.save_as(new_version, **kwargs)
+            logger.debug('save_as lookups: %s' % cache)
         except (RuntimeError, PublishError) as e:
             try:
                 error_message = '%s' % e
@@ -64,8 +64,11 @@ class MainDialog(QtWidgets.QDialog, version_updater_UI.Ui_Dialog, AnimaDialogBas
         if reference_resolution is None:
             # generate from environment
             if self.environment:
-                reference_resolution = \
-                    self.environment.check_referenced_versions()
+                from anima.env.base import VersionLookupCache
+                with VersionLookupCache() as cache:
+                    reference_resolution = \
+                        self.environment.check_referenced_versions()
+                logger.debug('check_referenced_versions lookups: %s' % cache)
             else:
                 # create an empty one
                 reference_resolution = empty_reference_resolution()
@@ -8,10 +8,14 @@ import os
 import platform
 import re
 import itertools
+import Queue
 import calendar
+import collections
 import datetime
+import json
 import shutil
 import tempfile
+import threading
 import uuid
 import copy
 import subprocess
@@ -276,6 +280,418 @@ def local_to_utc(local_dt):
     return local_dt - (utc_to_local(local_dt) - local_dt)
 
 
+class MediaInfoCache(object):
+    """A persistent least recently used cache of media info per file.
+
+    The media info of a file is stored with the size and the modification
+    time of the file, so it is used only if the file is not changed. The
+    cache is stored in the local cache folder and keeps the info of the last
+    ``defaults.max_media_info_cache_size`` files::
+
+      cache = MediaInfoCache()
+      media_info = cache.get('/mnt/S/Some/Video.mov')
+      if media_info is None:
+          media_info = get_the_info_somehow()
+          cache.set('/mnt/S/Some/Video.mov', media_info)
+
+    :param int max_size: The maximum number of files in the cache, the
+      default is ``defaults.max_media_info_cache_size``
+    """
+
+    def __init__(self, max_size=None):
+        if max_size is None:
+            from anima import defaults
+            max_size = defaults.max_media_info_cache_size
+        self.max_size = max_size
+        # the least recently used one is the first one
+        self.media_info = collections.OrderedDict()
+        self.lock = threading.RLock()
+        self.restore()
+
+    @classmethod
+    def cache_file_full_path(cls):
+        """:return str: the cache file full path
+        """
+        from anima import defaults
+        return os.path.normpath(
+            os.path.expandvars(
+                os.path.expanduser(
+                    os.path.join(
+                        defaults.local_cache_folder,
+                        defaults.media_info_cache_file_name
+                    )
+                )
+            )
+        )
+
+    @classmethod
+    def get_file_key(cls, full_path):
+        """returns the size and the modification time of the given file or
+        None if the file doesn't exist
+
+        :param str full_path: The full path of the file
+        """
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime]
+
+    def get(self, full_path):
+        """returns a copy of the cached media info of the given file or None if
+        it is not cached or the file is changed after it is cached
+
+        :param str full_path: The full path of the file
+        """
+        file_key = self.get_file_key(full_path)
+        with self.lock:
+            data = self.media_info.pop(full_path, None)
+            if data is None or data[0] != file_key:
+                return None
+            # it is the most recently used one now
+            self.media_info[full_path] = data
+            return copy.deepcopy(data[1])
+
+    def set(self, full_path, media_info):
+        """stores the given media info for the given file and saves the cache
+
+        :param str full_path: The full path of the file
+        :param dict media_info: The media info
+        """
+        file_key = self.get_file_key(full_path)
+        if file_key is None:
+            return
+
+        with self.lock:
+            self.media_info.pop(full_path, None)
+            self.media_info[full_path] = [file_key, copy.deepcopy(media_info)]
+            while len(self.media_info) > self.max_size:
+                self.media_info.popitem(last=False)
+            self.save()
+
+    def save(self):
+        """save the cache to the local cache folder
+        """
+        with self.lock:
+            dumped_data = json.dumps(
+                [[full_path, data[0], data[1]]
+                 for full_path, data in self.media_info.items()]
+            )
+
+        file_full_path = self.cache_file_full_path()
+        try:
+            os.makedirs(os.path.dirname(file_full_path))
+        except OSError:
+            # dir exists
+            pass
+
+        with open(file_full_path, 'w+') as data_file:
+            data_file.write(dumped_data)
+
+    def restore(self):
+        """restore the cache from the local cache folder
+        """
+        try:
+            with open(self.cache_file_full_path(), 'r') as data_file:
+                data = json.loads(data_file.read())
+        except (IOError, ValueError):
+            return
+
+        with self.lock:
+            self.media_info.clear()
+            for full_path, file_key, media_info in data[-self.max_size:]:
+                self.media_info[full_path] = [file_key, media_info]
+
+
+class MediaJob(object):
+    """A media processing job which is run by a :class:`.MediaJobQueue`.
+
+    The status of a job is one of ``queued``, ``running``, ``completed``,
+    ``failed`` or ``cancelled``. The status changes are guarded by the
+    ``lock`` of the job, and a running job is only finished by
+    :meth:`.run`. The return value of the function is stored
+    in the ``result`` attribute and the exception raised by it in the
+    ``error`` attribute.
+
+    :param function: The function to run.
+    :param list args: The positional arguments of the function.
+    :param dict kwargs: The keyword arguments of the function.
+    :param callback: A callable which is called with the job when the job is
+      completed successfully.
+    :param str name: A name to show what the job is doing.
+    :param int ffmpeg_thread_count: The number of threads that the ffmpeg
+      calls in this job can use. The default is the value of the queue.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, function, args=None, kwargs=None, callback=None,
+                 name='', ffmpeg_thread_count=None):
+        self.id = uuid.uuid4().hex
+        self.function = function
+        self.args = args or []
+        self.kwargs = kwargs or {}
+        self.callback = callback
+        self.name = name
+        self.ffmpeg_thread_count = ffmpeg_thread_count
+
+        self.status = self.QUEUED
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.retry_count = 0
+        self.cancel_requested = False
+        self.lock = threading.Lock()
+        self._finished = threading.Event()
+
+    def __repr__(self):
+        return '<MediaJob %s (%s)>' % (self.name or self.id, self.status)
+
+    @property
+    def is_finished(self):
+        """returns True if the job is completed, failed or cancelled
+        """
+        return self._finished.is_set()
+
+    def cancel(self):
+        """Cancels the job. A queued job will not run at all, the result of a
+        running job is discarded and its callback is not called.
+
+        :return: True if the job is cancelled or False if it is already
+          finished.
+        """
+        with self.lock:
+            if self.is_finished:
+                return False
+            self.cancel_requested = True
+            if self.status == self.QUEUED:
+                self._finish(self.CANCELLED)
+        return True
+
+    def reset(self):
+        """resets the job to be run again, the caller should hold the
+        ``lock`` of the job
+        """
+        self.status = self.QUEUED
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.cancel_requested = False
+        self._finished.clear()
+
+    def run(self):
+        """runs the function of the job and calls the callback if the job is
+        completed
+        """
+        with self.lock:
+            if self.status != self.QUEUED:
+                # cancelled before it is started or already run
+                return
+            self.status = self.RUNNING
+
+        try:
+            self.result = self.function(*self.args, **self.kwargs)
+            if not self.cancel_requested and self.callback:
+                self.callback(self)
+        except Exception as e:
+            import traceback
+            self.error = e
+            self.traceback = traceback.format_exc()
+            logger.debug('media job %s failed:\n%s' % (self, self.traceback))
+            with self.lock:
+                self._finish(self.FAILED)
+        else:
+            with self.lock:
+                self._finish(
+                    self.CANCELLED if self.cancel_requested
+                    else self.COMPLETED
+                )
+
+    def _finish(self, status):
+        """sets the status and releases the threads waiting for the job
+        """
+        self.status = status
+        self._finished.set()
+
+    def wait(self, timeout=None):
+        """Blocks until the job is finished.
+
+        :param float timeout: The timeout in seconds.
+        :return: True if the job is finished.
+        """
+        self._finished.wait(timeout)
+        return self.is_finished
+
+
+class MediaJobQueue(object):
+    """Runs media processing jobs like transcodes and thumbnail generations
+    concurrently in a bounded pool of worker threads::
+
+      job_queue = MediaJobQueue(worker_count=4)
+      job = job_queue.submit(
+          media_manager.generate_thumbnail, ['/mnt/S/Some/Video.mov'],
+          callback=lambda j: do_something_with(j.result)
+      )
+      job.status  # 'queued', 'running', 'completed', 'failed', 'cancelled'
+      job.cancel()
+      job_queue.retry(job)
+
+    The cores are shared between the workers, so the ffmpeg calls in a job
+    are limited to ``cpu_count / worker_count`` threads, which can be changed
+    per job.
+
+    :param int worker_count: The number of worker threads, the default is
+      the number of cpus but not more than
+      ``defaults.max_media_job_worker_count``.
+    :param int ffmpeg_thread_count: The default number of ffmpeg threads per
+      job.
+    """
+
+    # per worker thread data, the ffmpeg thread count of the current job
+    _thread_data = threading.local()
+
+    def __init__(self, worker_count=None, ffmpeg_thread_count=None):
+        import multiprocessing
+        cpu_count = multiprocessing.cpu_count()
+        if worker_count is None:
+            from anima import defaults
+            worker_count = min(cpu_count, defaults.max_media_job_worker_count)
+        self.worker_count = max(1, worker_count)
+
+        if ffmpeg_thread_count is None:
+            ffmpeg_thread_count = max(1, cpu_count // self.worker_count)
+        self.ffmpeg_thread_count = ffmpeg_thread_count
+
+        self.jobs = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self._queue = Queue.Queue()
+        self._workers = []
+
+    @classmethod
+    def get_ffmpeg_thread_count(cls):
+        """returns the ffmpeg thread count of the job that is running in the
+        current thread or None if it is not a worker thread
+        """
+        return getattr(cls._thread_data, 'ffmpeg_thread_count', None)
+
+    def _start_workers(self):
+        """starts the worker threads if they are not started yet
+        """
+        with self.lock:
+            while len(self._workers) < self.worker_count:
+                worker = threading.Thread(target=self._work)
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+
+    def _work(self):
+        """runs the queued jobs until a None is queued
+        """
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            self._thread_data.ffmpeg_thread_count = \
+                job.ffmpeg_thread_count or self.ffmpeg_thread_count
+            try:
+                job.run()
+            finally:
+                self._thread_data.ffmpeg_thread_count = None
+
+    def submit(self, function, args=None, kwargs=None, callback=None,
+               name='', ffmpeg_thread_count=None):
+        """Queues a new job, see :class:`.MediaJob` for the arguments.
+
+        :return: :class:`.MediaJob` instance.
+        """
+        job = MediaJob(
+            function,
+            args=args,
+            kwargs=kwargs,
+            callback=callback,
+            name=name,
+            ffmpeg_thread_count=ffmpeg_thread_count
+        )
+        with self.lock:
+            self.jobs[job.id] = job
+        self._start_workers()
+        self._queue.put(job)
+        return job
+
+    def get_job(self, job_id):
+        """returns the job with the given id or None
+
+        :param str job_id: The job id
+        """
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job):
+        """Cancels the given job, see :meth:`.MediaJob.cancel`.
+
+        :param job: A :class:`.MediaJob` instance.
+        """
+        return job.cancel()
+
+    def retry(self, job):
+        """Queues a failed or cancelled job again.
+
+        :param job: A :class:`.MediaJob` instance.
+        :return: The job.
+        """
+        with job.lock:
+            if job.status not in [MediaJob.FAILED, MediaJob.CANCELLED]:
+                raise ValueError(
+                    'only the failed or cancelled jobs can be retried, %s is '
+                    '%s' % (job, job.status)
+                )
+            job.reset()
+            job.retry_count += 1
+        with self.lock:
+            self.jobs[job.id] = job
+        self._start_workers()
+        self._queue.put(job)
+        return job
+
+    def wait(self, jobs=None, timeout=None):
+        """Blocks until the given jobs or all the jobs are finished.
+
+        :param list jobs: A list of :class:`.MediaJob` instances.
+        :param float timeout: The timeout in seconds for each job.
+        :return: True if all the jobs are finished.
+        """
+        if jobs is None:
+            with self.lock:
+                jobs = list(self.jobs.values())
+        return all([job.wait(timeout) for job in jobs])
+
+    def remove_finished_jobs(self):
+        """removes the finished jobs from the jobs of the queue
+        """
+        with self.lock:
+            for job_id, job in list(self.jobs.items()):
+                if job.is_finished:
+                    del self.jobs[job_id]
+
+    def shutdown(self, wait=True):
+        """Stops the worker threads after the queued jobs are finished.
+
+        :param bool wait: Wait for the workers to stop.
+        """
+        with self.lock:
+            workers = self._workers
+            self._workers = []
+        for _ in workers:
+            self._queue.put(None)
+        if wait:
+            for worker in workers:
+                worker.join()
+
+
 class MediaManager(object):
     """Manages media files.
 
@@ -296,6 +712,13 @@ class MediaManager(object):
     It will generate a zip file to serve all the images in an image sequence.
     """
 
+    # the MediaInfoCache instance shared by all the instances
+    _media_info_cache = None
+
+    # the MediaJobQueue instance shared by all the instances
+    _job_queue = None
+    _job_queue_lock = threading.Lock()
+
     def __init__(self):
         self.reference_path = 'References/Stalker_Pyramid/'
         self.version_output_path = 'Outputs/Stalker_Pyramid/'
@@ -448,66 +871,83 @@ class MediaManager(object):
         img.save(thumbnail_path)
         return thumbnail_path
 
-    def generate_video_thumbnail(self, file_full_path):
+    def generate_video_thumbnail(self, file_full_path, seek=True):
         """Generates a thumbnail for the given video link
 
+        The thumbnail is a composite of three frames from the start, middle
+        and end of the video. By default ffmpeg seeks to these frames and
+        composites them in one call, so it doesn't decode the whole video. If
+        that fails or ``seek`` is False, the frames are extracted one by one
+        by decoding the video from the start and then composited.
+
         :param str file_full_path: A string showing the full path of the video
           file.
+        :param bool seek: Seek to the frames. Default is True.
         """
-        # TODO: split this in to two different methods, one generating
-        #       thumbnails from the video and another one accepting three
-        #       images
         media_info = self.get_video_info(file_full_path)
-        video_info = media_info['video_info']
+        nb_frames, frame_rate = self.get_frame_count_and_rate(media_info)
 
-        # get the correct stream
-        video_stream = None
-        for stream in media_info['stream_info']:
-            if stream['codec_type'] == 'video':
-                video_stream = stream
+        thumbnail_path = tempfile.mktemp(suffix=self.thumbnail_format)
 
-        nb_frames = video_stream.get('nb_frames')
-        if nb_frames is None or nb_frames == 'N/A':
-            # no nb_frames
-            # first try to use "r_frame_rate" and "duration"
-            frame_rate = video_stream.get('r_frame_rate')
-
-            if frame_rate is None:  # still no frame rate
-                # try to use the video_info and duration
-                # and try to get frame rate
-                frame_rate = float(video_info.get('TAG:framerate', 23.976))
-            else:
-                # check if it is in Number/Number format
-                if '/' in frame_rate:
-                    nominator, denominator = frame_rate.split('/')
-                    frame_rate = float(nominator)/float(denominator)
+        # generate three thumbnails from the start, middle and end of the file
+        start_frame = int(nb_frames * 0.10)
+        mid_frame = int(nb_frames * 0.5)
+        end_frame = int(nb_frames * 0.90) - 1
 
-            # get duration
-            duration = video_stream.get('duration')
-            if duration == 'N/A':  # no duration
-                duration = float(video_info.get('duration', 1))
-            else:
-                duration = float(duration)
+        if seek and frame_rate > 0:
+            args = [self.ffmpeg_command_path]
+            for frame in [start_frame, mid_frame, end_frame]:
+                # seek before the input
+                args += ['-ss', '%.3f' % (max(0, frame) / frame_rate),
+                         '-i', file_full_path]
+            args += [
+                '-filter_complex', self._get_thumbnail_filter_complex(),
+                '-frames:v', '1'
+            ]
+            self._run_ffmpeg(args, thumbnail_path)
+
+            if os.path.exists(thumbnail_path) \
+               and os.path.getsize(thumbnail_path):
+                return thumbnail_path
+            logger.debug(
+                'seeking failed, decoding the frames of %s' % file_full_path
+            )
 
-            # at this stage we should have enough info, may not be correct but
-            # we should have something
-            # calculate nb_frames
-            logger.debug('duration  : %s' % duration)
-            logger.debug('frame_rate: %s' % frame_rate)
-            nb_frames = int(duration * frame_rate)
-        nb_frames = int(nb_frames)
+        self._generate_video_thumbnail_by_decoding(
+            file_full_path, start_frame, mid_frame, end_frame, thumbnail_path
+        )
+        return thumbnail_path
 
+    def _get_thumbnail_filter_complex(self):
+        """returns the ffmpeg filter graph that composites the start, middle
+        and end frames in the first three inputs in to a thumbnail
+        """
+        return '[0:v]scale=3*%(tw)s/4:-1,pad=%(tw)s:%(th)s[s];' \
+               '[1:v]scale=3*%(tw)s/4:-1,fade=out:300:30:alpha=1[m];' \
+               '[2:v]scale=3*%(tw)s/4:-1,fade=out:300:30:alpha=1[e];' \
+               '[s][e]overlay=%(tw)s/4:%(th)s-h[x];' \
+               '[x][m]overlay=%(tw)s/8:%(th)s/2-h/2' % {
+                   'tw': self.thumbnail_width,
+                   'th': self.thumbnail_height
+               }
+
+    def _generate_video_thumbnail_by_decoding(self, file_full_path,
+                                              start_frame, mid_frame,
+                                              end_frame, thumbnail_path):
+        """Generates a thumbnail for the given video by extracting the given
+        frames with separate ffmpeg calls which decode the video from the
+        start, and then compositing them.
+
+        :param str file_full_path: The full path of the video file
+        :param int start_frame: The start frame
+        :param int mid_frame: The middle frame
+        :param int end_frame: The end frame
+        :param str thumbnail_path: The output path
+        """
         start_thumb_path = tempfile.mktemp(suffix=self.thumbnail_format)
         mid_thumb_path = tempfile.mktemp(suffix=self.thumbnail_format)
         end_thumb_path = tempfile.mktemp(suffix=self.thumbnail_format)
 
-        thumbnail_path = tempfile.mktemp(suffix=self.thumbnail_format)
-
-        # generate three thumbnails from the start, middle and end of the file
-        start_frame = int(nb_frames * 0.10)
-        mid_frame = int(nb_frames * 0.5)
-        end_frame = int(nb_frames * 0.90) - 1
-
         # start_frame
         self.ffmpeg(**{
             'i': file_full_path,
@@ -556,16 +996,7 @@ class MediaManager(object):
         # now merge them
         self.ffmpeg(**{
             'i': [start_thumb_path, mid_thumb_path, end_thumb_path],
-            'filter_complex':
-                '[0:0]scale=3*%(tw)s/4:-1,pad=%(tw)s:%(th)s[s];'
-                '[1:0]scale=3*%(tw)s/4:-1,fade=out:300:30:alpha=1[m];'
-                '[2:0]scale=3*%(tw)s/4:-1,fade=out:300:30:alpha=1[e];'
-                '[s][e]overlay=%(tw)s/4:%(th)s-h[x];'
-                '[x][m]overlay=%(tw)s/8:%(th)s/2-h/2' %
-                {
-                    'tw': self.thumbnail_width,
-                    'th': self.thumbnail_height
-                },
+            'filter_complex': self._get_thumbnail_filter_complex(),
             'o': thumbnail_path
         })
 
@@ -585,8 +1016,6 @@ class MediaManager(object):
         except OSError:
             pass
 
-        return thumbnail_path
-
     def generate_video_for_web(self, file_full_path):
         """Generates a web friendly version for the given video.
 
@@ -664,66 +1093,134 @@ class MediaManager(object):
 
         return file_full_path
 
+    @property
+    def media_info_cache(self):
+        """returns the :class:`.MediaInfoCache` shared by all the
+        MediaManager instances
+        """
+        if MediaManager._media_info_cache is None:
+            MediaManager._media_info_cache = MediaInfoCache()
+        return MediaManager._media_info_cache
+
+    @property
+    def job_queue(self):
+        """returns the :class:`.MediaJobQueue` shared by all the MediaManager
+        instances
+        """
+        with MediaManager._job_queue_lock:
+            if MediaManager._job_queue is None:
+                MediaManager._job_queue = MediaJobQueue()
+        return MediaManager._job_queue
+
     def get_video_info(self, full_path):
         """Returns the video info like the duration  in seconds and fps.
 
-        Uses ffmpeg to extract information about the video file.
+        Uses ffprobe to extract information about the video file. The streams
+        and the format of the file are read with one ffprobe call and the
+        result is cached per file in :attr:`.media_info_cache`.
 
         :param str full_path: The full path of the video file
-        :return: int
+        :return: dict
         """
+        media_info = self.media_info_cache.get(full_path)
+        if media_info is not None:
+            return media_info
+
         output_buffer = self.ffprobe(**{
-            'show_streams': full_path,
+            'v': 'quiet',
+            'print_format': 'json',
+            'show_streams': None,
+            'show_format': None,
+            'i': full_path
         })
+        media_info = self.parse_ffprobe_output(''.join(output_buffer))
 
-        media_info = {
-            'video_info': None,
-            'stream_info': []
+        if media_info['stream_info']:
+            self.media_info_cache.set(full_path, media_info)
+        return media_info
+
+    @classmethod
+    def parse_ffprobe_output(cls, output):
+        """Parses the JSON output of ffprobe in to a dictionary with the
+        "video_info" and "stream_info" keys, which are the format info and the
+        list of stream infos. The nested "tags" and "disposition" values are
+        flattened with the "TAG:" and "DISPOSITION:" prefixes and all the
+        values are strings, like in the default output format of ffprobe.
+
+        :param str output: The output of ffprobe with "-print_format json"
+        :return: dict
+        """
+        try:
+            data = json.loads(output)
+        except ValueError:
+            data = {}
+
+        def flatten(info):
+            flat_info = {}
+            for key, value in info.items():
+                if key in ('tags', 'disposition'):
+                    prefix = 'TAG' if key == 'tags' else 'DISPOSITION'
+                    for sub_key, sub_value in value.items():
+                        flat_info['%s:%s' % (prefix, sub_key)] = \
+                            unicode(sub_value)
+                else:
+                    flat_info[key] = unicode(value)
+            return flat_info
+
+        return {
+            'video_info': flatten(data.get('format', {})),
+            'stream_info': map(flatten, data.get('streams', []))
         }
-        video_info = {}
-        stream_info = {}
-
-        # get STREAM info
-        line = output_buffer.pop(0).strip()
-        while line is not None:
-            if line == '[STREAM]':
-                # pop until you find [/STREAM]
-                while line != '[/STREAM]':
-                    if '=' in line:
-                        flag, value = line.split('=')
-                        stream_info[flag] = value
-                    line = output_buffer.pop(0).strip()
-
-                copy_stream = copy.deepcopy(stream_info)
-                media_info['stream_info'].append(copy_stream)
-                stream_info = {}
-            try:
-                line = output_buffer.pop(0).strip()
-            except IndexError:
-                line = None
 
-        # also get FORMAT info
-        output_buffer = self.ffprobe(**{
-            'show_format': full_path,
-        })
+    @classmethod
+    def get_frame_count_and_rate(cls, media_info):
+        """Returns the frame count and the frame rate of the first video stream
+        in the given media info. If the stream doesn't have the frame count,
+        it is calculated from the duration and the frame rate.
+
+        :param dict media_info: The media info returned by
+          :meth:`.get_video_info`
+        :return: A tuple of the frame count as an int and the frame rate as a
+          float
+        """
+        video_info = media_info['video_info'] or {}
 
-        line = output_buffer.pop(0).strip()
-        while line is not None:
-            if line == '[FORMAT]':
-                # pop until you find [/FORMAT]
-                while line != '[/FORMAT]':
-                    if '=' in line:
-                        flag, value = line.split('=')
-                        video_info[flag] = value
-                    line = output_buffer.pop(0).strip()
-
-                media_info['video_info'] = video_info
-            try:
-                line = output_buffer.pop(0).strip()
-            except IndexError:
-                line = None
+        # get the correct stream
+        video_stream = {}
+        for stream in media_info['stream_info']:
+            if stream.get('codec_type') == 'video':
+                video_stream = stream
+                break
 
-        return media_info
+        frame_rate = video_stream.get('r_frame_rate')
+        if frame_rate in (None, 'N/A', '0/0'):
+            # try to use the video_info and get the frame rate
+            frame_rate = float(video_info.get('TAG:framerate', 23.976))
+        elif '/' in frame_rate:
+            # it is in Number/Number format
+            nominator, denominator = frame_rate.split('/')
+            frame_rate = float(nominator) / float(denominator)
+        else:
+            frame_rate = float(frame_rate)
+
+        nb_frames = video_stream.get('nb_frames')
+        if nb_frames is None or nb_frames == 'N/A':
+            # get duration
+            duration = video_stream.get('duration')
+            if duration is None or duration == 'N/A':  # no duration
+                duration = video_info.get('duration')
+            if duration is None or duration == 'N/A':
+                duration = 1
+            duration = float(duration)
+
+            # at this stage we should have enough info, may not be correct but
+            # we should have something
+            # calculate nb_frames
+            logger.debug('duration  : %s' % duration)
+            logger.debug('frame_rate: %s' % frame_rate)
+            nb_frames = duration * frame_rate
+
+        return int(nb_frames), frame_rate
 
     def ffmpeg(self, **kwargs):
         """A simple python wrapper for ``ffmpeg`` command.
@@ -757,11 +1254,24 @@ class MediaManager(object):
 
             # overwrite output
 
+        return self._run_ffmpeg(args, output)
+
+    def _run_ffmpeg(self, args, output):
+        """Runs ffmpeg with the given arguments and output, which lets the
+        arguments to be in a specific order, like an input option before
+        every input.
+
+        :param list args: The ffmpeg command path and the arguments
+        :param str output: The output file path
+        :return: The lines in the stderr of ffmpeg
+        """
         # if output format is not a jpg or png
         if output.split('.')[-1] not in ['jpg', 'jpeg', 'png', 'tga']:
-            # use all cpus
-            import multiprocessing
-            num_of_threads = multiprocessing.cpu_count()
+            # use the cpus assigned to the job or all cpus
+            num_of_threads = MediaJobQueue.get_ffmpeg_thread_count()
+            if not num_of_threads:
+                import multiprocessing
+                num_of_threads = multiprocessing.cpu_count()
             args.append('-threads')
             args.append('%s' % num_of_threads)
 
@@ -797,13 +1307,19 @@ class MediaManager(object):
 
     def ffprobe(self, **kwargs):
         """A simple python wrapper for ``ffprobe`` command.
+
+        The keyword arguments are the flags and their values, use None as the
+        value of the flags without a value.
         """
         # generate args
         args = [self.ffprobe_command_path]
         for key in kwargs:
             flag = '-' + key
             value = kwargs[key]
-            if not isinstance(value, list):
+            if value is None:
+                # a flag without a value
+                args.append(flag)
+            elif not isinstance(value, list):
                 # append the flag
                 args.append(flag)
                 # append the value
@@ -1143,7 +1659,7 @@ class MediaManager(object):
 
         return file_full_path
 
-    def upload_reference(self, task, file_object, filename):
+    def upload_reference(self, task, file_object, filename, wait=True):
         """Uploads a reference for the given task to
         Task.path/References/Stalker_Pyramid/ folder and create a Link object
         to there. Again the Link object will have a Repository root relative
@@ -1154,12 +1670,19 @@ class MediaManager(object):
         web friendly version (PNG for images, WebM for video files) under
         {{Task.absolute_path}}/References/Stalker_Pyramid/ForWeb folder.
 
+        The web version and the thumbnail are generated concurrently in the
+        :attr:`.job_queue`, see :meth:`.submit_link_media_jobs`.
+
         :param task: The task that a reference is uploaded to. Should be an
           instance of :class:`.Task` class.
         :type task: :class:`.Task`
         :param file_object: The file like object holding the content of the
           uploaded file.
         :param str filename: The original filename.
+        :param bool wait: Wait for the web version and the thumbnail and link
+          them. If it is False the Link is returned immediately, the jobs can
+          be reached with the ``media_jobs`` attribute of the Link and nothing
+          is linked until ``link.link_media()`` is called in the same thread.
         :returns: :class:`.Link` instance.
         """
         ############################################################
@@ -1174,10 +1697,6 @@ class MediaManager(object):
         reference_file_full_path = \
             self.upload_file(file_object, file_path, filename)
 
-        reference_file_file_name = os.path.basename(reference_file_full_path)
-        reference_file_base_name = \
-            os.path.splitext(reference_file_file_name)[0]
-
         # create a Link instance and return it.
         # use a Repository relative path
         repo = task.project.repository
@@ -1188,78 +1707,21 @@ class MediaManager(object):
 
         link = Link(full_path=relative_full_path, original_filename=filename)
 
-        # create a thumbnail for the given reference
-        # don't forget that the first thumbnail is the Web viewable version
-        # and the second thumbnail is the thumbnail
-
         ############################################################
-        # WEB VERSION
+        # WEB VERSION & THUMBNAIL
         ############################################################
-        web_version_temp_full_path = \
-            self.generate_media_for_web(reference_file_full_path)
-        web_version_extension = \
-            os.path.splitext(web_version_temp_full_path)[-1]
-
-        web_version_file_name = '%s%s' % (reference_file_base_name,
-                                          web_version_extension)
-        web_version_full_path = \
-            os.path.join(
-                os.path.dirname(reference_file_full_path),
-                'ForWeb',
-                web_version_file_name
+        def create_link(full_path):
+            return Link(
+                full_path=repo.make_relative(full_path),
+                original_filename=os.path.basename(full_path)
             )
-        web_version_repo_relative_full_path = \
-            repo.make_relative(web_version_full_path)
-        web_version_link = Link(
-            full_path=web_version_repo_relative_full_path,
-            original_filename=web_version_file_name
-        )
 
-        # move it to repository
-        try:
-            os.makedirs(os.path.dirname(web_version_full_path))
-        except OSError:  # path exists
-            pass
-        shutil.move(web_version_temp_full_path, web_version_full_path)
-
-        ############################################################
-        # THUMBNAIL
-        ############################################################
-        # finally generate a Thumbnail
-        thumbnail_temp_full_path = \
-            self.generate_thumbnail(reference_file_full_path)
-        thumbnail_extension = os.path.splitext(thumbnail_temp_full_path)[-1]
-        thumbnail_file_name = '%s%s' % (reference_file_base_name,
-                                        thumbnail_extension)
-
-        thumbnail_full_path = \
-            os.path.join(
-                os.path.dirname(reference_file_full_path),
-                'Thumbnail',
-                thumbnail_file_name
-            )
-        thumbnail_repo_relative_full_path = \
-            repo.make_relative(thumbnail_full_path)
-        thumbnail_link = Link(
-            full_path=thumbnail_repo_relative_full_path,
-            original_filename=thumbnail_file_name
+        self.submit_link_media_jobs(
+            link, reference_file_full_path, create_link, wait=wait
         )
 
-        # move it to repository
-        try:
-            os.makedirs(os.path.dirname(thumbnail_full_path))
-        except OSError:  # path exists
-            pass
-        shutil.move(thumbnail_temp_full_path, thumbnail_full_path)
-
-        ############################################################
-        # LINK Objects
-        ############################################################
-        # link them
         # assign it as a reference to the given task
         task.references.append(link)
-        link.thumbnail = web_version_link
-        web_version_link.thumbnail = thumbnail_link
 
         return link
 
@@ -1295,7 +1757,8 @@ class MediaManager(object):
 
         return v
 
-    def upload_version_output(self, version, file_object, filename):
+    def upload_version_output(self, version, file_object, filename,
+                              wait=True):
         """Uploads a file as an output for the given :class:`.Version`
         instance. Will store the file in
         {{Version.absolute_path}}/Outputs/Stalker_Pyramid/ folder.
@@ -1305,12 +1768,19 @@ class MediaManager(object):
         web friendly version (PNG for images, WebM for video files) under
         {{Version.absolute_path}}/Outputs/Stalker_Pyramid/ForWeb folder.
 
+        The web version and the thumbnail are generated concurrently in the
+        :attr:`.job_queue`, see :meth:`.submit_link_media_jobs`.
+
         :param version: A :class:`.Version` instance that the output is
           uploaded for.
         :type version: :class:`.Version`
         :param file_object: The file like object holding the content of the
           uploaded file.
         :param str filename: The original filename.
+        :param bool wait: Wait for the web version and the thumbnail and link
+          them. If it is False the Link is returned immediately, the jobs can
+          be reached with the ``media_jobs`` attribute of the Link and nothing
+          is linked until ``link.link_media()`` is called in the same thread.
         :returns: :class:`.Link` instance.
         """
         ############################################################
@@ -1325,11 +1795,6 @@ class MediaManager(object):
         version_output_file_full_path = \
             self.upload_file(file_object, file_path, filename)
 
-        version_output_file_name = \
-            os.path.basename(version_output_file_full_path)
-        version_output_base_name = \
-            os.path.splitext(version_output_file_name)[0]
-
         # create a Link instance and return it.
         # use a Repository relative path
         repo = version.task.project.repository
@@ -1342,85 +1807,146 @@ class MediaManager(object):
             original_filename=str(filename)
         )
 
-        # create a thumbnail for the given version output
-        # don't forget that the first thumbnail is the Web viewable version
-        # and the second thumbnail is the thumbnail
-
         ############################################################
-        # WEB VERSION
+        # WEB VERSION & THUMBNAIL
         ############################################################
-        web_version_link = None
-        try:
-            web_version_temp_full_path = \
-                self.generate_media_for_web(version_output_file_full_path)
-            web_version_extension = \
-                os.path.splitext(web_version_temp_full_path)[-1]
-            web_version_full_path = \
-                os.path.join(
-                    os.path.dirname(version_output_file_full_path),
-                    'ForWeb',
-                    version_output_base_name + web_version_extension
-                )
-
-            web_version_link = Link(
-                full_path=repo.to_os_independent_path(web_version_full_path),
+        def create_link(full_path):
+            return Link(
+                full_path=repo.to_os_independent_path(full_path),
                 original_filename=filename
             )
 
-            # move it to repository
-            try:
-                os.makedirs(os.path.dirname(web_version_full_path))
-            except OSError:  # path exists
-                pass
-            shutil.move(web_version_temp_full_path, web_version_full_path)
-        except RuntimeError:
-            # not an image or video so skip it
-            pass
+        # skip the files that are not an image or video
+        self.submit_link_media_jobs(
+            link, version_output_file_full_path, create_link, wait=wait,
+            ignored_errors=(RuntimeError,)
+        )
 
-        ############################################################
-        # THUMBNAIL
-        ############################################################
-        # finally generate a Thumbnail
-        thumbnail_link = None
-        try:
-            thumbnail_temp_full_path = \
-                self.generate_thumbnail(version_output_file_full_path)
-            thumbnail_extension = os.path.splitext(thumbnail_temp_full_path)[-1]
-
-            thumbnail_full_path = \
-                os.path.join(
-                    os.path.dirname(version_output_file_full_path),
-                    'Thumbnail',
-                    version_output_base_name + thumbnail_extension
-                )
+        # assign it as an output to the given version
+        version.outputs.append(link)
 
-            thumbnail_link = Link(
-                full_path=repo.to_os_independent_path(thumbnail_full_path),
-                original_filename=filename
+        return link
+
+    def submit_link_media_jobs(self, link, file_full_path, create_link,
+                               wait=True, ignored_errors=()):
+        """Submits the jobs that generate the web version and the thumbnail of
+        the given file to the :attr:`.job_queue`.
+
+        The media are moved to the ForWeb and Thumbnail folders next to the
+        file. The jobs only generate the media, the Links of them are created
+        and linked by :meth:`.link_media` in the calling thread, so the first
+        thumbnail of the given Link is the web version and the thumbnail of
+        the web version is the thumbnail.
+
+        If ``wait`` is False nothing is linked until the ``link_media()``
+        function which is stored in the given Link is called in the thread
+        that uses the database session of the Link::
+
+          jobs = media_manager.submit_link_media_jobs(
+              link, path, create_link, wait=False
+          )
+          # later in the same thread
+          link.link_media()
+
+        :param link: The :class:`.Link` instance of the file.
+        :param str file_full_path: The full path of the file.
+        :param create_link: A callable which returns a new Link for the given
+          media path.
+        :param bool wait: Wait for the jobs, link the media and raise the
+          errors of the failed jobs.
+        :param tuple ignored_errors: The errors that are not raised.
+        :returns: The list of :class:`.MediaJob` instances, which are also
+          stored in the ``media_jobs`` attribute of the given Link.
+        """
+        jobs = [
+            self.job_queue.submit(
+                self.generate_media_to_folder,
+                [generator, file_full_path, folder],
+                name=name
             )
+            for name, generator, folder in [
+                ('web version', self.generate_media_for_web, 'ForWeb'),
+                ('thumbnail', self.generate_thumbnail, 'Thumbnail'),
+            ]
+        ]
+        link.media_jobs = jobs
 
-            # move it to repository
-            try:
-                os.makedirs(os.path.dirname(thumbnail_full_path))
-            except OSError:  # path exists
-                pass
-            shutil.move(thumbnail_temp_full_path, thumbnail_full_path)
-        except RuntimeError:
-            # not an image or video so skip it
-            pass
+        def link_media(timeout=None):
+            return self.link_media(
+                link, jobs, create_link, ignored_errors=ignored_errors,
+                timeout=timeout
+            )
+        link.link_media = link_media
+
+        if wait:
+            link_media()
+
+        return jobs
+
+    def link_media(self, link, jobs, create_link, ignored_errors=(),
+                   timeout=None):
+        """Waits for the given media jobs and creates and links the Links of
+        their media to the given Link. It should be called in the thread that
+        uses the database session of the given Link.
+
+        :param link: The :class:`.Link` instance of the file.
+        :param list jobs: The jobs returned by
+          :meth:`.submit_link_media_jobs`.
+        :param create_link: A callable which returns a new Link for the given
+          media path.
+        :param tuple ignored_errors: The errors that are not raised.
+        :param float timeout: The timeout in seconds for each job.
+        :returns: A dictionary of the job names and the created Links.
+        """
+        self.job_queue.wait(jobs, timeout)
 
-        ############################################################
-        # LINK Objects
-        ############################################################
-        # link them
-        # assign it as an output to the given version
-        version.outputs.append(link)
+        media_links = {}
+        for job in jobs:
+            if job.status == MediaJob.COMPLETED:
+                media_links[job.name] = create_link(job.result)
+
+        web_version_link = media_links.get('web version')
+        thumbnail_link = media_links.get('thumbnail')
         if web_version_link:
             link.thumbnail = web_version_link
             if thumbnail_link:
                 web_version_link.thumbnail = thumbnail_link
 
-        return link
+        for job in jobs:
+            if job.status == MediaJob.FAILED \
+               and not isinstance(job.error, ignored_errors):
+                raise job.error
+
+        return media_links
+
+    @classmethod
+    def generate_media_to_folder(cls, generator, file_full_path, folder):
+        """Generates a media with the given generator and moves it to the
+        given folder next to the given file by keeping the file base name.
+
+        :param generator: A callable returning the path of a temp file that
+          is generated for the given file, like :meth:`.generate_thumbnail`.
+        :param str file_full_path: The full path of the file.
+        :param str folder: The folder name.
+        :returns str: The full path of the generated media.
+        """
+        temp_full_path = generator(file_full_path)
+        extension = os.path.splitext(temp_full_path)[-1]
+        base_name = os.path.splitext(os.path.basename(file_full_path))[0]
+        full_path = os.path.join(
+            os.path.dirname(file_full_path),
+            folder,
+            base_name + extension
+        )
+
+        # move it to repository
+        try:
+            os.makedirs(os.path.dirname(full_path))
+        except OSError:  # path exists
+            pass
+        shutil.move(temp_full_path, full_path)
+
+        return full_path
 
 
 class Exposure(object):
@@ -53,7 +53,7 @@ class Base85TestCase(unittest.TestCase):
         for i in range(len(raw_data)):
             self.assertEqual(
                 encoded_data[i],
-                base85.arnold_b85_encode(raw_data[i])
+                base85.arnold_b85_encode(raw_data[i], special_values=True)
             )
 
     def test_arnold_b85_encode_packs_ones_properly(self):
@@ -72,7 +72,7 @@ class Base85TestCase(unittest.TestCase):
         for i in range(len(raw_data)):
             self.assertEqual(
                 encoded_data[i],
-                base85.arnold_b85_encode(raw_data[i])
+                base85.arnold_b85_encode(raw_data[i], special_values=True)
             )
 
     def test_arnold_b85_decode_is_working_properly(self):
@@ -110,7 +110,7 @@ class Base85TestCase(unittest.TestCase):
         for i in range(len(raw_data)):
             self.assertEqual(
                 raw_data[i],
-                base85.arnold_b85_decode(encoded_data[i])
+                base85.arnold_b85_decode(encoded_data[i], special_values=True)
             )
 
     def test_arnold_b85_decode_unpacks_ones_properly(self):
@@ -129,7 +129,7 @@ class Base85TestCase(unittest.TestCase):
         for i in range(len(raw_data)):
             self.assertEqual(
                 raw_data[i],
-                base85.arnold_b85_decode(encoded_data[i])
+                base85.arnold_b85_decode(encoded_data[i], special_values=True)
             )
 
     def test_arnold_b85_encoding_real_world_data(self):
@@ -142,12 +142,15 @@ class Base85TestCase(unittest.TestCase):
         data_format = '%sB' % len(raw_data)
         self.assertEqual(
             encoded_data,
-            base85.arnold_b85_encode(struct.pack(data_format, *raw_data))
+            base85.arnold_b85_encode(
+                struct.pack(data_format, *raw_data), special_values=True
+            )
         )
         self.assertEqual(
             raw_data,
             list(struct.unpack('%sB' % len(raw_data),
-                          base85.arnold_b85_decode(encoded_data)))
+                          base85.arnold_b85_decode(
+                              encoded_data, special_values=True)))
         )
 
         # b85POINT2
@@ -161,12 +164,15 @@ class Base85TestCase(unittest.TestCase):
         data_format = '%sf' % len(raw_data)
         self.assertEqual(
             encoded_data,
-            base85.arnold_b85_encode(struct.pack(data_format, *raw_data))
+            base85.arnold_b85_encode(
+                struct.pack(data_format, *raw_data), special_values=True
+            )
         )
         self.assertEqual(
             raw_data,
             list(struct.unpack('%sf' % len(raw_data),
-                          base85.arnold_b85_decode(encoded_data)))
+                          base85.arnold_b85_decode(
+                              encoded_data, special_values=True)))
         )
 
         # b85POINT
@@ -182,10 +188,183 @@ class Base85TestCase(unittest.TestCase):
         data_format = '%sf' % len(raw_data)
         self.assertEqual(
             encoded_data,
-            base85.arnold_b85_encode(struct.pack(data_format, *raw_data))
+            base85.arnold_b85_encode(
+                struct.pack(data_format, *raw_data), special_values=True
+            )
         )
         self.assertEqual(
             raw_data,
             list(struct.unpack('%sf' % len(raw_data),
-                               base85.arnold_b85_decode(encoded_data)))
+                               base85.arnold_b85_decode(
+                              encoded_data, special_values=True)))
+        )
+
+    def test_numpy_backend_is_producing_identical_output(self):
+        """testing if the numpy backend is producing byte identical output with
+        the python backend for all of the alphabets
+        """
+        if base85.BACKEND_NUMPY not in base85.available_backends():
+            self.skipTest('NumPy is not installed')
+
+        raw_data = struct.pack(
+            '<%sf' % 48, *[float(i) / 3.0 for i in range(48)]
+        ) + '\xff\xff\xff\xff\x01\x02\x03'
+
+        for encode, decode in [(base85.b85_encode, base85.b85_decode),
+                               (base85.rfc1924_b85_encode,
+                                base85.rfc1924_b85_decode),
+                               (base85.arnold_b85_encode,
+                                base85.arnold_b85_decode)]:
+            python_encoded = encode(raw_data, backend=base85.BACKEND_PYTHON)
+            numpy_encoded = encode(raw_data, backend=base85.BACKEND_NUMPY)
+            self.assertEqual(python_encoded, numpy_encoded)
+            self.assertEqual(
+                decode(python_encoded, backend=base85.BACKEND_PYTHON),
+                decode(numpy_encoded, backend=base85.BACKEND_NUMPY)
+            )
+
+    def test_backend_argument_is_not_a_known_backend(self):
+        """testing if a ValueError will be raised when the backend argument is
+        not one of the known backends
+        """
+        with self.assertRaises(ValueError) as cm:
+            base85.arnold_b85_encode('abcd', backend='not a backend')
+
+        self.assertEqual(
+            str(cm.exception),
+            "backend should be one of ['python', 'numpy'], not not a backend"
+        )
+
+    def test_encoder_is_producing_the_same_data_with_arnold_b85_encode(self):
+        """testing if the Encoder is producing the same data with
+        arnold_b85_encode when the data is fed in non word aligned chunks
+        """
+        raw_data = struct.pack(
+            '<%sf' % 300, *[float(i) / 7.0 for i in range(300)]
+        ) + '\x01\x02'
+
+        encoder = base85.Encoder('arnold')
+        encoded_data = []
+        for i in range(0, len(raw_data), 13):
+            encoded_data.append(encoder.encode(raw_data[i:i + 13]))
+        encoded_data.append(encoder.flush())
+
+        self.assertEqual(
+            base85.arnold_b85_encode(raw_data),
+            ''.join(encoded_data)
+        )
+
+    def test_encoder_is_wrapping_lines_properly(self):
+        """testing if the Encoder is inserting new lines at every line_length
+        characters
+        """
+        raw_data = struct.pack(
+            '<%sf' % 300, *[float(i) / 7.0 for i in range(300)]
+        )
+
+        encoder = base85.Encoder('arnold', line_length=100)
+        encoded_data = []
+        for i in range(0, len(raw_data), 37):
+            encoded_data.append(encoder.encode(raw_data[i:i + 37]))
+        encoded_data.append(encoder.flush())
+
+        full_encoded_data = base85.arnold_b85_encode(raw_data)
+        self.assertEqual(
+            '\n'.join([full_encoded_data[i:i + 100]
+                       for i in range(0, len(full_encoded_data), 100)]),
+            ''.join(encoded_data)
+        )
+
+    def test_encoder_alphabet_argument_is_not_a_known_alphabet(self):
+        """testing if a ValueError will be raised when the alphabet argument
+        is not one of the known alphabets
+        """
+        with self.assertRaises(ValueError) as cm:
+            base85.Encoder('not an alphabet')
+
+        self.assertEqual(
+            str(cm.exception),
+            "alphabet should be one of ['arnold', 'rfc1924', 'standard'], "
+            "not not an alphabet"
+        )
+
+    def test_pool_is_producing_the_same_data_with_the_serial_functions(self):
+        """testing if the Pool is producing the same data with the serial
+        encode and decode functions
+        """
+        raw_data = struct.pack(
+            '<%sf' % 1000, *[float(i) / 7.0 for i in range(1000)]
+        ) + '\x01\x02'
+
+        with base85.Pool(worker_count=3, min_chunk_size=10) as pool:
+            for alphabet in ['standard', 'rfc1924', 'arnold']:
+                encoded_data = pool.encode(raw_data, alphabet)
+                self.assertEqual(
+                    base85.encode(raw_data, alphabet),
+                    encoded_data
+                )
+                self.assertEqual(
+                    base85.decode(encoded_data, alphabet),
+                    pool.decode(encoded_data, alphabet)
+                )
+
+    def test_pool_worker_count_argument_is_zero(self):
+        """testing if a ValueError will be raised when the worker_count
+        argument is zero
+        """
+        with self.assertRaises(ValueError) as cm:
+            base85.Pool(worker_count=0)
+
+        self.assertEqual(
+            str(cm.exception),
+            'worker_count should be a positive integer, not 0'
+        )
+
+    def test_special_values_are_not_used_by_default(self):
+        """testing if arnold_b85_encode is not using the special values by
+        default
+        """
+        self.assertEqual(
+            '$$$$$8Fcb9',
+            base85.arnold_b85_encode(struct.pack('ff', 0.0, 1.0))
+        )
+
+    def test_special_values_are_word_aligned(self):
+        """testing if the special values are only used for whole words and not
+        for encoded data that happens to contain the special value characters
+        across word boundaries
+        """
+        # '$$$$$' spans the boundary of these two words, which are encoded as
+        # '%$$$$' and '$$$$%'
+        raw_data = struct.pack('<III', 52200625, 1, 0)
+        encoded_data = base85.arnold_b85_encode(raw_data, special_values=True)
+        self.assertEqual('%$$$$$$$$%z', encoded_data)
+        self.assertEqual(
+            raw_data,
+            base85.arnold_b85_decode(encoded_data, special_values=True)
+        )
+
+    def test_numpy_backend_is_producing_identical_special_values(self):
+        """testing if the numpy backend is producing byte identical output
+        with the python backend when the special values are used
+        """
+        if base85.BACKEND_NUMPY not in base85.available_backends():
+            self.skipTest('NumPy is not installed')
+
+        raw_data = struct.pack(
+            '<%sf' % 40, *[[0.0, 1.0, 0.5, 0.25][i % 4] for i in range(40)]
+        )
+        python_encoded = base85.arnold_b85_encode(
+            raw_data, backend=base85.BACKEND_PYTHON, special_values=True
+        )
+        numpy_encoded = base85.arnold_b85_encode(
+            raw_data, backend=base85.BACKEND_NUMPY, special_values=True
+        )
+        self.assertEqual(python_encoded, numpy_encoded)
+        self.assertEqual(
+            raw_data,
+            base85.arnold_b85_decode(
+                numpy_encoded, backend=base85.BACKEND_NUMPY,
+                special_values=True
+            )
         )
@@ -0,0 +1,834 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+
+import os
+import gzip
+import json
+import array
+import struct
+import shutil
+import hashlib
+import tempfile
+import unittest
+from cStringIO import StringIO
+
+from anima.render.arnold import base85, h2a
+
+
+class StubPoint(object):
+    """A stub for hou.Point
+    """
+
+    def __init__(self, number):
+        self._number = number
+
+    def number(self):
+        return self._number
+
+
+class StubVertex(object):
+    """A stub for hou.Vertex
+    """
+
+    def __init__(self, point_number):
+        self._point = StubPoint(point_number)
+
+    def point(self):
+        return self._point
+
+
+class StubPrim(object):
+    """A stub for hou.Prim
+    """
+
+    def __init__(self, point_numbers):
+        self._vertices = [StubVertex(i) for i in point_numbers]
+
+    def vertices(self):
+        return self._vertices
+
+    def numVertices(self):
+        return len(self._vertices)
+
+
+class StubAttrib(object):
+    """A stub for hou.Attrib
+    """
+
+    def __init__(self, name, size=1, values=None):
+        self._name = name
+        self._size = size
+        self.values = values
+
+    def size(self):
+        return self._size
+
+
+class StubGeometry(object):
+    """A stub for hou.Geometry which is enough to export polygons
+    """
+
+    def __init__(self, prims, point_count, with_topology_attributes=False,
+                 vertex_attributes=None, point_attributes=None):
+        self.prims = prims
+        self.point_count = point_count
+        self.with_topology_attributes = with_topology_attributes
+        self.vertex_attributes = vertex_attributes or {}
+        self.point_attributes = point_attributes or {}
+
+    def findPrimAttrib(self, name):
+        if self.with_topology_attributes and name == 'nsides':
+            return StubAttrib(name)
+
+    def findVertexAttrib(self, name):
+        if self.with_topology_attributes and name == 'vidxs':
+            return StubAttrib(name)
+        return self.vertex_attributes.get(name)
+
+    def findPointAttrib(self, name):
+        return self.point_attributes.get(name)
+
+    def vertexFloatAttribValuesAsString(self, name):
+        values = self.vertex_attributes[name].values
+        return struct.pack('%sf' % len(values), *values)
+
+    def primIntAttribValuesAsString(self, name):
+        values = [len(prim) for prim in self.prims]
+        return struct.pack('%si' % len(values), *values)
+
+    def vertexIntAttribValuesAsString(self, name):
+        values = [i for prim in self.prims for i in prim]
+        return struct.pack('%si' % len(values), *values)
+
+    def iterPrims(self):
+        for prim in self.prims:
+            yield StubPrim(prim)
+
+    def intrinsicValueDict(self):
+        return {
+            'primitivecount': len(self.prims),
+            'pointcount': self.point_count,
+            'vertexcount': sum(map(len, self.prims)),
+        }
+
+    def attribValue(self, name):
+        if name == 'bound_min':
+            return -1.0, -1.0, -1.0
+        return float(self.point_count), 1.0, 1.0
+
+    def pointFloatAttribValuesAsString(self, name):
+        if name in self.point_attributes:
+            values = self.point_attributes[name].values
+        else:
+            values = [float(i) for i in range(self.point_count * 3)]
+        return struct.pack('<%sf' % len(values), *values)
+
+
+class StubCurveGeometry(object):
+    """A stub for hou.Geometry which is enough to export curves
+
+    :param point_counts: The number of points of every curve
+    :param attributes: A dictionary of (class, name) keys and list of float
+      values
+    """
+
+    def __init__(self, point_counts, attributes,
+                 with_topology_attributes=False):
+        self.point_counts = point_counts
+        self.attributes = attributes
+        self.with_topology_attributes = with_topology_attributes
+
+    def intrinsicValue(self, name):
+        return {
+            'primitivecount': len(self.point_counts),
+            'pointcount': sum(self.point_counts),
+        }[name]
+
+    def _find_attrib(self, attribute_class, name):
+        if (attribute_class, name) in self.attributes:
+            return StubAttrib(name, 3 if name == 'uv' else 1)
+
+    def findPointAttrib(self, name):
+        return self._find_attrib('point', name)
+
+    def findVertexAttrib(self, name):
+        return self._find_attrib('vertex', name)
+
+    def findPrimAttrib(self, name):
+        if self.with_topology_attributes and name == 'nsides':
+            return StubAttrib(name)
+        return self._find_attrib('prim', name)
+
+    def findGlobalAttrib(self, name):
+        return self._find_attrib('global', name)
+
+    def iterPrims(self):
+        for point_count in self.point_counts:
+            yield StubPrim(range(point_count))
+
+    def attribValue(self, name):
+        return self.attributes[('global', name)][0]
+
+    def primIntAttribValuesAsString(self, name):
+        return struct.pack('%si' % len(self.point_counts), *self.point_counts)
+
+    def _pack(self, attribute_class, name):
+        values = self.attributes[(attribute_class, name)]
+        return struct.pack('%sf' % len(values), *values)
+
+    def pointFloatAttribValuesAsString(self, name):
+        return self._pack('point', name)
+
+    def vertexFloatAttribValuesAsString(self, name):
+        return self._pack('vertex', name)
+
+    def primFloatAttribValuesAsString(self, name):
+        return self._pack('prim', name)
+
+
+class StubNode(object):
+    """A stub for hou.Node
+    """
+
+    def __init__(self, geo):
+        self.geo = geo
+
+    def geometry(self):
+        return self.geo
+
+    def path(self):
+        return '/obj/test'
+
+
+class StubHou(object):
+    """A stub for the hou module which is enough to change frames
+    """
+
+    OperationFailed = Exception
+
+    def __init__(self):
+        self.current_frame = 1
+
+    def frame(self):
+        return self.current_frame
+
+    def setFrame(self, frame):
+        self.current_frame = frame
+
+
+class StubAnimatedNode(object):
+    """A stub for hou.Node which returns a different geometry per frame
+    """
+
+    def __init__(self, stub_hou, geometries):
+        self.stub_hou = stub_hou
+        self.geometries = geometries
+
+    def geometry(self):
+        return self.geometries[self.stub_hou.frame()]
+
+
+class H2ATestCase(unittest.TestCase):
+    """tests the h2a module
+    """
+
+    def setUp(self):
+        """setup the test
+        """
+        # a grid of 2x2 quads and 4 triangles
+        self.prims = [
+            [0, 1, 4, 3], [1, 2, 5, 4], [3, 4, 7, 6], [4, 5, 8, 7],
+            [0, 1, 2], [2, 5, 8], [8, 7, 6], [6, 3, 0],
+        ]
+
+    def test_get_polygon_topology_is_iterating_the_primitives(self):
+        """testing if get_polygon_topology is returning the topology by
+        iterating the primitives when there are no topology attributes
+        """
+        geo = StubGeometry(self.prims, 9)
+        nsides, vidxs = h2a.get_polygon_topology(geo)
+        self.assertEqual([4, 4, 4, 4, 3, 3, 3, 3], list(nsides))
+        self.assertEqual(
+            [i for prim in self.prims for i in prim],
+            list(vidxs)
+        )
+
+    def test_get_polygon_topology_is_using_the_topology_attributes(self):
+        """testing if get_polygon_topology is returning the same topology by
+        using the topology attributes
+        """
+        nsides, vidxs = h2a.get_polygon_topology(
+            StubGeometry(self.prims, 9, with_topology_attributes=False)
+        )
+        bulk_nsides, bulk_vidxs = h2a.get_polygon_topology(
+            StubGeometry(self.prims, 9, with_topology_attributes=True)
+        )
+        self.assertEqual(nsides, bulk_nsides)
+        self.assertEqual(vidxs, bulk_vidxs)
+
+    def test_buffer_is_growing(self):
+        """testing if the Buffer is growing when the written data does not fit
+        in to it
+        """
+        output_buffer = h2a.Buffer(4)
+        for i in range(100):
+            output_buffer.write('%03i' % i)
+        expected = ''.join('%03i' % i for i in range(100))
+        self.assertEqual(300, len(output_buffer))
+        self.assertEqual(expected, output_buffer.getvalue())
+        self.assertEqual(expected, output_buffer.getbuffer().tobytes())
+
+    def test_buffer_is_writing_through_to_the_file_handler(self):
+        """testing if the Buffer is writing the data to the file handler
+        """
+        file_handler = StringIO()
+        output_buffer = h2a.Buffer(file_handler=file_handler)
+        output_buffer.write('polymesh\n')
+        output_buffer.write('{\n')
+        self.assertEqual(11, len(output_buffer))
+        self.assertEqual('polymesh\n{\n', file_handler.getvalue())
+        self.assertEqual(0, len(output_buffer.data))
+
+    def test_render_is_rendering_templates(self):
+        """testing if render is rendering the same data as the % operator
+        """
+        values = array.array('i', range(200))
+        template = h2a.Template(
+            'a %(ascii)s b %(encoded)s c %(nested)s', {
+                'ascii': h2a.UIntData(values),
+                'encoded': h2a.UIntData(values, encoded=True),
+                'nested': h2a.Template('%(data)s', {
+                    'data': h2a.Base85Data(values.tostring(), line_length=7)
+                }),
+            }
+        )
+        expected = 'a %s b %s c %s' % (
+            ' '.join(map(str, values)),
+            'B%s' % base85.arnold_b85_encode(
+                array.array('B', values).tostring()
+            ),
+            h2a.split_data(base85.arnold_b85_encode(values.tostring()), 7),
+        )
+        self.assertEqual(expected, h2a.render(template))
+        self.assertEqual(expected, str(template))
+        self.assertLessEqual(len(expected), template.estimated_length)
+
+    def test_uint_data_is_writing_ascii_data(self):
+        """testing if UIntData is writing the values as ASCII
+        """
+        data = h2a.UIntData(array.array('i', range(7)), line_length=3)
+        self.assertEqual('UINT', data.data_type)
+        self.assertEqual('0 1 2\n3 4 5\n6', str(data))
+
+        file_handler = StringIO()
+        data.write(file_handler)
+        self.assertEqual('0 1 2\n3 4 5\n6', file_handler.getvalue())
+
+    def test_uint_data_is_writing_small_values_as_bytes(self):
+        """testing if UIntData is encoding values smaller than 256 as bytes
+        """
+        values = [0, 1, 9, 8, 1, 2, 10, 9, 2, 3, 11, 10, 3, 4, 12, 11, 4, 5,
+                  13, 12, 5, 6, 14, 13, 6, 7, 15, 14]
+        data = h2a.UIntData(array.array('i', values), encoded=True)
+        self.assertEqual('b85UINT', data.data_type)
+        self.assertEqual("B&UOP6&psb:'7Bt>'Rg1B'n6CF(4ZUJ(P)gN", str(data))
+
+    def test_uint_data_is_writing_big_values_as_32_bit_integers(self):
+        """testing if UIntData is encoding values bigger than 255 as 32-bit
+        integers
+        """
+        values = [0, 1, 256, 70000]
+        data = h2a.UIntData(array.array('i', values), encoded=True)
+        self.assertEqual(
+            base85.arnold_b85_encode(struct.pack('<4I', *values)),
+            str(data)
+        )
+
+    def test_polygon2ass_is_producing_the_same_data_for_both_paths(self):
+        """testing if polygon2ass is producing the same data with and without
+        the topology attributes and with and without a file handler
+        """
+        for encode_topology in [False, True]:
+            data = h2a.polygon2ass(
+                StubNode(StubGeometry(self.prims, 9)),
+                'test', encode_topology=encode_topology
+            )
+            bulk_data = h2a.polygon2ass(
+                StubNode(
+                    StubGeometry(self.prims, 9, with_topology_attributes=True)
+                ),
+                'test', encode_topology=encode_topology
+            )
+            self.assertEqual(data, bulk_data)
+
+            file_handler = StringIO()
+            h2a.polygon2ass(
+                StubNode(StubGeometry(self.prims, 9)),
+                'test', encode_topology=encode_topology,
+                file_handler=file_handler
+            )
+            self.assertEqual(data, file_handler.getvalue())
+
+            if encode_topology:
+                self.assertIn(' nsides 8 1 b85UINT\nB', data)
+            else:
+                self.assertIn(' nsides 8 1 UINT\n4 4 4 4 3 3 3 3\n', data)
+
+    def test_index_data_is_removing_duplicates(self):
+        """testing if index_data is returning the unique items and the index
+        of every item in the unique items
+        """
+        items = [(0.0, 0.0), (0.5, 0.0), (0.0, 0.0), (1.0, 1.0), (0.5, 0.0)]
+        data = ''.join(struct.pack('2f', *item) for item in items)
+
+        for numpy_module in set([h2a.numpy, None]):
+            original_numpy = h2a.numpy
+            h2a.numpy = numpy_module
+            try:
+                unique_data, indices = h2a.index_data(data, 8)
+            finally:
+                h2a.numpy = original_numpy
+
+            unique_items = [
+                struct.unpack('2f', unique_data[i:i + 8])
+                for i in range(0, len(unique_data), 8)
+            ]
+            self.assertEqual(3, len(unique_items))
+            self.assertEqual(items, [unique_items[i] for i in indices])
+
+    def test_get_float_attribute_values_is_dropping_extra_components(self):
+        """testing if get_float_attribute_values is returning only the
+        requested number of components
+        """
+        uvs = StubAttrib('uv', 3, [0.0, 0.1, 0.0, 1.0, 0.9, 0.0])
+        geo = StubGeometry(
+            self.prims, 9, vertex_attributes={'uv': uvs}
+        )
+        for numpy_module in set([h2a.numpy, None]):
+            original_numpy = h2a.numpy
+            h2a.numpy = numpy_module
+            try:
+                data, is_point_attribute = \
+                    h2a.get_float_attribute_values(geo, 'uv', 2)
+            finally:
+                h2a.numpy = original_numpy
+            self.assertFalse(is_point_attribute)
+            self.assertEqual(struct.pack('4f', 0.0, 0.1, 1.0, 0.9), data)
+
+        self.assertEqual(
+            (None, False),
+            h2a.get_float_attribute_values(geo, 'N', 3)
+        )
+
+    def test_polygon2ass_is_exporting_vertex_uvs(self):
+        """testing if polygon2ass is exporting the vertex uvs as an indexed
+        uvlist
+        """
+        # every primitive uses the same uvs
+        uv_values = []
+        for prim in self.prims:
+            for i in range(len(prim)):
+                uv_values.extend([i * 0.25, 1.0 - i * 0.25, 0.0])
+        uvs = StubAttrib('uv', 3, uv_values)
+
+        data = h2a.polygon2ass(
+            StubNode(
+                StubGeometry(self.prims, 9, vertex_attributes={'uv': uvs})
+            ),
+            'test'
+        )
+        self.assertIn(' uvlist 4 1 b85POINT2\n', data)
+        self.assertIn(' uvidxs 28 1 UINT\n', data)
+        self.assertNotIn(' nlist', data)
+
+    def test_polygon2ass_is_exporting_point_normals(self):
+        """testing if polygon2ass is exporting the point normals with the
+        vertex ids as the normal indices
+        """
+        normals = StubAttrib('N', 3, [0.0, 1.0, 0.0] * 9)
+        data = h2a.polygon2ass(
+            StubNode(
+                StubGeometry(self.prims, 9, point_attributes={'N': normals})
+            ),
+            'test'
+        )
+        self.assertIn(' nlist 9 1 b85VECTOR\n', data)
+        vertex_ids = ' '.join(str(i) for prim in self.prims for i in prim)
+        self.assertIn(' nidxs 28 1 UINT\n%s' % vertex_ids, data)
+        self.assertNotIn(' uvlist', data)
+
+
+class GeometrySequenceTestCase(unittest.TestCase):
+    """tests the h2a.geometry2ass_sequence() function
+    """
+
+    def setUp(self):
+        """setup the test
+        """
+        self.original_hou = h2a.hou
+        h2a.hou = StubHou()
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'test.%04d.ass.gz')
+
+        quads = [[0, 1, 4, 3], [1, 2, 5, 4], [3, 4, 7, 6], [4, 5, 8, 7]]
+        self.geometries = {
+            1: StubGeometry(quads, 9),
+            2: StubGeometry(quads, 9),
+            3: StubGeometry(quads[:2], 6),
+        }
+        self.node = StubAnimatedNode(h2a.hou, self.geometries)
+
+    def tearDown(self):
+        """clean up the test
+        """
+        h2a.hou = self.original_hou
+        shutil.rmtree(self.temp_dir)
+
+    def export(self, **kwargs):
+        """exports the test sequence
+        """
+        options = {
+            'worker_count': 1,
+            'node': self.node,
+        }
+        options.update(kwargs)
+        return h2a.geometry2ass_sequence(
+            self.path, [1, 2, 3], 'test', 0.5, 'ribbon', 1, False, False, 0,
+            **options
+        )
+
+    def test_template_hash_is_changing_with_the_data_and_options(self):
+        """testing if Template.update_hash is giving the same hash for the
+        same data and options only
+        """
+        def get_hash(template):
+            hash_object = hashlib.md5()
+            template.update_hash(hash_object)
+            return hash_object.hexdigest()
+
+        def get_template(geo, **kwargs):
+            return h2a.polygon2ass(
+                StubNode(geo), 'test', return_template=True, **kwargs
+            )
+
+        self.assertEqual(
+            get_hash(get_template(self.geometries[1])),
+            get_hash(get_template(self.geometries[2]))
+        )
+        self.assertNotEqual(
+            get_hash(get_template(self.geometries[1])),
+            get_hash(get_template(self.geometries[3]))
+        )
+        self.assertNotEqual(
+            get_hash(get_template(self.geometries[1])),
+            get_hash(get_template(self.geometries[1], special_values=True))
+        )
+
+    def test_geometry2ass_sequence_is_writing_all_frames(self):
+        """testing if geometry2ass_sequence is writing the ass and asstoc
+        files of all the frames and the manifest
+        """
+        manifest = self.export()
+        self.assertEqual(3, manifest['exported_frame_count'])
+        self.assertEqual(0, manifest['skipped_frame_count'])
+
+        for frame in [1, 2, 3]:
+            ass_file = gzip.open(self.path % frame)
+            try:
+                data = ass_file.read()
+            finally:
+                ass_file.close()
+            self.assertEqual(
+                h2a.polygon2ass(StubNode(self.geometries[frame]), 'test'),
+                data
+            )
+
+        asstoc_path = os.path.join(self.temp_dir, 'test.0003.asstoc')
+        with open(asstoc_path) as asstoc_file:
+            self.assertEqual(
+                'bounds -1.0 -1.0 -1.0 6.0 1.0 1.0', asstoc_file.read()
+            )
+
+        manifest_path = os.path.join(self.temp_dir, 'test.manifest.json')
+        with open(manifest_path) as manifest_file:
+            self.assertEqual(
+                [-1.0, -1.0, -1.0, 6.0, 1.0, 1.0],
+                json.load(manifest_file)['frames']['3']['bounds']
+            )
+
+        # the current frame is restored
+        self.assertEqual(1, h2a.hou.frame())
+
+    def test_geometry2ass_sequence_is_skipping_unchanged_frames(self):
+        """testing if geometry2ass_sequence is skipping the frames whose data
+        did not change since the last export
+        """
+        self.export()
+
+        manifest = self.export()
+        self.assertEqual(0, manifest['exported_frame_count'])
+        self.assertEqual(3, manifest['skipped_frame_count'])
+
+        self.geometries[2] = StubGeometry(self.geometries[3].prims, 6)
+        os.remove(self.path % 3)
+        manifest = self.export()
+        self.assertEqual(2, manifest['exported_frame_count'])
+        self.assertFalse(manifest['frames']['1']['exported'])
+        self.assertTrue(manifest['frames']['2']['exported'])
+        self.assertTrue(manifest['frames']['3']['exported'])
+
+        manifest = self.export(force=True)
+        self.assertEqual(3, manifest['exported_frame_count'])
+
+    def test_geometry2ass_sequence_is_using_a_process_pool(self):
+        """testing if geometry2ass_sequence is writing the same files with a
+        process pool
+        """
+        self.export()
+        serial_data = []
+        for frame in [1, 2, 3]:
+            with open(self.path % frame, 'rb') as ass_file:
+                serial_data.append(gzip.GzipFile(fileobj=ass_file).read())
+
+        manifest = self.export(worker_count=2, force=True)
+        self.assertEqual(3, manifest['exported_frame_count'])
+        for frame in [1, 2, 3]:
+            with open(self.path % frame, 'rb') as ass_file:
+                self.assertEqual(
+                    serial_data[frame - 1],
+                    gzip.GzipFile(fileobj=ass_file).read()
+                )
+
+    def test_geometry2ass_sequence_worker_count_is_zero(self):
+        """testing if a ValueError will be raised when the worker_count is 0
+        """
+        with self.assertRaises(ValueError) as cm:
+            self.export(worker_count=0)
+        self.assertEqual(
+            'worker_count should be a positive integer, not 0',
+            str(cm.exception)
+        )
+
+
+class CurvesTestCase(unittest.TestCase):
+    """tests the curve export functions of the h2a module
+    """
+
+    def setUp(self):
+        """setup the test
+        """
+        self.original_numpy = h2a.numpy
+
+    def tearDown(self):
+        """clean up the test
+        """
+        h2a.numpy = self.original_numpy
+
+    def numpy_modules(self):
+        """yields after setting h2a.numpy to every available numpy module
+        """
+        for numpy_module in set([self.original_numpy, None]):
+            h2a.numpy = numpy_module
+            yield numpy_module
+
+    def get_geometry(self, point_counts, **kwargs):
+        """returns a StubCurveGeometry with P, width and uv attributes where
+        every value is the point number
+        """
+        point_count = sum(point_counts)
+        attributes = {
+            ('point', 'P'): [
+                float(i) for i in range(point_count) for _ in range(3)
+            ],
+            ('point', 'pprime'): [
+                float(i) for i in range(point_count) for _ in range(3)
+            ],
+            ('point', 'width'): [float(i) for i in range(point_count)],
+            ('prim', 'uv_u'): [float(i) for i in range(len(point_counts))],
+            ('prim', 'uv_v'): [-float(i) for i in range(len(point_counts))],
+        }
+        return StubCurveGeometry(point_counts, attributes, **kwargs)
+
+    @classmethod
+    def get_expected_points(cls, point_counts):
+        """returns the point numbers with the repeated end points
+        """
+        points = []
+        offset = 0
+        for point_count in point_counts:
+            curve = range(offset, offset + point_count)
+            points.extend([curve[0]] + curve + [curve[-1]])
+            offset += point_count
+        return points
+
+    def test_get_curve_point_counts(self):
+        """testing if get_curve_point_counts is returning an int for curves
+        with the same number of points and an array for the others
+        """
+        self.assertEqual(
+            4, h2a.get_curve_point_counts(self.get_geometry([4, 4, 4]))
+        )
+        self.assertEqual(
+            [4, 2, 5],
+            list(h2a.get_curve_point_counts(self.get_geometry([4, 2, 5])))
+        )
+        # the total point count is a multiple of the curve count
+        self.assertEqual(
+            [3, 5],
+            list(h2a.get_curve_point_counts(self.get_geometry([3, 5])))
+        )
+        # with the nsides attribute the counts are not iterated
+        self.assertEqual(
+            [4, 2, 6],
+            list(h2a.get_curve_point_counts(
+                self.get_geometry([4, 2, 6], with_topology_attributes=True)
+            ))
+        )
+        self.assertEqual(
+            4,
+            h2a.get_curve_point_counts(
+                self.get_geometry([4, 4], with_topology_attributes=True)
+            )
+        )
+
+    def test_get_curve_point_counts_is_not_creating_vertices(self):
+        """testing if get_curve_point_counts is not getting the vertices of
+        the primitives when there is no nsides attribute
+        """
+        vertices_calls = []
+        original_vertices = StubPrim.vertices
+
+        def vertices(prim):
+            vertices_calls.append(prim)
+            return original_vertices(prim)
+
+        StubPrim.vertices = vertices
+        try:
+            self.assertEqual(
+                [3, 5],
+                list(h2a.get_curve_point_counts(self.get_geometry([3, 5])))
+            )
+            self.assertEqual(
+                4, h2a.get_curve_point_counts(self.get_geometry([4, 4]))
+            )
+        finally:
+            StubPrim.vertices = original_vertices
+        self.assertEqual([], vertices_calls)
+
+    def test_duplicate_end_points(self):
+        """testing if duplicate_end_points is repeating the first and the last
+        point of every curve
+        """
+        for point_counts in [[4, 4, 4], [4, 2, 5, 2], [3, 5]]:
+            geo = self.get_geometry(point_counts)
+            data = geo.pointFloatAttribValuesAsString('P')
+            counts = h2a.get_curve_point_counts(geo)
+            expected = [
+                float(i)
+                for i in self.get_expected_points(point_counts)
+                for _ in range(3)
+            ]
+            for _ in self.numpy_modules():
+                result = h2a.duplicate_end_points(
+                    data, counts, len(point_counts)
+                )
+                self.assertEqual(
+                    expected, list(array.array('f', result))
+                )
+
+    def test_get_curve_radius_is_using_all_attribute_classes(self):
+        """testing if get_curve_radius is reading the width from the point,
+        vertex, primitive or detail attributes
+        """
+        point_counts = [3, 2]
+        for numpy_module in self.numpy_modules():
+            for attribute_class, values, expected in [
+                    ('point', [1.0, 2.0, 3.0, 4.0, 5.0],
+                     [1.0, 2.0, 3.0, 4.0, 5.0]),
+                    ('vertex', [5.0, 4.0, 3.0, 2.0, 1.0],
+                     [5.0, 4.0, 3.0, 2.0, 1.0]),
+                    ('prim', [0.5, 0.25], [0.5, 0.5, 0.5, 0.25, 0.25]),
+                    ('global', [0.5], [0.5] * 5)]:
+                geo = StubCurveGeometry(
+                    point_counts, {(attribute_class, 'width'): values}
+                )
+                counts = h2a.get_curve_point_counts(geo)
+                radius = h2a.get_curve_radius(geo, counts, 2)
+                self.assertEqual(expected, list(array.array('f', radius)))
+
+        with self.assertRaises(ValueError) as cm:
+            h2a.get_curve_radius(StubCurveGeometry(point_counts, {}), 2, 2)
+        self.assertEqual(
+            'the curves have no "width" attribute', str(cm.exception)
+        )
+
+    def test_get_curve_param_coords_is_using_the_root_uvs(self):
+        """testing if get_curve_param_coords is using the uv of the first
+        point of every curve when there are no uv_u and uv_v attributes
+        """
+        point_counts = [3, 2]
+        uvs = [0.0, 0.5, 0.0, 0.1, 0.1, 0.0, 0.2, 0.2, 0.0,
+               0.25, 0.75, 0.0, 0.3, 0.3, 0.0]
+        geo = StubCurveGeometry(
+            point_counts, {('point', 'uv'): uvs}
+        )
+        offsets = h2a.get_curve_offsets([3, 2], 2)
+        self.assertEqual([0, 3, 5], list(offsets))
+        for _ in self.numpy_modules():
+            u, v = h2a.get_curve_param_coords(geo, offsets)
+            self.assertEqual([0.0, 0.25], list(array.array('f', u)))
+            self.assertEqual([0.5, 0.75], list(array.array('f', v)))
+
+    def test_curves2ass_is_exporting_curves_with_different_point_counts(self):
+        """testing if curves2ass is exporting curves with different point
+        counts
+        """
+        point_counts = [4, 2, 5]
+        expected_points = array.array('f', [
+            float(i)
+            for i in self.get_expected_points(point_counts)
+            for _ in range(3)
+        ])
+        for _ in self.numpy_modules():
+            data = h2a.curves2ass(
+                StubNode(self.get_geometry(point_counts)), 'test',
+                export_motion=True
+            )
+            self.assertIn(' num_points 3 2 UINT\n  6 4 7 6 4 7\n', data)
+            self.assertIn(
+                ' points 17 2 b85POINT\n %s\n' % h2a.split_data(
+                    base85.arnold_b85_encode(expected_points.tostring() * 2),
+                    500
+                ),
+                data
+            )
+            self.assertIn(' radius 11 1 b85FLOAT\n', data)
+            self.assertIn(' curve_id 3 2 UINT\n  0 1 2\n', data)
+
+    def test_curves2ass_is_exporting_ragged_curves_without_nsides(self):
+        """testing if curves2ass is exporting curves with different point
+        counts when the total point count is a multiple of the curve count
+        and there is no nsides attribute
+        """
+        point_counts = [3, 5]
+        expected_points = array.array('f', [
+            float(i)
+            for i in self.get_expected_points(point_counts)
+            for _ in range(3)
+        ])
+        for _ in self.numpy_modules():
+            data = h2a.curves2ass(
+                StubNode(self.get_geometry(point_counts)), 'test'
+            )
+            self.assertIn(' num_points 2 1 UINT\n  5 7\n', data)
+            self.assertIn(
+                ' points 12 1 b85POINT\n %s\n' % h2a.split_data(
+                    base85.arnold_b85_encode(expected_points.tostring()),
+                    500
+                ),
+                data
+            )
+            self.assertIn(' radius 8 1 b85FLOAT\n', data)
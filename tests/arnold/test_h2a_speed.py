@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+"""Tests the speed and the peak memory usage of h2a.polygon2ass on a
+synthetic grid mesh.
+
+Usage::
+
+  python test_h2a_speed.py [point_count]
+
+Every method runs in a separate process, the peak memory is the increase of
+the maximum resident set size of that process while exporting.
+"""
+import os
+import sys
+import time
+import array
+import struct
+import resource
+import tempfile
+import multiprocessing
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from anima.render.arnold import base85, h2a
+
+
+class OperationFailed(Exception):
+    pass
+
+
+class StubHou(object):
+    OperationFailed = OperationFailed
+
+
+class GridGeometry(object):
+    """A grid mesh with the hou.Geometry methods that are used by
+    h2a.polygon2ass
+    """
+
+    def __init__(self, point_count):
+        self.size = int(point_count ** 0.5)
+        self.point_count = self.size * self.size
+        self.prim_count = (self.size - 1) * (self.size - 1)
+
+    def findPrimAttrib(self, name):
+        return name == 'nsides'
+
+    def findVertexAttrib(self, name):
+        return name == 'vidxs'
+
+    def findPointAttrib(self, name):
+        return None
+
+    def intrinsicValueDict(self):
+        return {
+            'primitivecount': self.prim_count,
+            'pointcount': self.point_count,
+            'vertexcount': 4 * self.prim_count,
+        }
+
+    def primIntAttribValuesAsString(self, name):
+        return struct.pack('i', 4) * self.prim_count
+
+    def vertexIntAttribValuesAsString(self, name):
+        size = self.size
+        if numpy is not None:
+            rows = numpy.arange(size - 1, dtype=numpy.int32)
+            corners = (rows[:, None] * size + rows[None, :]).ravel()
+            return numpy.column_stack([
+                corners, corners + 1, corners + size + 1, corners + size
+            ]).tobytes()
+
+        vidxs = array.array('i')
+        for y in xrange(size - 1):
+            for x in xrange(size - 1):
+                i = y * size + x
+                vidxs.extend((i, i + 1, i + size + 1, i + size))
+        return vidxs.tostring()
+
+    def pointFloatAttribValuesAsString(self, name):
+        if name != 'P':
+            raise OperationFailed()
+        size = self.size
+        if numpy is not None:
+            y, x = numpy.mgrid[0:size, 0:size].astype(numpy.float32)
+            return numpy.column_stack(
+                [x.ravel(), numpy.zeros(size * size, numpy.float32),
+                 y.ravel()]
+            ).tobytes()
+
+        positions = array.array('f')
+        for y in xrange(size):
+            for x in xrange(size):
+                positions.extend((x, 0.0, y))
+        return positions.tostring()
+
+
+class GridNode(object):
+    def __init__(self, geo):
+        self.geo = geo
+
+    def geometry(self):
+        return self.geo
+
+
+def legacy_render(data):
+    """renders the data by building the whole strings with the % operator,
+    as h2a did before the Buffer was used
+    """
+    if isinstance(data, h2a.Template):
+        return data.template % dict(
+            (key, legacy_render(value))
+            for key, value in data.template_vars.items()
+        )
+    elif isinstance(data, h2a.Base85Data):
+        return h2a.split_data(
+            base85.arnold_b85_encode(''.join(data.parts)), data.line_length
+        )
+    elif isinstance(data, h2a.UIntData):
+        if data.encoded:
+            return legacy_render(data._get_encoded_data())
+        values = data.values
+        line_length = data.line_length
+        return '\n'.join(
+            ' '.join(map(str, values[i:i + line_length]))
+            for i in xrange(0, len(values), line_length)
+        )
+    return data
+
+
+def export(method, point_count, queue):
+    """exports the grid with the given method and puts the duration and the
+    peak memory increase in MB to the queue
+    """
+    h2a.hou = StubHou()
+    node = GridNode(GridGeometry(point_count))
+    # read the geometry once, so it is not counted as the export memory
+    node.geo.pointFloatAttribValuesAsString('P')
+    node.geo.vertexIntAttribValuesAsString('vidxs')
+    start_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.time()
+    if method == 'legacy':
+        data = legacy_render(
+            h2a.polygon2ass(node, 'grid', return_template=True)
+        )
+    elif method == 'string':
+        data = h2a.polygon2ass(node, 'grid')
+    else:
+        ass_path = tempfile.mktemp(suffix='.ass')
+        with open(ass_path, 'w') as ass_file:
+            h2a.polygon2ass(node, 'grid', file_handler=ass_file)
+        os.remove(ass_path)
+    end = time.time()
+
+    end_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((end - start, (end_memory - start_memory) / 1024.0))
+
+
+if __name__ == '__main__':
+    point_count = 10000000
+    if len(sys.argv) > 1:
+        point_count = int(sys.argv[1])
+
+    print('Number of Points        : %s' % point_count)
+    print('Backend                 : %s' % base85.default_backend)
+
+    for method in ['legacy', 'string', 'file']:
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=export, args=(method, point_count, queue)
+        )
+        process.start()
+        duration, peak_memory = queue.get()
+        process.join()
+        print('%-7s                 : %.3f seconds, %.1f MB peak' % (
+            method, duration, peak_memory))
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+
+import os
+import gzip
+import random
+import shutil
+import tempfile
+import unittest
+
+from anima.render.arnold import pgzip
+
+
+class ParallelGzipFileTestCase(unittest.TestCase):
+    """tests the pgzip.ParallelGzipFile class
+    """
+
+    def setUp(self):
+        """setup the test
+        """
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'test.ass.gz')
+        random.seed(0)
+        self.data = ''.join(
+            random.choice('abcdefgh\n') for _ in range(100000)
+        )
+
+    def tearDown(self):
+        """clean up the test
+        """
+        shutil.rmtree(self.temp_dir)
+
+    def read(self):
+        """returns the uncompressed content of the test file
+        """
+        gzip_file = gzip.open(self.path)
+        try:
+            return gzip_file.read()
+        finally:
+            gzip_file.close()
+
+    def test_written_data_is_readable_by_gzip(self):
+        """testing if the data written with different block sizes and worker
+        counts is readable by the gzip module
+        """
+        for block_size in [1000, 4096, 100000, pgzip.DEFAULT_BLOCK_SIZE]:
+            for worker_count in [1, 3]:
+                with pgzip.ParallelGzipFile(
+                        self.path, block_size=block_size,
+                        worker_count=worker_count) as gzip_file:
+                    # write in pieces that do not match the block size
+                    for i in range(0, len(self.data), 777):
+                        gzip_file.write(self.data[i:i + 777])
+                self.assertEqual(self.data, self.read())
+
+    def test_blocks_are_written_as_separate_members(self):
+        """testing if every block is written as a separate gzip member
+        """
+        with pgzip.ParallelGzipFile(
+                self.path, block_size=10000, worker_count=2) as gzip_file:
+            gzip_file.write(self.data)
+
+        with open(self.path, 'rb') as raw_file:
+            raw_data = raw_file.read()
+        self.assertEqual(10, raw_data.count('\x1f\x8b\x08\x00'))
+
+    def test_empty_file_is_a_valid_gzip_file(self):
+        """testing if a file without data is still a valid gzip file
+        """
+        pgzip.ParallelGzipFile(self.path).close()
+        self.assertEqual('', self.read())
+
+    def test_compress_level_is_used(self):
+        """testing if the compress_level is used
+        """
+        sizes = []
+        for compress_level in [0, 9]:
+            with pgzip.ParallelGzipFile(
+                    self.path, compress_level=compress_level) as gzip_file:
+                gzip_file.write(self.data)
+            self.assertEqual(self.data, self.read())
+            sizes.append(os.path.getsize(self.path))
+        self.assertGreater(sizes[0], len(self.data))
+        self.assertLess(sizes[1], len(self.data) // 2)
+
+    def test_compress_level_is_out_of_range(self):
+        """testing if a ValueError will be raised when the compress_level is
+        not between 0 and 9
+        """
+        with self.assertRaises(ValueError) as cm:
+            pgzip.ParallelGzipFile(self.path, compress_level=10)
+        self.assertEqual(
+            'compress_level should be between 0 and 9, not 10',
+            str(cm.exception)
+        )
+
+    def test_worker_count_is_zero(self):
+        """testing if a ValueError will be raised when the worker_count is 0
+        """
+        with self.assertRaises(ValueError) as cm:
+            pgzip.ParallelGzipFile(self.path, worker_count=0)
+        self.assertEqual(
+            'worker_count should be a positive integer, not 0',
+            str(cm.exception)
+        )
+
+    def test_writing_to_a_closed_file(self):
+        """testing if a ValueError will be raised when writing to a closed
+        file
+        """
+        gzip_file = pgzip.ParallelGzipFile(self.path)
+        gzip_file.close()
+        with self.assertRaises(ValueError) as cm:
+            gzip_file.write('data')
+        self.assertEqual('I/O operation on closed file', str(cm.exception))
@@ -5,6 +5,7 @@
 # License: http://www.opensource.org/licenses/BSD-2-Clause
 """Tests the speed of the base85 encode operation
 """
+import os
 import time
 import re
 
@@ -50,6 +51,76 @@ if __name__ == '__main__':
 
     assert normal_encoded_data == thread_encoded_data
 
+    print('******** SCALING *******')
+    import multiprocessing
+    for worker_count in range(1, multiprocessing.cpu_count() + 1):
+        with base85.Pool(worker_count=worker_count) as pool:
+            # start the workers before measuring
+            pool.encode(data[:4 * 2 * pool.min_chunk_size])
+            start = time.time()
+            pool_encoded_data = pool.encode(data)
+            end = time.time()
+        encode_duration = end - start
+        print('%3i worker(s)            : %.3f seconds' % (
+            worker_count, encode_duration))
+        assert pool_encoded_data == normal_encoded_data
+        del pool_encoded_data
+
+    print('******* BACKENDS *******')
+    data_size_in_mb = len(data) / 1024.0 / 1024.0
+    for backend in base85.available_backends():
+        start = time.time()
+        backend_encoded_data = base85.arnold_b85_encode(data, backend=backend)
+        end = time.time()
+        encode_duration = end - start
+        print('%-7s encode          : %.3f seconds, %.3f MB/s' % (
+            backend, encode_duration, data_size_in_mb / encode_duration))
+        assert backend_encoded_data == normal_encoded_data
+
+        start = time.time()
+        backend_decoded_data = \
+            base85.arnold_b85_decode(backend_encoded_data, backend=backend)
+        end = time.time()
+        decode_duration = end - start
+        print('%-7s decode          : %.3f seconds, %.3f MB/s' % (
+            backend, decode_duration, data_size_in_mb / decode_duration))
+        assert backend_decoded_data == data
+        del backend_encoded_data
+        del backend_decoded_data
+
+    print('********* GZIP *********')
+    import gzip
+    import tempfile
+    from anima.render.arnold import pgzip
+    gzip_path = tempfile.mktemp(suffix='.ass.gz')
+    data_size_in_mb = len(normal_encoded_data) / 1024.0 / 1024.0
+    for compress_level in [1, 6, 9]:
+        start = time.time()
+        gzip_file = gzip.open(gzip_path, 'wb', compress_level)
+        gzip_file.write(normal_encoded_data)
+        gzip_file.close()
+        end = time.time()
+        gzip_duration = end - start
+        gzip_size = os.path.getsize(gzip_path)
+        print('gzip.open    level %i    : %.3f seconds, %.3f MB/s, %i bytes' % (
+            compress_level, gzip_duration, data_size_in_mb / gzip_duration,
+            gzip_size))
+
+        for worker_count in range(1, multiprocessing.cpu_count() + 1):
+            start = time.time()
+            with pgzip.ParallelGzipFile(
+                    gzip_path, compress_level=compress_level,
+                    worker_count=worker_count) as gzip_file:
+                gzip_file.write(normal_encoded_data)
+            end = time.time()
+            gzip_duration = end - start
+            print('pgzip %2i thr level %i    : %.3f seconds, %.3f MB/s, '
+                  '%i bytes' % (
+                      worker_count, compress_level, gzip_duration,
+                      data_size_in_mb / gzip_duration,
+                      os.path.getsize(gzip_path)))
+    os.remove(gzip_path)
+
     print('************************')
     print('Test Regex vs List Append')
     print('Splitting with RegEx')
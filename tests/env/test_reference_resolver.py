@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+import unittest
+
+from stalker import (db, Repository, FilenameTemplate, Structure,
+                     StatusList, Project, Task, Version)
+from stalker.db.session import DBSession
+
+from anima.env import empty_reference_resolution
+from anima.env.base import ReferenceResolver, VersionLookupCache
+
+
+def check_referenced_versions(version):
+    """the previous implementation of Maya.check_referenced_versions() to
+    compare with
+    """
+    reference_resolution = empty_reference_resolution()
+    dfs_version_references = list(version.walk_inputs())
+    dfs_version_references.pop(0)
+
+    for v in reversed(dfs_version_references):
+        to_be_updated_list = []
+        for ref_v in v.inputs:
+            if not ref_v.is_latest_published_version():
+                to_be_updated_list.append(ref_v)
+
+        if to_be_updated_list:
+            action = 'create'
+            latest_published_version = v.latest_published_version
+            if latest_published_version and \
+               not v.is_latest_published_version():
+                if all([ref_v.latest_published_version
+                        in latest_published_version.inputs
+                        for ref_v in to_be_updated_list]):
+                    action = 'update'
+                else:
+                    action = 'create'
+        else:
+            if v.is_latest_published_version():
+                action = 'leave'
+            else:
+                action = 'update'
+
+            if any(rev_v in reference_resolution['update'] or
+                   rev_v in reference_resolution['create']
+                   for rev_v in v.inputs):
+                action = 'create'
+
+        reference_resolution[action].append(v)
+
+    return reference_resolution
+
+
+class ReferenceResolverTestCase(unittest.TestCase):
+    """tests the anima.env.base.ReferenceResolver class
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        db.setup({'sqlalchemy.url': 'sqlite:///:memory:'})
+        db.init()
+
+        repo = Repository(
+            name='Test Repo',
+            linux_path='/mnt/T/',
+            windows_path='T:/',
+            osx_path='/Volumes/T/'
+        )
+
+        task_template = FilenameTemplate(
+            name='Task Template',
+            target_entity_type='Task',
+            path='$REPO{{project.repository.id}}/{{project.code}}/'
+                 '{%- for parent_task in parent_tasks -%}'
+                 '{{parent_task.nice_name}}/{%- endfor -%}',
+            filename='{{task.nice_name}}_{{version.take_name}}'
+                     '_v{{"%03d"|format(version.version_number)}}',
+        )
+
+        self.project = Project(
+            name='Test Project',
+            code='TP',
+            repositories=[repo],
+            status_list=StatusList.query
+            .filter_by(target_entity_type='Project').first(),
+            structure=Structure(
+                name='Project Structure',
+                templates=[task_template]
+            )
+        )
+        DBSession.add(self.project)
+        DBSession.commit()
+
+        self.query_count = 0
+
+        from sqlalchemy import event
+
+        def count_queries(*args):
+            self.query_count += 1
+
+        self.count_queries = count_queries
+        event.listen(DBSession.get_bind(), 'before_execute', count_queries)
+
+    def tearDown(self):
+        """clean up the test
+        """
+        from sqlalchemy import event
+        event.remove(DBSession.get_bind(), 'before_execute',
+                     self.count_queries)
+        DBSession.remove()
+
+    def create_version(self, task, inputs=None, is_published=True):
+        """creates a version for the given task
+        """
+        version = Version(task=task, inputs=inputs or [])
+        version.is_published = is_published
+        DBSession.add(version)
+        DBSession.commit()
+        return version
+
+    def create_task(self, name):
+        """creates a task
+        """
+        task = Task(name=name, project=self.project)
+        DBSession.add(task)
+        DBSession.commit()
+        return task
+
+    def test_resolve_is_working_properly(self):
+        """testing if the resolve method will return the same resolution with
+        the previous implementation
+        """
+        task_a = self.create_task('Scene')
+        task_b = self.create_task('Building')
+        task_c = self.create_task('Car')
+        task_d = self.create_task('Tree')
+        task_e = self.create_task('Rock')
+
+        d1 = self.create_version(task_d)
+        e1 = self.create_version(task_e)
+        b1 = self.create_version(task_b, [d1, e1])
+        c1 = self.create_version(task_c, [d1])
+        d2 = self.create_version(task_d)
+        # a newer published b which is using the new tree
+        b2 = self.create_version(task_b, [d2, e1])
+        # an unpublished version doesn't change anything
+        self.create_version(task_e, is_published=False)
+        root = self.create_version(task_a, [b1, c1, e1],
+                                   is_published=False)
+        root_id = root.id
+        b1_id, b2_id, c1_id, d1_id, e1_id, task_b_id = \
+            b1.id, b2.id, c1.id, d1.id, e1.id, task_b.id
+        DBSession.remove()
+
+        expected = check_referenced_versions(Version.query.get(root_id))
+        expected_ids = dict(
+            (key, [v.id for v in value]) for key, value in expected.items()
+        )
+        self.assertEqual([e1_id, e1_id], expected_ids['leave'])
+        self.assertEqual([d1_id, d1_id, b1_id], expected_ids['update'])
+        self.assertEqual([c1_id], expected_ids['create'])
+        DBSession.remove()
+
+        self.query_count = 0
+        root = Version.query.get(root_id)
+        with VersionLookupCache() as cache:
+            resolver = ReferenceResolver(root)
+            resolution = resolver.resolve()
+        self.assertEqual(
+            expected_ids,
+            dict((key, [v.id for v in value])
+                 for key, value in resolution.items())
+        )
+        # 1 for the root version, 2 per level for the inputs and versions
+        # (the last level has no inputs), 1 for the latest published versions
+        # and 1 for their inputs
+        self.assertEqual(8, self.query_count)
+        self.assertTrue(
+            cache.data['latest_published_version'][(task_b_id, 'Main')]
+            is Version.query.get(b2_id)
+        )
+
+    def test_resolve_with_unchanged_references(self):
+        """testing if the resolve method will leave the latest published
+        versions
+        """
+        task_a = self.create_task('Scene')
+        task_b = self.create_task('Building')
+        b1 = self.create_version(task_b)
+        root = self.create_version(task_a, [b1], is_published=False)
+
+        resolution = ReferenceResolver(root).resolve()
+        self.assertEqual(
+            empty_reference_resolution(leave=[b1]), resolution
+        )
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from stalker import (db, Repository, FilenameTemplate, Structure,
+                     StatusList, Project, Task, Version)
+from stalker.db.session import DBSession
+
+from anima.env.reference_scanner import (read_ma_references,
+                                         read_mb_references, ReferenceScanner)
+
+
+def write_ma(path, references):
+    """writes a Maya ASCII file referencing the given paths
+    """
+    with open(path, 'w') as f:
+        f.write('//Maya ASCII 2017 scene\n//Name: %s\n' %
+                os.path.basename(path))
+        for i, reference in enumerate(references):
+            f.write('file -rdi 1 -ns "ref%(i)i" -rfn "ref%(i)iRN"\n'
+                    '\t\t -typ "mayaAscii" "%(path)s";\n' %
+                    {'i': i, 'path': reference})
+            # a deeper reference which should be skipped
+            f.write('file -rdi 2 -ns "deep" -rfn "deepRN" '
+                    '"/mnt/T/Deep/Deep.ma";\n')
+        for i, reference in enumerate(references):
+            f.write('file -r -ns "ref%(i)i" -dr 1 -rfn "ref%(i)iRN"\n'
+                    '\t\t -typ "mayaAscii" "%(path)s{%(i)i}";\n' %
+                    {'i': i, 'path': reference})
+        f.write('requires maya "2017";\ncurrentUnit -l centimeter;\n'
+                'createNode transform -n "test";\n'
+                'file -r -ns "not_a_ref" "/mnt/T/Not/A_Reference.ma";\n')
+
+
+def write_mb(path, references, is_64_bit=False):
+    """writes a minimal Maya Binary file referencing the given paths
+    """
+    if is_64_bit:
+        header = struct.Struct('>4s4xQ')
+        alignment = 8
+        group_tag = b'FOR8'
+    else:
+        header = struct.Struct('>4sL')
+        alignment = 4
+        group_tag = b'FOR4'
+
+    def chunk(tag, data):
+        return header.pack(tag, len(data)) + data + \
+            b'\0' * (-len(data) % alignment)
+
+    def group(form_type, data):
+        form_type = form_type + b'\0' * (alignment - 4)
+        return header.pack(group_tag, len(form_type) + len(data)) + \
+            form_type + data
+
+    head_data = chunk(b'VERS', b'2017\0')
+    for i, reference in enumerate(references):
+        head_data += chunk(
+            b'FREF',
+            b'%s{%i}\0ref%iRN\0mayaBinary\0' % (reference.encode('utf-8'),
+                                                 i, i)
+        )
+    data = group(b'HEAD', head_data) + group(
+        b'XFRM', chunk(b'CREA', b'test\0') + chunk(b'DBLE', b'x' * 13)
+    )
+    with open(path, 'wb') as f:
+        f.write(group(b'Maya', data))
+
+
+class ReadReferencesTestCase(unittest.TestCase):
+    """tests the read_ma_references and read_mb_references functions
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        self.temp_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """clean up the test
+        """
+        shutil.rmtree(self.temp_path)
+
+    def test_read_ma_references_is_working_properly(self):
+        """testing if read_ma_references will return the paths of the
+        first level references
+        """
+        path = os.path.join(self.temp_path, 'Scene.ma')
+        write_ma(path, ['$REPO1/TP/Building.ma', '/mnt/T/TP/Car.mb'])
+        self.assertEqual(
+            ['$REPO1/TP/Building.ma', '/mnt/T/TP/Car.mb'],
+            read_ma_references(path)
+        )
+
+    def test_read_mb_references_is_working_properly(self):
+        """testing if read_mb_references will return the paths of the
+        references in both 32 and 64 bit files
+        """
+        path = os.path.join(self.temp_path, 'Scene.mb')
+        for is_64_bit in [False, True]:
+            write_mb(path, ['$REPO1/TP/Building.mb', '/mnt/T/TP/Car.ma'],
+                     is_64_bit=is_64_bit)
+            self.assertEqual(
+                ['$REPO1/TP/Building.mb', '/mnt/T/TP/Car.ma'],
+                read_mb_references(path)
+            )
+
+        with open(path, 'wb') as f:
+            f.write(b'not a maya file')
+        self.assertEqual([], read_mb_references(path))
+
+    def test_scan_is_working_properly(self):
+        """testing if the scan method will return the reference graph of the
+        given scenes
+        """
+        path = self.temp_path.replace('\\', '/')
+        write_ma('%s/Scene.ma' % path,
+                 ['%s/Building.mb' % path, '%s/Car.ma' % path])
+        write_mb('%s/Building.mb' % path,
+                 ['%s/Car.ma' % path, '%s/Tree.abc' % path])
+        write_ma('%s/Car.ma' % path, ['%s/Missing.ma' % path])
+
+        scanner = ReferenceScanner(worker_count=2, use_repositories=False)
+        self.assertEqual(
+            {
+                '%s/Scene.ma' % path: ['%s/Building.mb' % path,
+                                       '%s/Car.ma' % path],
+                '%s/Building.mb' % path: ['%s/Car.ma' % path,
+                                          '%s/Tree.abc' % path],
+                '%s/Car.ma' % path: ['%s/Missing.ma' % path],
+                '%s/Tree.abc' % path: [],
+                '%s/Missing.ma' % path: None,
+            },
+            scanner.scan(['%s/Scene.ma' % path])
+        )
+
+
+class ReferenceScannerTestCase(unittest.TestCase):
+    """tests the ReferenceScanner.update_version_inputs() method
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        self.temp_path = tempfile.mkdtemp().replace('\\', '/')
+
+        db.setup({'sqlalchemy.url': 'sqlite:///:memory:'})
+        db.init()
+
+        self.repo = Repository(
+            name='Test Repo',
+            linux_path='%s/' % self.temp_path,
+            windows_path='T:/',
+            osx_path='%s/' % self.temp_path
+        )
+
+        task_template = FilenameTemplate(
+            name='Task Template',
+            target_entity_type='Task',
+            path='$REPO{{project.repository.id}}/{{project.code}}/'
+                 '{%- for parent_task in parent_tasks -%}'
+                 '{{parent_task.nice_name}}/{%- endfor -%}',
+            filename='{{task.nice_name}}_{{version.take_name}}'
+                     '_v{{"%03d"|format(version.version_number)}}',
+        )
+
+        self.project = Project(
+            name='Test Project',
+            code='TP',
+            repositories=[self.repo],
+            status_list=StatusList.query
+            .filter_by(target_entity_type='Project').first(),
+            structure=Structure(
+                name='Project Structure',
+                templates=[task_template]
+            )
+        )
+        DBSession.add(self.project)
+        DBSession.commit()
+
+    def tearDown(self):
+        """clean up the test
+        """
+        DBSession.remove()
+        shutil.rmtree(self.temp_path)
+
+    def create_version(self, task_name, take_name='Main', inputs=None,
+                       parent=None):
+        """creates a version with an empty .ma file
+        """
+        task = Task.query.filter_by(name=task_name).first()
+        if task is None:
+            task = Task(name=task_name, project=self.project)
+        version = Version(task=task, take_name=take_name,
+                          inputs=inputs or [], parent=parent)
+        version.update_paths()
+        version.extension = '.ma'
+        DBSession.add(version)
+        DBSession.commit()
+
+        path = os.path.dirname(version.absolute_full_path)
+        if not os.path.exists(path):
+            os.makedirs(path)
+        write_ma(version.absolute_full_path, [])
+        return version
+
+    def test_update_version_inputs_is_working_properly(self):
+        """testing if the update_version_inputs method will update the inputs
+        of all the versions in the reference graph
+        """
+        tree = self.create_version('Tree')
+        rock = self.create_version('Rock')
+        building = self.create_version('Building', inputs=[rock])
+        building_ass = self.create_version(
+            'Building', take_name='Main@ASS', parent=building
+        )
+        scene = self.create_version('Scene')
+
+        # the representation is replaced with its parent
+        write_ma(scene.absolute_full_path,
+                 [building_ass.full_path, tree.absolute_full_path])
+        write_ma(building_ass.absolute_full_path, [rock.full_path])
+        # the Rock is not referenced anymore and the path is a windows path
+        write_ma(building.absolute_full_path,
+                 ['T:/TP/Tree/Tree_Main_v001.ma'])
+
+        scanner = ReferenceScanner(worker_count=2)
+        updated_versions = scanner.update_version_inputs(
+            [scene.absolute_full_path]
+        )
+        self.assertEqual([scene], updated_versions)
+        self.assertEqual(sorted([building.id, tree.id]),
+                         sorted(v.id for v in scene.inputs))
+        # the inputs of the representation are used for the parent if the
+        # scene of the parent is not scanned
+        self.assertEqual([rock], building.inputs)
+        self.assertEqual([], tree.inputs)
+
+        # the scene of the parent is used when it is scanned
+        updated_versions = ReferenceScanner().update_version_inputs(
+            [scene.absolute_full_path, building.absolute_full_path]
+        )
+        self.assertEqual([building], updated_versions)
+        self.assertEqual([tree], building.inputs)
+
+        # nothing changed
+        self.assertEqual(
+            [],
+            ReferenceScanner().update_version_inputs(
+                [scene.absolute_full_path, building.absolute_full_path]
+            )
+        )
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+import unittest
+
+from stalker import db, Repository
+from stalker.db.session import DBSession
+
+from anima.env.base import EnvironmentBase, RepositoryIndex
+
+
+class RepositoryIndexTestCase(unittest.TestCase):
+    """tests the anima.env.base.RepositoryIndex class
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        db.setup({'sqlalchemy.url': 'sqlite:///:memory:'})
+        db.init()
+
+        self.repo0 = Repository(
+            name='Test Repo 0',
+            linux_path='/mnt/T/with_a_very_long_path/',
+            windows_path='T:/with_a_very_long_path/',
+            osx_path='/Volumes/T/with_a_very_long_path/'
+        )
+        self.repo1 = Repository(
+            name='Test Repo 1',
+            linux_path='/mnt/T/',
+            windows_path='T:/',
+            osx_path='/Volumes/T/'
+        )
+        self.repo2 = Repository(
+            name='Test Repo 2',
+            linux_path='/mnt/S/',
+            windows_path='S:/',
+            osx_path='/Volumes/S/'
+        )
+        DBSession.add_all([self.repo0, self.repo1, self.repo2])
+        DBSession.commit()
+
+        self.query_count = 0
+
+        from sqlalchemy import event
+
+        def count_queries(*args):
+            self.query_count += 1
+
+        self.count_queries = count_queries
+        event.listen(DBSession.get_bind(), 'before_execute',
+                     count_queries)
+
+    def tearDown(self):
+        """clean up the test
+        """
+        from sqlalchemy import event
+        event.remove(DBSession.get_bind(), 'before_execute',
+                     self.count_queries)
+        DBSession.remove()
+
+    def test_find_repo_is_working_properly(self):
+        """testing if the find_repo method will return the first repository
+        that the path starts with one of its paths
+        """
+        index = RepositoryIndex()
+        self.assertEqual(
+            self.repo0, index.find_repo('/mnt/T/with_a_very_long_path/TP/A')
+        )
+        self.assertEqual(self.repo1, index.find_repo('/mnt/T/TP1/A'))
+        self.assertEqual(self.repo1, index.find_repo('T:/TP1/A'))
+        self.assertEqual(self.repo2, index.find_repo('/Volumes/S/TP2/A'))
+        self.assertEqual(None, index.find_repo('/mnt/X/TP2/A'))
+        self.assertEqual(None, index.find_repo(''))
+
+    def test_find_repos_is_querying_the_repositories_once(self):
+        """testing if the find_repos method will resolve all the given paths
+        with one query
+        """
+        index = RepositoryIndex()
+        paths = ['/mnt/T/TP1/A', 'S:/TP2/B', '/tmp/C'] * 1000
+        self.query_count = 0
+        repos = index.find_repos(paths)
+        self.assertEqual([self.repo1, self.repo2, None] * 1000, repos)
+        self.assertEqual(1, self.query_count)
+
+        # the index is loaded now
+        self.query_count = 0
+        index.find_repos(paths)
+        self.assertEqual(0, self.query_count)
+
+    def test_trim_repo_paths_is_working_properly(self):
+        """testing if the trim_repo_paths method will trim the repository
+        paths from the given paths
+        """
+        index = RepositoryIndex()
+        self.assertEqual(
+            ['TP/A', 'TP1/A', 'TP1/A', 'TP2/A', '/mnt/X/TP2/A'],
+            index.trim_repo_paths([
+                'T:/with_a_very_long_path/TP/A',
+                '/mnt/T/TP1/A',
+                'T:/TP1/A',
+                '/Volumes/S/TP2/A',
+                '/mnt/X/TP2/A'
+            ])
+        )
+        self.assertEqual('TP1/A', index.trim_repo_path('/Volumes/T/TP1/A'))
+
+    def test_index_is_reloaded_when_it_is_expired(self):
+        """testing if the index is reloaded after the ttl or refresh
+        """
+        index = RepositoryIndex(ttl=1000)
+        index.find_repo('/mnt/T/TP1/A')
+        self.query_count = 0
+        index.find_repo('/mnt/T/TP1/A')
+        self.assertEqual(0, self.query_count)
+
+        index.ttl = -1
+        index.find_repo('/mnt/T/TP1/A')
+        self.assertEqual(1, self.query_count)
+
+        index.ttl = 1000
+        index.refresh()
+        self.assertEqual(2, self.query_count)
+        index.find_repo('/mnt/T/TP1/A')
+        self.assertEqual(2, self.query_count)
+
+    def test_shared_index_is_invalidated_by_repository_changes(self):
+        """testing if the shared index is reloaded when a repository is
+        created or updated
+        """
+        env = EnvironmentBase()
+        self.assertEqual(self.repo2, env.find_repo('/mnt/S/TP2/A'))
+        self.assertTrue(RepositoryIndex.get() is RepositoryIndex.get())
+
+        repo3 = Repository(
+            name='Test Repo 3',
+            linux_path='/mnt/S/TP2/',
+            windows_path='S:/TP2/',
+            osx_path='/Volumes/S/TP2/'
+        )
+        DBSession.add(repo3)
+        DBSession.commit()
+        # the first repository in the query order is used
+        self.assertEqual(self.repo2, env.find_repo('/mnt/S/TP2/A'))
+        self.assertEqual(self.repo2, env.find_repo('S:/TP2/A'))
+
+        self.repo2.windows_path = 'U:/'
+        DBSession.commit()
+        self.assertEqual(
+            [self.repo2, repo3],
+            env.find_repos(['U:/TP2/A', 'S:/TP2/A'])
+        )
+        self.assertEqual(
+            ['TP2/A', 'A'],
+            env.trim_repo_paths(['U:/TP2/A', 'S:/TP2/A'])
+        )
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+import os
+import shutil
+import tempfile
+import unittest
+
+import timecode
+from stalker import (db, Repository, FilenameTemplate, Structure,
+                     StatusList, Project, Shot, Task)
+from stalker.db.session import DBSession
+
+from anima.env.resolve import Avid2Resolve
+
+
+class Event(object):
+    """an edl.Event like object
+    """
+
+    def __init__(self, reel, src_start, src_end, fps='24'):
+        self.reel = reel
+        self.source_file = 'original'
+        self.src_start_tc = timecode.Timecode(fps, src_start)
+        self.src_end_tc = timecode.Timecode(fps, src_end)
+
+
+class Avid2ResolveTestCase(unittest.TestCase):
+    """tests the anima.env.resolve.Avid2Resolve class
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        db.setup({'sqlalchemy.url': 'sqlite:///:memory:'})
+        db.init()
+
+        self.temp_repo_path = tempfile.mkdtemp()
+
+        repo = Repository(
+            name='Test Project Repository',
+            linux_path=self.temp_repo_path,
+            windows_path=self.temp_repo_path,
+            osx_path=self.temp_repo_path
+        )
+
+        task_template = FilenameTemplate(
+            name='Task Template',
+            target_entity_type='Task',
+            path='{{project.repository.path}}/{{project.code}}/'
+                 '{%- for parent_task in parent_tasks -%}'
+                 '{{parent_task.nice_name}}/'
+                 '{%- endfor -%}',
+            filename='{{version.nice_name}}'
+                     '_v{{"%03d"|format(version.version_number)}}',
+        )
+
+        structure = Structure(
+            name='Project Struture',
+            templates=[task_template]
+        )
+
+        project_status_list = StatusList.query\
+            .filter_by(target_entity_type='Project').first()
+
+        self.project = Project(
+            name='Test Project',
+            code='TP',
+            repositories=[repo],
+            status_list=project_status_list,
+            structure=structure
+        )
+        DBSession.add(self.project)
+
+        # Seq001_001_TNGE_0010 has two outputs
+        # Seq001_001_TNGE_0020 has only a png output
+        # Seq001_001_TNGE_0030 has no Comp task
+        self.shots = []
+        self.comp_tasks = []
+        for i in range(1, 4):
+            shot = Shot(
+                name='Seq001_001_TNGE_00%i0' % i,
+                code='Seq001_001_TNGE_00%i0' % i,
+                project=self.project
+            )
+            self.shots.append(shot)
+            if i < 3:
+                self.comp_tasks.append(
+                    Task(name='Comp', parent=shot)
+                )
+        DBSession.add_all(self.shots + self.comp_tasks)
+        DBSession.commit()
+
+        output_path = Avid2Resolve.get_output_path(self.comp_tasks[0])
+        for version in ['v001', 'v002']:
+            self.create_files(
+                '%s/%s/exr' % (output_path, version),
+                'Seq001_001_TNGE_0010_Comp_Main_%s.%%04i.exr' % version
+            )
+
+        self.create_files(
+            '%s/v001/png' % Avid2Resolve.get_output_path(self.comp_tasks[1]),
+            'Seq001_001_TNGE_0020_Comp_Main_v001.%04i.png'
+        )
+
+    def tearDown(self):
+        """clean up the test
+        """
+        DBSession.remove()
+        shutil.rmtree(self.temp_repo_path)
+
+    @classmethod
+    def create_files(cls, path, file_name_template):
+        """creates an image sequence with 3 frames
+        """
+        os.makedirs(path)
+        for frame in range(1, 4):
+            with open(os.path.join(path, file_name_template % frame), 'w'):
+                pass
+
+    def test_resolve_latest_outputs_is_working_properly(self):
+        """testing if the resolve_latest_outputs method will find the latest
+        outputs of the shots with the given names
+        """
+        a2r = Avid2Resolve()
+        latest_outputs = a2r.resolve_latest_outputs(
+            ['Seq001_001_TNGE_0010', 'Seq001_001_TNGE_0020',
+             'Seq001_001_TNGE_0030', 'Seq001_001_TNGE_0040',
+             'Seq001_001_TNGE_0010'],
+            worker_count=2
+        )
+
+        output_path = Avid2Resolve.get_output_path(self.comp_tasks[0])
+        self.assertEqual(
+            {
+                'Seq001_001_TNGE_0010':
+                    'localhost/%s/v002/exr/'
+                    'Seq001_001_TNGE_0010_Comp_Main_v002.%%5B001-003%%5D.exr'
+                    % output_path,
+                'Seq001_001_TNGE_0020': '',
+                'Seq001_001_TNGE_0030': '',
+                'Seq001_001_TNGE_0040': None,
+            },
+            latest_outputs
+        )
+        # the same results with find_latest_outputs
+        for shot in self.shots:
+            self.assertEqual(
+                a2r.find_latest_outputs(shot) or '',
+                latest_outputs[shot.name]
+            )
+
+    def test_resolve_latest_outputs_is_caching_the_results(self):
+        """testing if the resolve_latest_outputs method will not resolve the
+        already resolved shot names again
+        """
+        a2r = Avid2Resolve()
+        latest_outputs = a2r.resolve_latest_outputs(['Seq001_001_TNGE_0010'])
+        expected = dict(latest_outputs)
+
+        # remove the outputs, the cached value should be used
+        shutil.rmtree(Avid2Resolve.get_output_path(self.comp_tasks[0]))
+        self.assertEqual(
+            expected,
+            a2r.resolve_latest_outputs(['Seq001_001_TNGE_0010'])
+        )
+
+        a2r.latest_outputs.clear()
+        self.assertEqual(
+            {'Seq001_001_TNGE_0010': ''},
+            a2r.resolve_latest_outputs(['Seq001_001_TNGE_0010'])
+        )
+
+    def test_convert_paths_is_working_properly(self):
+        """testing if the convert_paths method will update the source files
+        and timecodes of the events
+        """
+        a2r = Avid2Resolve()
+        a2r.fps = '24'
+        a2r.events = [
+            Event('SEQ001_001_TNGE_0010', '01:00:00:10', '01:00:01:00'),
+            Event('SEQ001_001_TNGE_0020', '08:00:00:10', '08:00:01:00'),
+            Event('SEQ001_001_TNGE_0040', '00:00:00:10', '00:00:01:00'),
+            Event('KKS_SEQ001_001_TNGE_0010_COMP', '12:00:00:10',
+                  '12:00:01:00'),
+        ]
+        a2r.convert_paths(worker_count=2)
+
+        output_path = Avid2Resolve.get_output_path(self.comp_tasks[0])
+        expected_source_file = \
+            'localhost/%s/v002/exr/' \
+            'Seq001_001_TNGE_0010_Comp_Main_v002.%%5B001-003%%5D.exr' % \
+            output_path
+        self.assertEqual(
+            [expected_source_file, '', 'original', expected_source_file],
+            [e.source_file for e in a2r.events]
+        )
+        self.assertEqual(
+            ['00:00:00:10', '00:01:00:10', '00:00:00:10', '00:01:00:10'],
+            [str(e.src_start_tc) for e in a2r.events]
+        )
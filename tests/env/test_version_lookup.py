@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+import unittest
+
+from stalker import (db, Repository, FilenameTemplate, Structure,
+                     StatusList, Project, Task, Version)
+from stalker.db.session import DBSession
+
+from anima.env.base import EnvironmentBase, VersionLookupCache
+
+
+class VersionLookupTestBase(unittest.TestCase):
+    """the base class of the version lookup tests
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        db.setup({'sqlalchemy.url': 'sqlite:///:memory:'})
+        db.init()
+
+        self.repo = Repository(
+            name='Test Repo',
+            linux_path='/mnt/T/',
+            windows_path='T:/',
+            osx_path='/Volumes/T/'
+        )
+
+        task_template = FilenameTemplate(
+            name='Task Template',
+            target_entity_type='Task',
+            path='$REPO{{project.repository.id}}/{{project.code}}/'
+                 '{%- for parent_task in parent_tasks -%}'
+                 '{{parent_task.nice_name}}/{%- endfor -%}',
+            filename='{{task.nice_name}}_{{version.take_name}}'
+                     '_v{{"%03d"|format(version.version_number)}}',
+        )
+
+        project = Project(
+            name='Test Project',
+            code='TP',
+            repositories=[self.repo],
+            status_list=StatusList.query
+            .filter_by(target_entity_type='Project').first(),
+            structure=Structure(
+                name='Project Structure',
+                templates=[task_template]
+            )
+        )
+        DBSession.add(project)
+        DBSession.commit()
+
+        self.versions = []
+        for i in range(3):
+            task = Task(name='Task %i' % i, project=project)
+            version = Version(task=task)
+            version.update_paths()
+            version.extension = '.ma'
+            self.versions.append(version)
+        DBSession.add_all(self.versions)
+        DBSession.commit()
+
+        self.query_count = 0
+
+        from sqlalchemy import event
+
+        def count_queries(*args):
+            self.query_count += 1
+
+        self.count_queries = count_queries
+        event.listen(DBSession.get_bind(), 'before_execute', count_queries)
+
+    def tearDown(self):
+        """clean up the test
+        """
+        from sqlalchemy import event
+        event.remove(DBSession.get_bind(), 'before_execute',
+                     self.count_queries)
+        DBSession.remove()
+
+    def make_path(self, version, repo_path):
+        """returns the full path of the given version in the given repo path
+        """
+        return version.full_path.replace('$REPO%s/' % self.repo.id, repo_path)
+
+
+class GetVersionsFromFullPathsTestCase(VersionLookupTestBase):
+    """tests the EnvironmentBase.get_versions_from_full_paths() method
+    """
+
+    def test_get_versions_from_full_paths_is_working_properly(self):
+        """testing if the get_versions_from_full_paths method will return a
+        dictionary of the given paths and versions
+        """
+        path0 = self.make_path(self.versions[0], '/mnt/T/')
+        path1 = self.make_path(self.versions[1], 'T:/').replace('/', '\\')
+        path2 = self.make_path(self.versions[2], '/Volumes/T/')
+        path3 = '/mnt/T/TP/Not_A_Version.ma'
+        self.assertEqual(
+            {
+                path0: self.versions[0],
+                path1: self.versions[1],
+                path2: self.versions[2],
+                path3: None,
+            },
+            EnvironmentBase.get_versions_from_full_paths(
+                [path0, path1, path2, path3, path0]
+            )
+        )
+        self.assertEqual(
+            self.versions[2],
+            EnvironmentBase.get_version_from_full_path(path2)
+        )
+
+    def test_get_versions_from_full_paths_is_querying_in_chunks(self):
+        """testing if the get_versions_from_full_paths method will query the
+        versions in chunks
+        """
+        paths = [self.make_path(v, '/mnt/T/') for v in self.versions] * 100
+        paths += ['/mnt/T/TP/File_%i.ma' % i for i in range(1000)]
+
+        # load the repository index first
+        EnvironmentBase.find_repo('/mnt/T/')
+        self.query_count = 0
+        versions = EnvironmentBase.get_versions_from_full_paths(
+            paths, chunk_size=500
+        )
+        # 1003 unique paths
+        self.assertEqual(3, self.query_count)
+        self.assertEqual(1003, len(versions))
+        self.assertEqual(
+            self.versions,
+            [versions[self.make_path(v, '/mnt/T/')] for v in self.versions]
+        )
+
+        self.query_count = 0
+        versions = EnvironmentBase.get_versions_from_full_paths(
+            paths, chunk_size=100
+        )
+        self.assertEqual(11, self.query_count)
+        self.assertEqual(1003, len(versions))
+
+
+class VersionLookupCacheTestCase(VersionLookupTestBase):
+    """tests the anima.env.base.VersionLookupCache class
+    """
+
+    def test_path_lookups_are_cached(self):
+        """testing if the versions of the paths are cached in the with block
+        """
+        paths = [self.make_path(v, '/mnt/T/') for v in self.versions]
+        paths.append('/mnt/T/TP/Not_A_Version.ma')
+        # load the repository index first
+        EnvironmentBase.find_repo('/mnt/T/')
+
+        self.assertEqual(None, VersionLookupCache.current())
+        with VersionLookupCache() as cache:
+            self.assertTrue(VersionLookupCache.current() is cache)
+            self.query_count = 0
+            versions1 = EnvironmentBase.get_versions_from_full_paths(paths)
+            versions2 = EnvironmentBase.get_versions_from_full_paths(paths)
+            self.assertEqual(1, self.query_count)
+
+        self.assertEqual(versions1, versions2)
+
+        self.assertEqual(None, VersionLookupCache.current())
+        self.assertEqual(4, cache.hits['path'])
+        self.assertEqual(4, cache.misses['path'])
+
+        # not cached anymore
+        self.query_count = 0
+        EnvironmentBase.get_versions_from_full_paths(paths)
+        self.assertEqual(1, self.query_count)
+
+    def test_cache_is_invalidated_by_commits(self):
+        """testing if the cache is cleared when the session is committed or
+        invalidate is called
+        """
+        path = self.make_path(self.versions[0], '/mnt/T/')
+        EnvironmentBase.find_repo('/mnt/T/')
+
+        with VersionLookupCache() as cache:
+            EnvironmentBase.get_version_from_full_path(path)
+            EnvironmentBase.get_version_from_full_path(path)
+            self.assertEqual(1, cache.misses['path'])
+
+            DBSession.commit()
+            EnvironmentBase.get_version_from_full_path(path)
+            self.assertEqual(2, cache.misses['path'])
+
+            cache.invalidate()
+            EnvironmentBase.get_version_from_full_path(path)
+            self.assertEqual(3, cache.misses['path'])
+            self.assertEqual(1, cache.hits['path'])
+
+        # the listener is removed
+        DBSession.commit()
+
+    def test_latest_published_versions_are_cached(self):
+        """testing if the latest published versions are cached
+        """
+        version0 = self.versions[0]
+        version0.is_published = True
+        new_version = Version(task=version0.task)
+        DBSession.add(new_version)
+        DBSession.commit()
+
+        # load the attributes
+        task = version0.task
+        task.id
+        with VersionLookupCache() as cache:
+            self.query_count = 0
+            latest_published_version1 = \
+                VersionLookupCache.get_latest_published_version(task, 'Main')
+            latest_published_version2 = \
+                VersionLookupCache.get_latest_published_version(task, 'Main')
+            self.assertEqual(1, self.query_count)
+            self.assertTrue(latest_published_version1 is version0)
+            self.assertTrue(latest_published_version2 is version0)
+            self.assertEqual(1, cache.hits['latest_published_version'])
+            self.assertEqual(1, cache.misses['latest_published_version'])
+
+            # a new published version is committed
+            new_version.is_published = True
+            DBSession.commit()
+            self.assertTrue(
+                VersionLookupCache.get_latest_published_version(task, 'Main')
+                is new_version
+            )
+            self.assertEqual(2, cache.misses['latest_published_version'])
+
+        # without a cache
+        self.assertTrue(
+            VersionLookupCache.get_latest_published_version(task, 'Main')
+            is new_version
+        )
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+"""Tests the speed of the anima.edit module on synthetic tracks
+"""
+import os
+import time
+import random
+import resource
+import tempfile
+import multiprocessing
+
+try:
+    import edl
+except ImportError:
+    edl = None
+
+from anima.edit import (Sequence, Media, Video, Track, Clip, File, Rate,
+                        TimelineIndex)
+
+
+def create_track(clip_count, shot_count):
+    """creates a track with clip_count clips using shot_count different shots
+    """
+    track = Track()
+    for i in range(clip_count):
+        shot_name = 'SH%04i' % random.randint(0, shot_count - 1)
+        clip = Clip()
+        clip.id = shot_name
+        clip.name = shot_name
+        clip.start = i * 24
+        clip.end = (i + 1) * 24
+        clip.file = File(
+            duration=24,
+            name=shot_name,
+            pathurl='/mnt/Projects/Test/Shots/%s/Output/%s.mov' % (
+                shot_name, shot_name
+            )
+        )
+        track.clips.append(clip)
+    return track
+
+
+def optimize_clips_quadratic(track):
+    """the previous implementation of Track.optimize_clips() to compare with
+    """
+    for i in range(len(track.clips)):
+        clip = track.clips[i]
+        for j in range(i + 1, len(track.clips)):
+            compare_clip = track.clips[j]
+            if clip.file.pathurl == compare_clip.file.pathurl:
+                compare_clip.file = clip.file
+
+            if clip.id == compare_clip.id:
+                compare_clip.id = Track._increment_clip_id(clip.id)
+
+
+def write_xml(path, clip_count, shot_count):
+    """writes a synthetic xmeml file with clip_count clips, which is about
+    100 MB for 100k clips
+    """
+    with open(path, 'w') as xml_file:
+        xml_file.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE xmeml>\n'
+            '<xmeml version="5">\n<sequence>\n<duration>%i</duration>\n'
+            '<name>SEQ001</name>\n<rate><timebase>24</timebase>'
+            '<ntsc>FALSE</ntsc></rate>\n<timecode><string>00:00:00:00</string>'
+            '</timecode>\n<media>\n<video>\n<format><samplecharacteristics>'
+            '<width>1920</width><height>1080</height></samplecharacteristics>'
+            '</format>\n<track>\n<locked>FALSE</locked>'
+            '<enabled>TRUE</enabled>\n' % (clip_count * 24)
+        )
+        exported_shots = set()
+        # some extra data like Premiere exports
+        filler = '<filter><effect><name>Basic Motion</name>%s</effect>' \
+            '</filter>\n' % ''.join(
+                '<parameter><parameterid>p%i</parameterid><value>0</value>'
+                '</parameter>' % i for i in range(12)
+            )
+        for i in range(clip_count):
+            shot_name = 'SH%06i' % random.randint(0, shot_count - 1)
+            xml_file.write(
+                '<clipitem id="%(name)s %(i)i">\n<end>%(end)i</end>'
+                '<name>%(name)s</name><enabled>TRUE</enabled>'
+                '<start>%(start)i</start><in>0</in><duration>24</duration>'
+                '<out>24</out>\n' % {
+                    'name': shot_name, 'i': i, 'start': i * 24,
+                    'end': (i + 1) * 24
+                }
+            )
+            if shot_name in exported_shots:
+                xml_file.write('<file id="%s.mov"/>\n' % shot_name)
+            else:
+                exported_shots.add(shot_name)
+                xml_file.write(
+                    '<file id="%(name)s.mov"><duration>24</duration>'
+                    '<name>%(name)s</name><pathurl>file://localhost/mnt/'
+                    'Projects/Test/Shots/%(name)s/Output/%(name)s.mov'
+                    '</pathurl></file>\n' % {'name': shot_name}
+                )
+            xml_file.write(filler)
+            xml_file.write('</clipitem>\n')
+        xml_file.write('</track>\n</video>\n</media>\n</sequence>\n</xmeml>')
+
+
+def create_sequence(clip_count, timebase='24'):
+    """creates a sequence with one track with clip_count clips
+    """
+    sequence = Sequence(name='SEQ001', duration=clip_count * 24,
+                        rate=Rate(timebase=timebase))
+    sequence.timecode = '00:00:00:00'
+    sequence.media = Media()
+    sequence.media.video = Video()
+    sequence.media.video.tracks.append(
+        create_track(clip_count, clip_count // 10)
+    )
+    return sequence
+
+
+def write_sequence_xml(method, path, clip_count, queue):
+    """writes a sequence with clip_count clips with the given method and puts
+    the duration and the peak memory increase in MB to the queue
+    """
+    sequence = create_sequence(clip_count)
+    sequence.media.video.optimize_clips()
+
+    start_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    with open(path, 'w') as xml_file:
+        if method == 'to_xml':
+            xml_file.write(sequence.to_xml())
+        else:
+            sequence.write_xml(xml_file)
+    end = time.time()
+    end_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((end - start, (end_memory - start_memory) / 1024.0))
+
+
+def read_xml(method, path, queue):
+    """reads the given xmeml file with the given method and puts the duration
+    and the peak memory increase in MB to the queue
+    """
+    from xml.etree import cElementTree
+    start_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    sequence = Sequence()
+    if method == 'from_xml':
+        sequence.from_xml(cElementTree.parse(path).getroot()[0])
+    else:
+        sequence.from_xml_file(path)
+    end = time.time()
+    end_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((end - start, (end_memory - start_memory) / 1024.0))
+
+
+if __name__ == '__main__':
+    random.seed(0)
+    print('***** OPTIMIZE CLIPS ****')
+    for clip_count in [10000, 50000]:
+        shot_count = clip_count // 10
+
+        track = create_track(clip_count, shot_count)
+        start = time.time()
+        track.optimize_clips()
+        end = time.time()
+        print('%6i clips                 : %.3f seconds' % (
+            clip_count, end - start))
+        optimized_ids = [clip.id for clip in track.clips]
+
+        video = Video()
+        video.tracks = [create_track(clip_count, shot_count) for _ in range(4)]
+        start = time.time()
+        video.optimize_clips(cross_track=True)
+        end = time.time()
+        print('%6i clips x 4 cross track : %.3f seconds' % (
+            clip_count, end - start))
+
+        if clip_count <= 10000:
+            random.seed(0)
+            track = create_track(clip_count, shot_count)
+            start = time.time()
+            optimize_clips_quadratic(track)
+            end = time.time()
+            print('%6i clips quadratic       : %.3f seconds' % (
+                clip_count, end - start))
+            assert optimized_ids == [clip.id for clip in track.clips]
+
+    print('****** XML READER *******')
+    xml_path = tempfile.mktemp(suffix='.xml')
+    for clip_count in [10000, 100000]:
+        write_xml(xml_path, clip_count, clip_count // 10)
+        print('%6i clips, %.1f MB file' % (
+            clip_count, os.path.getsize(xml_path) / 1024.0 / 1024.0))
+        for method in ['from_xml', 'from_xml_file']:
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=read_xml, args=(method, xml_path, queue)
+            )
+            process.start()
+            duration, peak_memory = queue.get()
+            process.join()
+            print('  %-13s             : %.3f seconds, %.1f MB peak' % (
+                method, duration, peak_memory))
+
+    print('****** XML WRITER *******')
+    for clip_count in [10000, 100000]:
+        print('%6i clips' % clip_count)
+        for method in ['to_xml', 'write_xml']:
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=write_sequence_xml,
+                args=(method, xml_path, clip_count, queue)
+            )
+            process.start()
+            duration, peak_memory = queue.get()
+            process.join()
+            print('  %-13s             : %.3f seconds, %.1f MB peak' % (
+                method, duration, peak_memory))
+    os.remove(xml_path)
+
+    print('********** EDL **********')
+    edl_path = tempfile.mktemp(suffix='.edl')
+    for timebase in ['24', '29.97']:
+        clip_count = 10000
+        sequence = create_sequence(clip_count, timebase=timebase)
+        print('%6i events at %s fps' % (clip_count, timebase))
+
+        if edl is not None:
+            start = time.time()
+            with open(edl_path, 'w') as edl_file:
+                edl_file.write(sequence.to_edl().to_string())
+            end = time.time()
+            print('  to_edl().to_string()      : %.3f seconds' % (end - start))
+
+        start = time.time()
+        with open(edl_path, 'w') as edl_file:
+            sequence.write_edl(edl_file)
+        end = time.time()
+        print('  write_edl                 : %.3f seconds' % (end - start))
+
+        if edl is not None:
+            start = time.time()
+            with open(edl_path) as edl_file:
+                edl_list = edl.Parser(timebase).parse(edl_file)
+            Sequence(rate=Rate(timebase=timebase)).from_edl(edl_list)
+            end = time.time()
+            print('  edl.Parser + from_edl     : %.3f seconds' % (end - start))
+
+        start = time.time()
+        Sequence(rate=Rate(timebase=timebase)).from_edl_file(edl_path)
+        end = time.time()
+        print('  from_edl_file             : %.3f seconds' % (end - start))
+    os.remove(edl_path)
+
+    print('**** TIMELINE INDEX *****')
+    for clip_count in [10000, 100000]:
+        query_count = 10000
+        sequence = create_sequence(clip_count)
+        clips = sequence.media.video.tracks[0].clips
+        frames = [random.randint(0, clip_count * 24)
+                  for _ in range(query_count)]
+        print('%6i clips, %i frame queries' % (clip_count, query_count))
+
+        if clip_count <= 10000:
+            start = time.time()
+            for frame in frames:
+                [c for c in clips if c.start <= frame < c.end]
+            end = time.time()
+            print('  scanning the clips        : %.3f seconds' % (end - start))
+
+        start = time.time()
+        index = TimelineIndex(clips)
+        end = time.time()
+        print('  TimelineIndex()           : %.3f seconds' % (end - start))
+
+        start = time.time()
+        for frame in frames:
+            index.clips_at(frame)
+        end = time.time()
+        print('  clips_at                  : %.3f seconds' % (end - start))
+
+        start = time.time()
+        for frame in frames:
+            index.clips_in_range(frame, frame + 100)
+        end = time.time()
+        print('  clips_in_range            : %.3f seconds' % (end - start))
+
+        start = time.time()
+        index.find_gaps_and_overlaps()
+        end = time.time()
+        print('  find_gaps_and_overlaps    : %.3f seconds' % (end - start))
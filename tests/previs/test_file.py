@@ -179,3 +179,44 @@ class FileTestCase(unittest.TestCase):
             call2,
             '<file id="%s"/>' % f.id
         )
+
+    def test_to_xml_method_is_escaping_the_values(self):
+        """testing if the to_xml method will escape the name and pathurl
+        values
+        """
+        f = File()
+        f.duration = 34
+        f.name = 'shot <2> & "3"'
+        f.pathurl = 'file://localhost/tmp/shot&2.mov'
+
+        expected_xml = \
+            """<file id="shot&amp;2.mov">
+  <duration>34</duration>
+  <name>shot &lt;2&gt; &amp; &quot;3&quot;</name>
+  <pathurl>file://localhost/tmp/shot&amp;2.mov</pathurl>
+</file>"""
+
+        self.assertEqual(expected_xml, f.to_xml())
+
+    def test_write_xml_method_is_writing_to_the_given_file_handler(self):
+        """testing if the write_xml method will write the same data with the
+        to_xml method to the given file handler
+        """
+        from StringIO import StringIO
+        f = File()
+        f.duration = 34
+        f.name = 'shot2'
+        f.pathurl = 'file://localhost/tmp/shot2.mov'
+
+        expected_xml = f.to_xml()
+        f.exported_once = False
+
+        output = StringIO()
+        f.write_xml(output)
+        self.assertEqual(expected_xml, output.getvalue())
+        self.assertTrue(f.exported_once)
+
+        # the second call writes only the reference
+        output = StringIO()
+        f.write_xml(output)
+        self.assertEqual('<file id="shot2.mov"/>', output.getvalue())
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from anima.edit import (Sequence, Media, Video, Track, Clip, File,
+                        MetaFuzeJob, run_metafuze_jobs)
+
+
+# creates the MXF file of the given job XML, which is the second <File> tag
+FAKE_METAFUZE_SCRIPT = \
+    "import re, sys; " \
+    "xml = open(sys.argv[1]).read(); " \
+    "open(re.findall('<File>(.*)</File>', xml)[1], 'w').write(xml)"
+
+
+class MetaFuzeJobTestCase(unittest.TestCase):
+    """tests the anima.edit.MetaFuzeJob class and the
+    anima.edit.run_metafuze_jobs function
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        self.temp_dir = tempfile.mkdtemp()
+        self.job_dir = os.path.join(self.temp_dir, 'jobs')
+
+        self.original_command = MetaFuzeJob.command
+        MetaFuzeJob.command = [sys.executable, '-c', FAKE_METAFUZE_SCRIPT]
+
+        self.sequence = Sequence(name='SEQ001')
+        self.sequence.media = Media()
+        self.sequence.media.video = Video()
+        self.sequence.media.video.width = 1920
+        self.sequence.media.video.height = 1080
+        track = Track()
+        self.sequence.media.video.tracks.append(track)
+
+        for i in range(3):
+            source_path = os.path.join(self.temp_dir, 'shot%i.mov' % i)
+            with open(source_path, 'w') as f:
+                f.write('shot%i' % i)
+            clip = Clip(id='shot%i' % i, name='shot%i' % i, duration=10)
+            clip.file = File(pathurl='file://localhost%s' % source_path)
+            track.clips.append(clip)
+
+    def tearDown(self):
+        """clean up the test
+        """
+        MetaFuzeJob.command = self.original_command
+        shutil.rmtree(self.temp_dir)
+
+    def test_to_metafuze_jobs_is_working_properly(self):
+        """testing if the Sequence.to_metafuze_jobs method will return a job
+        per clip with the same XML of the to_metafuze_xml method
+        """
+        jobs = self.sequence.to_metafuze_jobs()
+        self.assertEqual(3, len(jobs))
+        self.assertEqual(
+            self.sequence.to_metafuze_xml(),
+            [job.xml for job in jobs]
+        )
+        self.assertEqual(
+            os.path.join(self.temp_dir, 'shot1.mov'),
+            jobs[1].source_path
+        )
+        self.assertEqual(
+            os.path.join(self.temp_dir, 'shot1.mxf'),
+            jobs[1].mxf_path
+        )
+
+    def test_write_is_writing_the_xml_to_the_job_dir(self):
+        """testing if the write method will write the XML content to the given
+        job directory
+        """
+        os.makedirs(self.job_dir)
+        job = self.sequence.to_metafuze_jobs()[1]
+        xml_path = job.write(self.job_dir, 1)
+        self.assertEqual(
+            os.path.join(self.job_dir, '0001_shot1.xml'), xml_path
+        )
+        self.assertEqual(xml_path, job.xml_path)
+        with open(xml_path) as f:
+            self.assertEqual(job.xml, f.read())
+
+    def test_run_metafuze_jobs_is_running_all_the_jobs(self):
+        """testing if the run_metafuze_jobs function will run all the jobs and
+        yield them
+        """
+        jobs = self.sequence.to_metafuze_jobs()
+        finished_jobs = list(
+            run_metafuze_jobs(jobs, self.job_dir, worker_count=2)
+        )
+        self.assertEqual(
+            sorted(job.mxf_path for job in jobs),
+            sorted(job.mxf_path for job in finished_jobs)
+        )
+        for job in jobs:
+            self.assertEqual(0, job.return_code)
+            self.assertFalse(job.skipped)
+            self.assertTrue(os.path.exists(job.mxf_path))
+            self.assertTrue(job.is_up_to_date())
+
+    def test_run_metafuze_jobs_is_skipping_the_up_to_date_jobs(self):
+        """testing if the run_metafuze_jobs function will skip the jobs that
+        are converted before with the same source file and settings
+        """
+        list(run_metafuze_jobs(self.sequence.to_metafuze_jobs(),
+                               self.job_dir))
+
+        # change the source of the first clip and the settings of the second
+        with open(os.path.join(self.temp_dir, 'shot0.mov'), 'w') as f:
+            f.write('updated shot0')
+        self.sequence.media.video.tracks[0].clips[1].duration = 20
+
+        jobs = self.sequence.to_metafuze_jobs()
+        finished_jobs = list(run_metafuze_jobs(jobs, self.job_dir))
+        self.assertEqual(3, len(finished_jobs))
+        self.assertEqual([False, False, True], [job.skipped for job in jobs])
+        self.assertEqual([0, 0, None], [job.return_code for job in jobs])
+        self.assertTrue(jobs[2].xml_path is None)
+
+    def test_is_up_to_date_is_False_without_a_mxf_file(self):
+        """testing if the is_up_to_date method will return False if the MXF
+        file is deleted
+        """
+        jobs = self.sequence.to_metafuze_jobs()
+        list(run_metafuze_jobs(jobs, self.job_dir))
+        os.remove(jobs[0].mxf_path)
+        self.assertFalse(jobs[0].is_up_to_date())
+        self.assertTrue(jobs[1].is_up_to_date())
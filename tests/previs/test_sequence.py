@@ -710,6 +710,71 @@ class SequenceTestCase(unittest.TestCase):
             f.pathurl
         )
 
+    def test_from_edl_file_is_reading_the_same_data_with_from_edl(self):
+        """testing if the from_edl_file method will fill the same attributes
+        with the from_edl method
+        """
+        from edl import Parser
+        for file_name in ['test_v001.edl', 'test_v002.edl', 'test_v003.edl',
+                          'test_v004.edl']:
+            edl_path = os.path.abspath('./test_data/%s' % file_name)
+            with open(edl_path) as f:
+                edl_list = Parser('24').parse(f)
+
+            s1 = Sequence(rate=Rate(timebase='24'))
+            s1.from_edl(edl_list)
+
+            s2 = Sequence(rate=Rate(timebase='24'))
+            s2.from_edl_file(edl_path)
+
+            self.assertEqual(s1.name, s2.name)
+            self.assertEqual(s1.duration, s2.duration)
+            self.assertEqual(s1.timecode, s2.timecode)
+
+            clips1 = s1.media.video.tracks[0].clips
+            clips2 = s2.media.video.tracks[0].clips
+            self.assertEqual(len(clips1), len(clips2))
+            for c1, c2 in zip(clips1, clips2):
+                for attr in ['id', 'name', 'type', 'start', 'end', 'in_',
+                             'out', 'duration']:
+                    self.assertEqual(getattr(c1, attr), getattr(c2, attr))
+                for attr in ['name', 'duration', 'pathurl']:
+                    self.assertEqual(
+                        getattr(c1.file, attr), getattr(c2.file, attr)
+                    )
+
+    def test_write_edl_is_writing_the_same_data_with_to_edl(self):
+        """testing if the write_edl method will write the same data with the
+        edl.List instance that the to_edl method returns
+        """
+        from StringIO import StringIO
+        for timebase in ['24', '25', '29.97']:
+            s = Sequence(rate=Rate(timebase=timebase))
+            s.from_edl_file(os.path.abspath('./test_data/test_v001.edl'))
+
+            output = StringIO()
+            s.write_edl(output)
+            self.assertEqual(s.to_edl().to_string(), output.getvalue())
+
+            # and it can be read back
+            s2 = Sequence(rate=Rate(timebase=timebase))
+            s2.from_edl_file(StringIO(output.getvalue()))
+            output2 = StringIO()
+            s2.write_edl(output2)
+            self.assertEqual(output.getvalue(), output2.getvalue())
+
+    def test_write_edl_will_raise_RuntimeError_if_no_Media_instance_presents(
+            self):
+        """testing if a RuntimeError will be raised when there is no Media
+        instance present in Sequence
+        """
+        from StringIO import StringIO
+        s = Sequence()
+        output = StringIO()
+        with self.assertRaises(RuntimeError):
+            s.write_edl(output)
+        self.assertEqual('', output.getvalue())
+
     def test_to_metafuze_xml_is_working_properly(self):
         """testing if to_metafuze_xml method is working properly
         """
@@ -959,3 +1024,117 @@ class SequenceTestCase(unittest.TestCase):
             expected_xmls[2],
             result[2]
         )
+
+    def test_from_xml_file_is_reading_the_same_data_with_from_xml(self):
+        """testing if the from_xml_file method will fill the same attributes
+        with the from_xml method
+        """
+        from xml.etree import ElementTree
+        test_data_path = os.path.join(os.path.dirname(__file__), 'test_data')
+        for file_name in ['test_v001.xml', 'test_v002.xml', 'test_v003.xml']:
+            xml_path = os.path.join(test_data_path, file_name)
+            s1 = Sequence()
+            s1.from_xml(ElementTree.parse(xml_path).getroot()[0])
+
+            s2 = Sequence()
+            s2.from_xml_file(xml_path)
+
+            self.assertEqual(s1.name, s2.name)
+            self.assertEqual(s1.duration, s2.duration)
+            self.assertEqual(s1.timecode, s2.timecode)
+            self.assertEqual(s1.rate.timebase, s2.rate.timebase)
+            self.assertEqual(s1.rate.ntsc, s2.rate.ntsc)
+            self.assertEqual(s1.media.video.width, s2.media.video.width)
+            self.assertEqual(s1.media.video.height, s2.media.video.height)
+            self.assertEqual(
+                len(s1.media.video.tracks), len(s2.media.video.tracks)
+            )
+            for t1, t2 in zip(s1.media.video.tracks, s2.media.video.tracks):
+                self.assertEqual(t1.locked, t2.locked)
+                self.assertEqual(t1.enabled, t2.enabled)
+                self.assertEqual(len(t1.clips), len(t2.clips))
+                for c1, c2 in zip(t1.clips, t2.clips):
+                    for attr in ['id', 'name', 'enabled', 'start', 'end',
+                                 'in_', 'out', 'duration']:
+                        self.assertEqual(
+                            getattr(c1, attr), getattr(c2, attr)
+                        )
+                    for attr in ['id', 'name', 'duration', 'pathurl']:
+                        self.assertEqual(
+                            getattr(c1.file, attr), getattr(c2.file, attr)
+                        )
+
+    def test_from_xml_file_is_resolving_file_references(self):
+        """testing if the from_xml_file method will use the same File
+        instance for the file elements referring to an earlier file element
+        """
+        from StringIO import StringIO
+        xml_data = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE xmeml>
+<xmeml version="5">
+  <sequence>
+    <duration>60</duration>
+    <name>previs_edit_v001</name>
+    <rate>
+      <timebase>24</timebase>
+      <ntsc>FALSE</ntsc>
+    </rate>
+    <timecode>
+      <string>00:00:00:00</string>
+    </timecode>
+    <media>
+      <video>
+        <format>
+          <samplecharacteristics>
+            <width>1920</width>
+            <height>1080</height>
+          </samplecharacteristics>
+        </format>
+        <track>
+          <locked>FALSE</locked>
+          <enabled>TRUE</enabled>
+          <clipitem id="shot1">
+            <end>30</end>
+            <name>shot1</name>
+            <enabled>TRUE</enabled>
+            <start>0</start>
+            <in>0</in>
+            <duration>30</duration>
+            <out>30</out>
+            <file id="shot1.mov">
+              <duration>100</duration>
+              <name>shot1</name>
+              <pathurl>file://localhost/tmp/shot1.mov</pathurl>
+              <media>
+                <video>
+                  <duration>100</duration>
+                </video>
+              </media>
+            </file>
+          </clipitem>
+          <clipitem id="shot1 2">
+            <end>60</end>
+            <name>shot1</name>
+            <enabled>TRUE</enabled>
+            <start>30</start>
+            <in>50</in>
+            <duration>30</duration>
+            <out>80</out>
+            <file id="shot1.mov"/>
+          </clipitem>
+        </track>
+      </video>
+    </media>
+  </sequence>
+</xmeml>"""
+        s = Sequence()
+        s.from_xml_file(StringIO(xml_data))
+
+        self.assertEqual('previs_edit_v001', s.name)
+        self.assertEqual(1920, s.media.video.width)
+        clips = s.media.video.tracks[0].clips
+        self.assertEqual(['shot1', 'shot1 2'], [c.id for c in clips])
+        self.assertEqual(30, clips[1].start)
+        self.assertEqual(100, clips[0].file.duration)
+        self.assertEqual(clips[0].file, clips[1].file)
+        self.assertEqual('file://localhost/tmp/shot1.mov', clips[1].file.pathurl)
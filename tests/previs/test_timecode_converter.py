@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+import unittest
+from anima.edit import TimecodeConverter
+
+
+class TimecodeConverterTestCase(unittest.TestCase):
+    """tests the anima.edit.TimecodeConverter class
+    """
+
+    def test_get_is_returning_the_same_instance_per_framerate(self):
+        """testing if the get method will return the same instance for the
+        same framerate
+        """
+        c1 = TimecodeConverter.get('24')
+        c2 = TimecodeConverter.get(24)
+        c3 = TimecodeConverter.get('25')
+        self.assertTrue(c1 is c2)
+        self.assertFalse(c1 is c3)
+
+    def test_to_frames_is_working_properly(self):
+        """testing if the to_frames method will return the 0 based frame
+        numbers
+        """
+        c = TimecodeConverter('24')
+        self.assertEqual(0, c.to_frames('00:00:00:00'))
+        self.assertEqual(34, c.to_frames('00:00:01:10'))
+        self.assertEqual(86400, c.to_frames('01:00:00:00'))
+        self.assertEqual(2073599, c.to_frames('23:59:59:23'))
+
+    def test_to_timecode_is_working_properly(self):
+        """testing if the to_timecode method will return the timecode of the
+        given frame number
+        """
+        c = TimecodeConverter('25')
+        self.assertEqual('00:00:00:00', c.to_timecode(0))
+        self.assertEqual('00:00:01:09', c.to_timecode(34))
+        self.assertEqual('01:00:00:00', c.to_timecode(90000))
+
+    def test_to_timecode_is_wrapping_the_frame_numbers(self):
+        """testing if the to_timecode method will wrap the negative frame
+        numbers and the frame numbers after 24 hours
+        """
+        c = TimecodeConverter('24')
+        self.assertEqual('23:59:59:23', c.to_timecode(-1))
+        self.assertEqual('00:00:00:01', c.to_timecode(c.frames_per_day + 1))
+
+    def test_23_98_is_using_24_frames_per_second(self):
+        """testing if the 23.98 frame rate is converted with 24 frames per
+        second without drop frames
+        """
+        c = TimecodeConverter('23.98')
+        self.assertEqual(86400, c.to_frames('01:00:00:00'))
+        self.assertEqual('01:00:00:00', c.to_timecode(86400))
+
+    def test_drop_frame_timecodes_are_working_properly(self):
+        """testing if the 29.97 and 59.94 frame rates are using drop frame
+        timecodes
+        """
+        c = TimecodeConverter('29.97')
+        self.assertTrue(c.drop_frame)
+        self.assertEqual('00:00:59;29', c.to_timecode(1799))
+        # 00:01:00;00 and 00:01:00;01 are dropped
+        self.assertEqual('00:01:00;02', c.to_timecode(1800))
+        self.assertEqual(1800, c.to_frames('00:01:00;02'))
+        # but not in every tenth minute
+        self.assertEqual('00:10:00;00', c.to_timecode(17982))
+        self.assertEqual(17982, c.to_frames('00:10:00;00'))
+        self.assertEqual(107892, c.to_frames('01:00:00;00'))
+
+        c = TimecodeConverter('59.94')
+        self.assertEqual('00:01:00;04', c.to_timecode(3600))
+        self.assertEqual(3600, c.to_frames('00:01:00;04'))
+
+    def test_to_frames_and_to_timecode_are_symmetric(self):
+        """testing if converting a frame number to timecode and back will
+        return the same frame number
+        """
+        for framerate in ['12', '23.98', '24', '25', '29.97', '30', '50',
+                          '59.94', '60']:
+            c = TimecodeConverter(framerate)
+            for frame_number in range(0, c.frames_per_day, 997):
+                self.assertEqual(
+                    frame_number,
+                    c.to_frames(c.to_timecode(frame_number))
+                )
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+import random
+import unittest
+
+from anima.edit import (TimelineIndex, Sequence, Media, Video, Track, Clip)
+
+
+class TimelineIndexTestCase(unittest.TestCase):
+    """tests the anima.edit.TimelineIndex class
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        # 0    10   20   30   40   50   60
+        # |-c1-|-c2------|    |-c3-|
+        #           |-c4------|
+        #                          |c5|
+        self.c1 = Clip(id='c1', start=0, end=10)
+        self.c2 = Clip(id='c2', start=10, end=30)
+        self.c3 = Clip(id='c3', start=40, end=50)
+        self.c4 = Clip(id='c4', start=20, end=40)
+        self.c5 = Clip(id='c5', start=50, end=55)
+        self.clips = [self.c1, self.c2, self.c3, self.c4, self.c5]
+
+    @classmethod
+    def brute_force_clips_in_range(cls, clips, start, end):
+        """returns the clips in the given range by checking all the clips
+        """
+        return sorted(
+            [c for c in clips if c.start < c.end and c.start < end and
+             c.end > start],
+            key=lambda c: (c.start, id(c))
+        )
+
+    def test_clips_at_is_working_properly(self):
+        """testing if the clips_at method will return the clips on the given
+        frame sorted by their start frames
+        """
+        index = TimelineIndex(self.clips)
+        self.assertEqual([self.c1], index.clips_at(0))
+        self.assertEqual([self.c1], index.clips_at(9))
+        self.assertEqual([self.c2], index.clips_at(10))
+        self.assertEqual([self.c2, self.c4], index.clips_at(25))
+        self.assertEqual([self.c3], index.clips_at(40))
+        self.assertEqual([], index.clips_at(55))
+        self.assertEqual([], index.clips_at(-1))
+
+    def test_clips_in_range_is_working_properly(self):
+        """testing if the clips_in_range method will return the clips
+        overlapping with the given frame range
+        """
+        index = TimelineIndex(self.clips)
+        self.assertEqual([self.c1], index.clips_in_range(0, 10))
+        self.assertEqual(
+            [self.c1, self.c2, self.c4], index.clips_in_range(5, 21)
+        )
+        self.assertEqual(
+            [self.c4, self.c3, self.c5], index.clips_in_range(30, 60)
+        )
+        self.assertEqual([], index.clips_in_range(55, 60))
+        self.assertEqual([], index.clips_in_range(20, 20))
+
+    def test_overlapping_clips_is_working_properly(self):
+        """testing if the overlapping_clips method will return the other
+        clips overlapping with the given clip
+        """
+        index = TimelineIndex(self.clips)
+        self.assertEqual([self.c4], index.overlapping_clips(self.c2))
+        self.assertEqual([self.c2], index.overlapping_clips(self.c4))
+        self.assertEqual([], index.overlapping_clips(self.c1))
+
+    def test_find_gaps_and_overlaps_is_working_properly(self):
+        """testing if the find_gaps_and_overlaps method will return the gaps
+        and the overlapping frame ranges
+        """
+        index = TimelineIndex(self.clips + [Clip(start=60, end=70)])
+        self.assertEqual(
+            ([(55, 60)], [(20, 30)]),
+            index.find_gaps_and_overlaps()
+        )
+
+    def test_find_gaps_and_overlaps_is_merging_the_overlaps(self):
+        """testing if the find_gaps_and_overlaps method will merge the
+        overlapping frame ranges
+        """
+        index = TimelineIndex([
+            Clip(start=0, end=100),
+            Clip(start=10, end=20),
+            Clip(start=15, end=30),
+            Clip(start=50, end=60),
+        ])
+        self.assertEqual(
+            ([], [(10, 30), (50, 60)]),
+            index.find_gaps_and_overlaps()
+        )
+
+    def test_add_clip_is_working_properly(self):
+        """testing if the add_clip method will add the clip to the index
+        """
+        index = TimelineIndex(self.clips)
+        c6 = Clip(id='c6', start=52, end=60)
+        index.add_clip(c6)
+        self.assertTrue(c6 in index)
+        self.assertEqual(6, len(index))
+        self.assertEqual([self.c5, c6], index.clips_at(53))
+        self.assertEqual(
+            ([], [(20, 30), (52, 55)]),
+            index.find_gaps_and_overlaps()
+        )
+
+    def test_add_clip_is_raising_a_ValueError_for_indexed_clips(self):
+        """testing if a ValueError will be raised when the clip is already in
+        the index
+        """
+        index = TimelineIndex(self.clips)
+        self.assertRaises(ValueError, index.add_clip, self.c1)
+
+    def test_remove_clip_is_working_properly(self):
+        """testing if the remove_clip method will remove the clip from the
+        index
+        """
+        index = TimelineIndex(self.clips)
+        index.remove_clip(self.c4)
+        self.assertFalse(self.c4 in index)
+        self.assertEqual([self.c2], index.clips_at(25))
+        self.assertEqual(
+            ([(30, 40)], []), index.find_gaps_and_overlaps()
+        )
+        self.assertRaises(ValueError, index.remove_clip, self.c4)
+
+    def test_remove_clip_is_using_the_indexed_frames(self):
+        """testing if the remove_clip method will remove the clip even if its
+        frames are changed after it is indexed
+        """
+        index = TimelineIndex(self.clips)
+        self.c2.start = 100
+        self.c2.end = 200
+        index.remove_clip(self.c2)
+        self.assertEqual([self.c4], index.clips_at(25))
+
+    def test_empty_clips_are_not_on_any_frame(self):
+        """testing if the clips with no frames are not returned by the
+        clips_at method and are not creating gaps
+        """
+        empty_clip = Clip(start=5, end=5)
+        index = TimelineIndex([self.c1, empty_clip])
+        self.assertEqual([self.c1], index.clips_at(5))
+        self.assertEqual([self.c1], index.clips_in_range(0, 10))
+        self.assertEqual(([], []), index.find_gaps_and_overlaps())
+        index.remove_clip(empty_clip)
+        self.assertEqual(1, len(index))
+
+    def test_queries_are_returning_the_same_results_with_a_brute_force_search(
+            self):
+        """testing if the queries will return the same clips with checking
+        every clip after adding and removing random clips
+        """
+        random.seed(0)
+        clips = []
+        for i in range(200):
+            start = random.randint(0, 1000)
+            clips.append(Clip(start=start, end=start + random.randint(0, 50)))
+
+        index = TimelineIndex(clips[:100])
+        for clip in clips[100:]:
+            index.add_clip(clip)
+        for clip in clips[::3]:
+            index.remove_clip(clip)
+        remaining_clips = [c for i, c in enumerate(clips) if i % 3]
+
+        for i in range(300):
+            start = random.randint(-10, 1060)
+            end = start + random.randint(1, 20)
+            self.assertEqual(
+                self.brute_force_clips_in_range(
+                    remaining_clips, start, start + 1
+                ),
+                index.clips_at(start)
+            )
+            self.assertEqual(
+                self.brute_force_clips_in_range(remaining_clips, start, end),
+                index.clips_in_range(start, end)
+            )
+
+    def test_sequence_get_timeline_index_is_indexing_all_the_tracks(self):
+        """testing if the Sequence.get_timeline_index method will index the
+        clips in all the video tracks
+        """
+        sequence = Sequence()
+        sequence.media = Media()
+        sequence.media.video = Video()
+        for clips in [self.clips[:2], self.clips[2:]]:
+            track = Track()
+            track.clips.extend(clips)
+            sequence.media.video.tracks.append(track)
+
+        index = sequence.get_timeline_index()
+        self.assertEqual(5, len(index))
+        self.assertEqual([self.c2, self.c4], index.clips_at(25))
+
+        # no media
+        self.assertEqual(0, len(Sequence().get_timeline_index()))
@@ -477,3 +477,114 @@ class TrackTestCase(unittest.TestCase):
             expected_xml,
             t.to_xml()
         )
+
+    def test_optimize_clips_is_renaming_clips_with_the_same_id(self):
+        """testing if the optimize_clips method will rename the clips that have
+        the same id with the clips before them
+        """
+        t = Track()
+        for clip_id in ['shot2', 'shot2', 'shot1', 'shot2', 'shot2 2']:
+            c = Clip()
+            c.id = clip_id
+            c.file = File(pathurl='/home/eoyilmaz/%s.mov' % clip_id)
+            t.clips.append(c)
+
+        t.optimize_clips()
+
+        self.assertEqual(
+            ['shot2', 'shot2 2', 'shot1', 'shot2 3', 'shot2 4'],
+            [c.id for c in t.clips]
+        )
+        self.assertEqual(t.clips[0].file, t.clips[1].file)
+        self.assertEqual(t.clips[0].file, t.clips[3].file)
+        self.assertNotEqual(t.clips[0].file, t.clips[4].file)
+
+    def test_optimize_clips_is_using_the_given_files(self):
+        """testing if the optimize_clips method will use the File instances in
+        the given files dictionary
+        """
+        f = File(pathurl='/home/eoyilmaz/shot1.mov')
+        files = {f.pathurl: f}
+
+        t = Track()
+        c = Clip()
+        c.id = 'shot1'
+        c.file = File(pathurl='/home/eoyilmaz/shot1.mov')
+        t.clips.append(c)
+
+        t.optimize_clips(files=files)
+        self.assertEqual(f, c.file)
+
+    def test_write_xml_method_is_writing_a_parsable_xml(self):
+        """testing if the write_xml method will write the clips with escaped
+        values and the optimized files only once
+        """
+        from StringIO import StringIO
+        from xml.etree import ElementTree
+
+        t = Track()
+        for i in range(3):
+            c = Clip()
+            c.id = 'R&D <%i>' % i
+            c.name = 'R&D "shot"'
+            c.start = i * 10
+            c.end = (i + 1) * 10
+            c.file = File(pathurl='/home/eoyilmaz/R&D.mov')
+            t.clips.append(c)
+        t.optimize_clips()
+
+        output = StringIO()
+        t.write_xml(output)
+
+        track_node = ElementTree.fromstring(output.getvalue())
+        clip_nodes = track_node.findall('clipitem')
+        self.assertEqual(
+            ['R&D <0>', 'R&D <1>', 'R&D <2>'],
+            [n.attrib['id'] for n in clip_nodes]
+        )
+        self.assertEqual('R&D "shot"', clip_nodes[0].find('name').text)
+        self.assertEqual(
+            'file://localhost/home/eoyilmaz/R&D.mov',
+            clip_nodes[0].find('file').find('pathurl').text
+        )
+        self.assertEqual(0, len(clip_nodes[1].find('file')))
+        self.assertEqual(
+            clip_nodes[0].find('file').attrib['id'],
+            clip_nodes[2].find('file').attrib['id']
+        )
+
+    def test_timeline_index_is_indexing_the_clips(self):
+        """testing if the timeline_index attribute is a TimelineIndex of the
+        clips and it is created only once
+        """
+        t = Track()
+        clips = [Clip(id='shot%i' % i, start=i * 10, end=(i + 1) * 10)
+                 for i in range(3)]
+        t.clips.extend(clips)
+
+        index = t.timeline_index
+        self.assertTrue(index is t.timeline_index)
+        self.assertEqual([clips[1]], index.clips_at(15))
+
+        # recreated after set to None
+        t.clips.append(Clip(id='shot3', start=30, end=40))
+        t.timeline_index = None
+        self.assertEqual(4, len(t.timeline_index))
+
+    def test_add_clip_and_remove_clip_are_updating_the_timeline_index(self):
+        """testing if the add_clip and remove_clip methods will update the
+        clips and the timeline index
+        """
+        t = Track()
+        c1 = Clip(id='shot1', start=0, end=10)
+        c2 = Clip(id='shot2', start=5, end=20)
+        t.add_clip(c1)
+        self.assertEqual([c1], t.timeline_index.clips_at(5))
+
+        t.add_clip(c2)
+        self.assertEqual([c1, c2], t.clips)
+        self.assertEqual([c1, c2], t.timeline_index.clips_at(5))
+
+        t.remove_clip(c1)
+        self.assertEqual([c2], t.clips)
+        self.assertEqual([c2], t.timeline_index.clips_at(5))
@@ -308,3 +308,33 @@ class VideoTestCase(unittest.TestCase):
             f.pathurl
         )
 
+    def test_optimize_clips_is_sharing_files_across_tracks(self):
+        """testing if the optimize_clips method will use the same File
+        instance for the clips in different tracks with the same file
+        """
+        for cross_track in [True, False]:
+            v = Video()
+            for i in range(2):
+                t = Track()
+                v.tracks.append(t)
+                for shot_name in ['shot1', 'shot2', 'shot1']:
+                    c = Clip()
+                    c.id = shot_name
+                    c.file = File(
+                        pathurl='/home/eoyilmaz/%s.mov' % shot_name
+                    )
+                    t.clips.append(c)
+
+            v.optimize_clips(cross_track=cross_track)
+
+            track1_clips = v.tracks[0].clips
+            track2_clips = v.tracks[1].clips
+            self.assertEqual(track1_clips[0].file, track1_clips[2].file)
+            self.assertEqual(track2_clips[0].file, track2_clips[2].file)
+            self.assertEqual(
+                cross_track, track1_clips[0].file == track2_clips[0].file
+            )
+            # the clip ids are unique per track
+            self.assertEqual(
+                ['shot1', 'shot2', 'shot1 2'], [c.id for c in track2_clips]
+            )
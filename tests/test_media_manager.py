@@ -0,0 +1,647 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2012-2017, Anima Istanbul
+#
+# This module is part of anima-tools and is released under the BSD 2
+# License: http://www.opensource.org/licenses/BSD-2-Clause
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from anima.utils import (MediaInfoCache, MediaManager, MediaJob,
+                         MediaJobQueue)
+
+
+FFPROBE_OUTPUT = json.dumps({
+    'streams': [
+        {
+            'index': 0,
+            'codec_name': 'aac',
+            'codec_type': 'audio',
+            'duration': '10.000000',
+        },
+        {
+            'index': 1,
+            'codec_name': 'h264',
+            'codec_type': 'video',
+            'width': 1920,
+            'height': 1080,
+            'r_frame_rate': '24000/1001',
+            'duration': '10.010000',
+            'nb_frames': '240',
+            'disposition': {'default': 1},
+            'tags': {'language': 'und'},
+        }
+    ],
+    'format': {
+        'filename': 'test.mov',
+        'nb_streams': 2,
+        'duration': '10.010000',
+        'tags': {'major_brand': 'qt  '},
+    }
+}, indent=4)
+
+
+class MediaInfoCacheTestCase(unittest.TestCase):
+    """tests the MediaInfoCache class
+    """
+
+    def setUp(self):
+        """setup the tests
+        """
+        from anima import defaults
+        self.original_local_cache_folder = defaults.local_cache_folder
+        self.temp_dir = tempfile.mkdtemp()
+        defaults.local_cache_folder = os.path.join(self.temp_dir, 'cache')
+
+        self.file_paths = []
+        for i in range(3):
+            file_path = os.path.join(self.temp_dir, 'video%i.mov' % i)
+            with open(file_path, 'w') as f:
+                f.write('video%i' % i)
+            self.file_paths.append(file_path)
+
+    def tearDown(self):
+        """clean up test
+        """
+        from anima import defaults
+        defaults.local_cache_folder = self.original_local_cache_folder
+        shutil.rmtree(self.temp_dir)
+
+    def test_get_is_returning_None_for_unknown_files(self):
+        """testing if the get method will return None for the files that are
+        not cached
+        """
+        cache = MediaInfoCache()
+        self.assertTrue(cache.get(self.file_paths[0]) is None)
+
+    def test_set_and_get_are_working_properly(self):
+        """testing if the get method will return a copy of the media info
+        stored with the set method
+        """
+        cache = MediaInfoCache()
+        media_info = {'video_info': {'duration': '1'}, 'stream_info': []}
+        cache.set(self.file_paths[0], media_info)
+
+        cached_media_info = cache.get(self.file_paths[0])
+        self.assertEqual(media_info, cached_media_info)
+        self.assertFalse(media_info is cached_media_info)
+
+    def test_get_is_returning_None_if_the_file_is_changed(self):
+        """testing if the get method will return None if the file size or the
+        modification time is changed after it is cached
+        """
+        cache = MediaInfoCache()
+        cache.set(self.file_paths[0], {'video_info': {}, 'stream_info': []})
+        with open(self.file_paths[0], 'w') as f:
+            f.write('a longer content')
+        self.assertTrue(cache.get(self.file_paths[0]) is None)
+
+    def test_cache_is_persistent(self):
+        """testing if the cache is restored from the local cache folder
+        """
+        media_info = {'video_info': {'duration': '1'}, 'stream_info': []}
+        MediaInfoCache().set(self.file_paths[0], media_info)
+        self.assertTrue(os.path.exists(MediaInfoCache.cache_file_full_path()))
+        self.assertEqual(media_info, MediaInfoCache().get(self.file_paths[0]))
+
+    def test_least_recently_used_files_are_evicted(self):
+        """testing if the least recently used files are removed from the cache
+        when there are more files than the max_size
+        """
+        cache = MediaInfoCache(max_size=2)
+        cache.set(self.file_paths[0], {'video_info': {'i': 0}})
+        cache.set(self.file_paths[1], {'video_info': {'i': 1}})
+        # use the first one
+        cache.get(self.file_paths[0])
+        cache.set(self.file_paths[2], {'video_info': {'i': 2}})
+
+        self.assertFalse(cache.get(self.file_paths[0]) is None)
+        self.assertTrue(cache.get(self.file_paths[1]) is None)
+        self.assertFalse(cache.get(self.file_paths[2]) is None)
+
+        # and in the restored one
+        cache = MediaInfoCache(max_size=2)
+        self.assertEqual(
+            self.file_paths[::2],
+            list(cache.media_info.keys())
+        )
+
+
+class InterleavingLock(object):
+    """A lock which keeps the first thread that acquires it in the critical
+    section until a second thread tries to acquire it, to force the status
+    changes of a MediaJob to interleave.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entered = threading.Event()
+        self.waiting = threading.Event()
+
+    def __enter__(self):
+        if self.entered.is_set():
+            self.waiting.set()
+            self.lock.acquire()
+        else:
+            self.lock.acquire()
+            self.entered.set()
+            self.waiting.wait(5)
+            # let the second thread block on the lock
+            time.sleep(0.1)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.lock.release()
+        return False
+
+
+class MediaJobQueueTestCase(unittest.TestCase):
+    """tests the MediaJobQueue class
+    """
+
+    def setUp(self):
+        """setup the tests
+        """
+        self.job_queue = MediaJobQueue(worker_count=2, ffmpeg_thread_count=3)
+
+    def tearDown(self):
+        """clean up test
+        """
+        self.job_queue.shutdown()
+
+    def test_jobs_are_running_concurrently(self):
+        """testing if the jobs are run concurrently and the callbacks are
+        called with the completed jobs
+        """
+        events = [threading.Event(), threading.Event()]
+        completed_jobs = []
+
+        def wait_for_the_other(i):
+            events[i].set()
+            return events[1 - i].wait(5)
+
+        jobs = [
+            self.job_queue.submit(wait_for_the_other, [i],
+                                  callback=completed_jobs.append)
+            for i in range(2)
+        ]
+        self.assertTrue(self.job_queue.wait(jobs, timeout=10))
+        self.assertEqual(
+            [MediaJob.COMPLETED, MediaJob.COMPLETED],
+            [job.status for job in jobs]
+        )
+        self.assertEqual([True, True], [job.result for job in jobs])
+        self.assertEqual(sorted(jobs), sorted(completed_jobs))
+        self.assertTrue(self.job_queue.get_job(jobs[0].id) is jobs[0])
+
+    def test_ffmpeg_thread_count_is_set_per_job(self):
+        """testing if the ffmpeg thread count of the queue or the job is used
+        in the job
+        """
+        job1 = self.job_queue.submit(MediaJobQueue.get_ffmpeg_thread_count)
+        job2 = self.job_queue.submit(MediaJobQueue.get_ffmpeg_thread_count,
+                                     ffmpeg_thread_count=1)
+        self.job_queue.wait([job1, job2])
+        self.assertEqual(3, job1.result)
+        self.assertEqual(1, job2.result)
+        self.assertEqual(None, MediaJobQueue.get_ffmpeg_thread_count())
+
+        # and it is passed to ffmpeg
+        media_manager = MediaManager()
+        media_manager.ffmpeg_command_path = sys.executable
+        job = self.job_queue.submit(
+            media_manager.ffmpeg,
+            kwargs={
+                'c': 'import sys; sys.stderr.write(" ".join(sys.argv[1:]))',
+                'o': 'output.mov'
+            }
+        )
+        job.wait()
+        self.assertEqual(['-threads 3 -y output.mov'], job.result)
+
+    def test_failed_jobs_can_be_retried(self):
+        """testing if the failed jobs will store the error and can be retried
+        """
+        calls = []
+
+        def fail_once():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError('failed')
+            return 'done'
+
+        job = self.job_queue.submit(fail_once)
+        job.wait()
+        self.assertEqual(MediaJob.FAILED, job.status)
+        self.assertEqual('failed', str(job.error))
+        self.assertTrue('RuntimeError' in job.traceback)
+
+        self.job_queue.retry(job)
+        job.wait()
+        self.assertEqual(MediaJob.COMPLETED, job.status)
+        self.assertEqual('done', job.result)
+        self.assertEqual(None, job.error)
+        self.assertEqual(1, job.retry_count)
+
+        # completed jobs can not be retried
+        self.assertRaises(ValueError, self.job_queue.retry, job)
+
+    def test_queued_jobs_can_be_cancelled(self):
+        """testing if the cancelled jobs will not run and the result of a
+        cancelled running job is discarded
+        """
+        job_queue = MediaJobQueue(worker_count=1)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        job1 = job_queue.submit(block, callback=calls.append)
+        job2 = job_queue.submit(calls.append, ['job2'])
+        started.wait(5)
+        self.assertEqual(MediaJob.RUNNING, job1.status)
+        self.assertEqual(MediaJob.QUEUED, job2.status)
+
+        self.assertTrue(job2.cancel())
+        self.assertEqual(MediaJob.CANCELLED, job2.status)
+        self.assertTrue(job_queue.cancel(job1))
+        release.set()
+        job_queue.wait()
+        job_queue.shutdown()
+
+        self.assertEqual(MediaJob.CANCELLED, job1.status)
+        self.assertEqual([], calls)
+        self.assertFalse(job1.cancel())
+
+        job_queue.remove_finished_jobs()
+        self.assertEqual(0, len(job_queue.jobs))
+
+    def test_cancel_while_the_job_is_starting(self):
+        """testing if a job which is cancelled while it is moving to running
+        is run only once, and it is finished by the run method
+        """
+        calls = []
+        release = threading.Event()
+
+        def function():
+            calls.append(1)
+            release.wait(5)
+
+        job = MediaJob(function)
+        job.lock = InterleavingLock()
+        worker = threading.Thread(target=job.run)
+        worker.start()
+        self.assertTrue(job.lock.entered.wait(5))
+
+        # cancel() waits for the job to be running, so it only requests it
+        self.assertTrue(job.cancel())
+        self.assertEqual(MediaJob.RUNNING, job.status)
+        self.assertFalse(job.is_finished)
+        self.assertRaises(ValueError, self.job_queue.retry, job)
+
+        release.set()
+        worker.join(5)
+        self.assertEqual(MediaJob.CANCELLED, job.status)
+        self.assertEqual([1], calls)
+
+    def test_run_while_the_job_is_being_cancelled(self):
+        """testing if a queued job which is cancelled before it is moved to
+        running is not run at all
+        """
+        calls = []
+        job = MediaJob(lambda: calls.append(1))
+        job.lock = InterleavingLock()
+        canceller = threading.Thread(target=job.cancel)
+        canceller.start()
+        self.assertTrue(job.lock.entered.wait(5))
+
+        job.run()
+        canceller.join(5)
+        self.assertEqual(MediaJob.CANCELLED, job.status)
+        self.assertEqual([], calls)
+
+    def test_retried_job_is_run_once(self):
+        """testing if a job which is cancelled while it is queued and retried
+        is run only once although it is queued twice
+        """
+        calls = []
+        release = threading.Event()
+        job_queue = MediaJobQueue(worker_count=1)
+        try:
+            blocker = job_queue.submit(release.wait, [5])
+            job = job_queue.submit(lambda: calls.append(1))
+            self.assertTrue(job.cancel())
+            self.assertEqual(MediaJob.CANCELLED, job.status)
+            job_queue.retry(job)
+            release.set()
+            self.assertTrue(job_queue.wait([blocker, job], timeout=5))
+            # the other queued item of the job
+            job_queue.wait([job_queue.submit(lambda: None)], timeout=5)
+        finally:
+            job_queue.shutdown()
+        self.assertEqual(MediaJob.COMPLETED, job.status)
+        self.assertEqual(1, job.retry_count)
+        self.assertEqual([1], calls)
+
+class MediaManagerTestCase(unittest.TestCase):
+    """tests the MediaManager class
+    """
+
+    def setUp(self):
+        """setup the tests
+        """
+        from anima import defaults
+        self.original_local_cache_folder = defaults.local_cache_folder
+        self.temp_dir = tempfile.mkdtemp()
+        defaults.local_cache_folder = os.path.join(self.temp_dir, 'cache')
+        MediaManager._media_info_cache = None
+        MediaManager._job_queue = None
+
+        self.video_path = os.path.join(self.temp_dir, 'test.mov')
+        with open(self.video_path, 'w') as f:
+            f.write('video')
+
+        self.ffprobe_calls = []
+
+        def ffprobe(**kwargs):
+            self.ffprobe_calls.append(kwargs)
+            return [line + '\n' for line in FFPROBE_OUTPUT.split('\n')]
+
+        self.media_manager = MediaManager()
+        self.media_manager.ffprobe = ffprobe
+
+    def tearDown(self):
+        """clean up test
+        """
+        from anima import defaults
+        defaults.local_cache_folder = self.original_local_cache_folder
+        MediaManager._media_info_cache = None
+        if MediaManager._job_queue is not None:
+            MediaManager._job_queue.shutdown()
+            MediaManager._job_queue = None
+        shutil.rmtree(self.temp_dir)
+
+    def test_parse_ffprobe_output_is_working_properly(self):
+        """testing if the parse_ffprobe_output method will return the format
+        and the stream infos with the flattened tags and string values
+        """
+        media_info = MediaManager.parse_ffprobe_output(FFPROBE_OUTPUT)
+        self.assertEqual(
+            {
+                'filename': 'test.mov',
+                'nb_streams': '2',
+                'duration': '10.010000',
+                'TAG:major_brand': 'qt  ',
+            },
+            media_info['video_info']
+        )
+        self.assertEqual(2, len(media_info['stream_info']))
+        self.assertEqual('video', media_info['stream_info'][1]['codec_type'])
+        self.assertEqual('1920', media_info['stream_info'][1]['width'])
+        self.assertEqual(
+            '1', media_info['stream_info'][1]['DISPOSITION:default']
+        )
+        self.assertEqual('und', media_info['stream_info'][1]['TAG:language'])
+
+    def test_parse_ffprobe_output_with_no_output(self):
+        """testing if the parse_ffprobe_output method will return empty info
+        for an empty output
+        """
+        self.assertEqual(
+            {'video_info': {}, 'stream_info': []},
+            MediaManager.parse_ffprobe_output('')
+        )
+
+    def test_get_video_info_is_calling_ffprobe_once(self):
+        """testing if the get_video_info method will get the streams and the
+        format with one ffprobe call and cache the result
+        """
+        media_info = self.media_manager.get_video_info(self.video_path)
+        self.assertEqual(1, len(self.ffprobe_calls))
+        self.assertEqual('json', self.ffprobe_calls[0]['print_format'])
+        self.assertTrue('show_streams' in self.ffprobe_calls[0])
+        self.assertTrue('show_format' in self.ffprobe_calls[0])
+        self.assertEqual('10.010000', media_info['video_info']['duration'])
+
+        # cached in a new MediaManager too
+        media_manager = MediaManager()
+        media_manager.ffprobe = self.media_manager.ffprobe
+        self.assertEqual(
+            media_info, media_manager.get_video_info(self.video_path)
+        )
+        self.assertEqual(1, len(self.ffprobe_calls))
+
+    def test_get_frame_count_and_rate_is_working_properly(self):
+        """testing if the get_frame_count_and_rate method will return the
+        frame count and the frame rate of the video stream
+        """
+        media_info = MediaManager.parse_ffprobe_output(FFPROBE_OUTPUT)
+        nb_frames, frame_rate = \
+            MediaManager.get_frame_count_and_rate(media_info)
+        self.assertEqual(240, nb_frames)
+        self.assertAlmostEqual(23.976, frame_rate, 3)
+
+    def test_get_frame_count_and_rate_without_nb_frames(self):
+        """testing if the get_frame_count_and_rate method will calculate the
+        frame count from the duration if there is no nb_frames
+        """
+        media_info = MediaManager.parse_ffprobe_output(FFPROBE_OUTPUT)
+        video_stream = media_info['stream_info'][1]
+        del video_stream['nb_frames']
+        video_stream['r_frame_rate'] = '25/1'
+        self.assertEqual(
+            (250, 25.0), MediaManager.get_frame_count_and_rate(media_info)
+        )
+
+        # no stream duration
+        del video_stream['duration']
+        media_info['video_info']['duration'] = '2.0'
+        self.assertEqual(
+            (50, 25.0), MediaManager.get_frame_count_and_rate(media_info)
+        )
+
+        # no frame rate
+        del video_stream['r_frame_rate']
+        media_info['video_info']['TAG:framerate'] = '30'
+        self.assertEqual(
+            (60, 30.0), MediaManager.get_frame_count_and_rate(media_info)
+        )
+
+    def test_generate_video_thumbnail_is_calling_ffmpeg_once(self):
+        """testing if the generate_video_thumbnail method will seek to the
+        three frames and composite them with one ffmpeg call
+        """
+        ffmpeg_calls = []
+
+        def run_ffmpeg(args, output):
+            ffmpeg_calls.append(args)
+            with open(output, 'w') as f:
+                f.write('thumbnail')
+
+        def ffmpeg(**kwargs):
+            self.fail('ffmpeg should not be called')
+
+        self.media_manager._run_ffmpeg = run_ffmpeg
+        self.media_manager.ffmpeg = ffmpeg
+        thumbnail_path = \
+            self.media_manager.generate_video_thumbnail(self.video_path)
+        self.assertTrue(os.path.exists(thumbnail_path))
+        os.remove(thumbnail_path)
+
+        self.assertEqual(1, len(ffmpeg_calls))
+        args = ffmpeg_calls[0]
+        # 240 frames at 23.976 fps, frames 24, 120 and 215
+        self.assertEqual(
+            ['-ss', '1.001', '-i', self.video_path,
+             '-ss', '5.005', '-i', self.video_path,
+             '-ss', '8.967', '-i', self.video_path],
+            args[1:13]
+        )
+        self.assertEqual('-filter_complex', args[13])
+        self.assertEqual(
+            self.media_manager._get_thumbnail_filter_complex(), args[14]
+        )
+
+    def test_generate_video_thumbnail_falls_back_to_decoding(self):
+        """testing if the generate_video_thumbnail method will extract the
+        frames by decoding the video if seeking fails
+        """
+        ffmpeg_calls = []
+
+        def run_ffmpeg(args, output):
+            ffmpeg_calls.append(args)
+
+        def ffmpeg(**kwargs):
+            ffmpeg_calls.append(kwargs)
+
+        self.media_manager._run_ffmpeg = run_ffmpeg
+        self.media_manager.ffmpeg = ffmpeg
+        self.media_manager.generate_video_thumbnail(self.video_path)
+
+        # one seek, three frame extractions and one merge
+        self.assertEqual(5, len(ffmpeg_calls))
+        self.assertEqual(
+            "select='eq(n,120)'", ffmpeg_calls[2]['vf']
+        )
+        self.assertEqual(
+            self.media_manager._get_thumbnail_filter_complex(),
+            ffmpeg_calls[4]['filter_complex']
+        )
+
+        # and directly decode without seeking
+        ffmpeg_calls = []
+        self.media_manager.generate_video_thumbnail(
+            self.video_path, seek=False
+        )
+        self.assertEqual(4, len(ffmpeg_calls))
+
+    def test_submit_link_media_jobs_is_linking_the_media(self):
+        """testing if the submit_link_media_jobs method will generate the web
+        version and the thumbnail in the job queue and link them when they
+        are completed
+        """
+        class Link(object):
+            def __init__(self, full_path):
+                self.full_path = full_path
+                self.thumbnail = None
+
+        def generate(extension):
+            def generator(file_full_path):
+                temp_path = tempfile.mktemp(suffix=extension)
+                with open(temp_path, 'w') as f:
+                    f.write(file_full_path)
+                return temp_path
+            return generator
+
+        self.media_manager.generate_media_for_web = generate('.webm')
+        self.media_manager.generate_thumbnail = generate('.jpg')
+
+        link = Link(self.video_path)
+        jobs = self.media_manager.submit_link_media_jobs(
+            link, self.video_path, Link
+        )
+        self.assertEqual(jobs, link.media_jobs)
+        self.assertEqual(
+            [MediaJob.COMPLETED, MediaJob.COMPLETED],
+            [job.status for job in jobs]
+        )
+        self.assertEqual(
+            os.path.join(self.temp_dir, 'ForWeb', 'test.webm'),
+            link.thumbnail.full_path
+        )
+        self.assertEqual(
+            os.path.join(self.temp_dir, 'Thumbnail', 'test.jpg'),
+            link.thumbnail.thumbnail.full_path
+        )
+        self.assertTrue(os.path.exists(link.thumbnail.thumbnail.full_path))
+
+    def test_submit_link_media_jobs_is_linking_in_the_caller_thread(self):
+        """testing if the submit_link_media_jobs method will not link anything
+        when it doesn't wait, until the link_media function of the Link is
+        called, and the Links are created in the calling thread
+        """
+        import threading
+        link_threads = []
+
+        class Link(object):
+            def __init__(self, full_path):
+                link_threads.append(threading.current_thread())
+                self.full_path = full_path
+                self.thumbnail = None
+
+        def generator(file_full_path):
+            temp_path = tempfile.mktemp(suffix='.jpg')
+            with open(temp_path, 'w') as f:
+                f.write(file_full_path)
+            return temp_path
+
+        self.media_manager.generate_media_for_web = generator
+        self.media_manager.generate_thumbnail = generator
+
+        link = Link(self.video_path)
+        jobs = self.media_manager.submit_link_media_jobs(
+            link, self.video_path, Link, wait=False
+        )
+        self.media_manager.job_queue.wait(jobs)
+        self.assertEqual(None, link.thumbnail)
+
+        media_links = link.link_media()
+        self.assertTrue(link.thumbnail is media_links['web version'])
+        self.assertTrue(
+            link.thumbnail.thumbnail is media_links['thumbnail']
+        )
+        self.assertEqual(
+            [threading.current_thread()] * 3, link_threads
+        )
+
+    def test_submit_link_media_jobs_is_raising_the_errors(self):
+        """testing if the submit_link_media_jobs method will raise the errors
+        of the jobs if it waits for them except the ignored ones
+        """
+        class Link(object):
+            thumbnail = None
+
+        link = Link()
+        text_path = os.path.join(self.temp_dir, 'test.txt')
+        self.assertRaises(
+            RuntimeError,
+            self.media_manager.submit_link_media_jobs,
+            link, text_path, Link
+        )
+
+        jobs = self.media_manager.submit_link_media_jobs(
+            link, text_path, Link, ignored_errors=(RuntimeError,)
+        )
+        self.assertEqual(
+            [MediaJob.FAILED, MediaJob.FAILED], [job.status for job in jobs]
+        )
+        self.assertEqual(None, link.thumbnail)